@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Attendance
+from .models import Attendance, DailyAttendance
 
 
 @admin.register(Attendance)
@@ -10,3 +10,10 @@ class AttendanceAdmin(admin.ModelAdmin):
     date_hierarchy = 'check_in_time'
     readonly_fields = ('check_in_time',)
 
+
+
+@admin.register(DailyAttendance)
+class DailyAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('day', 'event', 'check_in_method', 'count')
+    list_filter = ('check_in_method',)
+    date_hierarchy = 'day'
@@ -0,0 +1,161 @@
+"""
+Engagement counters - Per-person attendance totals kept on the Person row.
+
+Person.attendance_count, first_attended_on, last_attended_on and
+attendance_streak are updated whenever an Attendance is created or
+deleted, so "most active" and "never attended" are plain indexed lookups
+instead of aggregations over the attendance table.
+
+Dates are event dates. A streak counts consecutive weeks (Monday to
+Sunday) with at least one attendance, ending with the week of the last
+attendance.
+"""
+from django.db import transaction
+
+from people.models import Person
+from .models import Attendance
+
+COUNTER_FIELDS = ['attendance_count', 'first_attended_on', 'last_attended_on', 'attendance_streak']
+
+
+def week_number(day):
+    """Return a running week number (weeks start on Monday)."""
+    return (day.toordinal() - 1) // 7
+
+
+def compute_streak(dates):
+    """
+    Return the weekly streak ending with the latest of dates.
+
+    Args:
+        dates: iterable of attended dates, in any order
+    """
+    weeks = sorted({week_number(day) for day in dates}, reverse=True)
+    streak = 0
+    for index, week in enumerate(weeks):
+        if week != weeks[0] - index:
+            break
+        streak += 1
+    return streak
+
+
+def record_attendance(person_id, event_date):
+    """
+    Count one new attendance for a person.
+
+    The person row is locked while the counters are updated, so concurrent
+    check-ins can't lose an increment.
+    """
+    with transaction.atomic():
+        person = _locked_people([person_id]).first()
+        if person is not None:
+            _count(person, event_date)
+            _save_counters(person)
+
+
+def record_attendances(attendances):
+    """
+    Count attendances created without signals (e.g. by bulk_create).
+
+    All the people are locked and updated together, so a batch costs the
+    same few queries however many attendances it holds.
+
+    Args:
+        attendances: iterable of saved Attendance instances with event loaded
+    """
+    dates = {}
+    for attendance in attendances:
+        dates.setdefault(attendance.person_id, []).append(attendance.event.event_date)
+    if not dates:
+        return
+    with transaction.atomic():
+        people = list(_locked_people(dates.keys()))
+        for person in people:
+            for event_date in sorted(dates[person.pk]):
+                _count(person, event_date)
+        _bulk_save_counters(people)
+
+
+def _count(person, event_date):
+    """Add one attendance on event_date to a person's counters in memory."""
+    last = person.last_attended_on
+    if last is None or event_date > last:
+        gap = week_number(event_date) - week_number(last) if last else None
+        if gap == 0:
+            pass  # Same week; streak unchanged
+        elif gap == 1:
+            person.attendance_streak += 1
+        else:
+            person.attendance_streak = 1
+        person.last_attended_on = event_date
+    elif week_number(event_date) != week_number(last):
+        # Entered after the fact for an earlier week; it may join up the
+        # streak, so work it out from the full history (already saved)
+        person.attendance_streak = compute_streak(_attended_dates(person.pk))
+
+    person.attendance_count += 1
+    if person.first_attended_on is None or event_date < person.first_attended_on:
+        person.first_attended_on = event_date
+
+
+def refresh_engagement(person_id):
+    """Recompute one person's counters from their attendance records."""
+    with transaction.atomic():
+        person = _locked_people([person_id]).first()
+        if person is None:
+            return
+        _set_counters(person, _attended_dates(person_id))
+        _save_counters(person)
+
+
+def rebuild_engagement(chunk_size=1000):
+    """
+    Recompute the counters for everyone from the attendance table.
+
+    Returns:
+        int: number of people updated
+    """
+    dates = {}
+    attendances = Attendance.objects.values_list('person_id', 'event__event_date').order_by()
+    for person_id, event_date in attendances.iterator(chunk_size=5000):
+        dates.setdefault(person_id, []).append(event_date)
+
+    updated = 0
+    batch = []
+    people = Person.objects.only('id').order_by('pk')
+    for person in people.iterator(chunk_size=chunk_size):
+        _set_counters(person, dates.get(person.pk, []))
+        batch.append(person)
+        if len(batch) >= chunk_size:
+            updated += _bulk_save_counters(batch)
+            batch = []
+    if batch:
+        updated += _bulk_save_counters(batch)
+    return updated
+
+
+def _set_counters(person, dates):
+    """Set a person's counters from the dates of all their attendances."""
+    person.attendance_count = len(dates)
+    person.first_attended_on = min(dates) if dates else None
+    person.last_attended_on = max(dates) if dates else None
+    person.attendance_streak = compute_streak(dates)
+
+
+def _locked_people(person_ids):
+    return Person.objects.select_for_update().only(*COUNTER_FIELDS).filter(pk__in=person_ids).order_by('pk')
+
+
+def _attended_dates(person_id):
+    return list(Attendance.objects.filter(person_id=person_id).values_list('event__event_date', flat=True))
+
+
+def _save_counters(person):
+    # update() rather than save(): counters aren't profile edits, so the
+    # roster and other Person post_save hooks don't need to run
+    Person.objects.filter(pk=person.pk).update(**{field: getattr(person, field) for field in COUNTER_FIELDS})
+
+
+def _bulk_save_counters(people):
+    Person.objects.bulk_update(people, COUNTER_FIELDS)
+    return len(people)
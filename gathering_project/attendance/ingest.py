@@ -0,0 +1,303 @@
+"""
+Batch check-in ingest - Records many kiosk scans in a few queries.
+
+Each scan carries a client-generated idempotency key, which is stored on
+the Attendance it creates. Sending the same batch again (e.g. after a
+network timeout) returns the original results instead of reporting the
+scans as duplicates.
+
+People are resolved from the in-memory roster, so a batch costs a fixed
+number of queries however many scans it holds: one for replayed keys, one
+for events, one for existing check-ins, one insert and the engagement
+counter update.
+"""
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dashboard.metrics import count_check_ins
+from dashboard.retention import mark_stale_for_attendance
+from people.roster import roster
+from events.models import Event
+from .engagement import record_attendances
+from .live import notify_check_in
+from .matrix import invalidate_for_attendance
+from .writes import retry_on_lock
+from .models import Attendance
+
+logger = logging.getLogger(__name__)
+
+# Per-scan result statuses
+CREATED = 'created'                         # Checked in by this scan
+REPLAYED = 'replayed'                       # Key seen before; original result returned
+ALREADY_CHECKED_IN = 'already_checked_in'   # Checked in earlier by another scan
+INVALID = 'invalid'                         # Scan could not be processed
+
+# Scans timestamped further ahead than this are treated as clock skew
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class BatchError(ValueError):
+    """Raised when the batch as a whole is unusable."""
+
+
+def _result(key, status, message, person=None, event_id=None):
+    success = status in (CREATED, REPLAYED, ALREADY_CHECKED_IN)
+    return {
+        'key': key,
+        'success': success,
+        'status': status,
+        'message': message,
+        'person_id': str(person.id) if person else None,
+        'person_name': person.name if person else None,
+        'event_id': event_id,
+    }
+
+
+def _parse_scanned_at(value, now):
+    if not value:
+        return now
+    scanned_at = parse_datetime(str(value).replace('Z', '+00:00'))
+    if scanned_at is None:
+        raise ValueError('scanned_at is not a valid ISO 8601 datetime')
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    if scanned_at > now + MAX_CLOCK_SKEW:
+        return now
+    return scanned_at
+
+
+def _parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_scans(payload):
+    """
+    Validate a batch payload.
+
+    The payload is {"event_id": <default event>, "scans": [...]}, where each
+    scan has "key", "person_id" (a person's id or QR code), and optionally
+    "event_id" and "scanned_at".
+
+    Returns:
+        tuple: (scans, results) where scans is a list of valid scan dicts and
+        results maps the index of each invalid scan to its result
+
+    Raises:
+        BatchError: if the payload is not a batch or is too large
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('scans'), list):
+        raise BatchError('Expected a JSON object with a "scans" list.')
+
+    max_scans = getattr(settings, 'ATTENDANCE_BATCH_MAX_SCANS', 500)
+    if len(payload['scans']) > max_scans:
+        raise BatchError(f'A batch may contain at most {max_scans} scans.')
+
+    default_event_id = payload.get('event_id')
+    now = timezone.now()
+    scans = []
+    results = {}
+    for index, item in enumerate(payload['scans']):
+        if not isinstance(item, dict):
+            results[index] = _result(None, INVALID, 'Scan must be a JSON object.')
+            continue
+        key = str(item.get('key') or '').strip()
+        if not key or len(key) > 64:
+            results[index] = _result(key or None, INVALID, 'Scan key is required (max 64 characters).')
+            continue
+        identifier = str(item.get('person_id') or '').strip()
+        event_id = _parse_event_id(item.get('event_id') or default_event_id)
+        if not identifier or event_id is None:
+            results[index] = _result(key, INVALID, 'Person ID and Event ID are required.')
+            continue
+        try:
+            scanned_at = _parse_scanned_at(item.get('scanned_at'), now)
+        except ValueError as e:
+            results[index] = _result(key, INVALID, str(e))
+            continue
+        scans.append({
+            'index': index,
+            'key': key,
+            'identifier': identifier,
+            'event_id': event_id,
+            'scanned_at': scanned_at,
+        })
+    return scans, results
+
+
+def ingest_scans(payload, user=None):
+    """
+    Check in a batch of scans.
+
+    Args:
+        payload: Decoded JSON batch (see parse_scans)
+        user: User operating the scanners (optional)
+
+    Returns:
+        list of per-scan result dicts, in the same order as the scans
+
+    Raises:
+        BatchError: if the payload is not a batch or is too large
+    """
+    scans, results = parse_scans(payload)
+
+    # Keys already stored: a retried request gets its original results back
+    keys = {scan['key'] for scan in scans}
+    replayed = {
+        attendance.idempotency_key: attendance
+        for attendance in Attendance.objects.filter(idempotency_key__in=keys)
+    }
+
+    people = {scan['identifier']: roster.resolve(scan['identifier']) for scan in scans}
+    events = Event.objects.in_bulk({scan['event_id'] for scan in scans})
+
+    existing = set(
+        Attendance.objects.filter(
+            person_id__in={person.id for person in people.values() if person},
+            event_id__in=events.keys(),
+        ).values_list('person_id', 'event_id')
+    )
+
+    to_create = []
+    first_index = {}
+    duplicates = []
+    for scan in scans:
+        key = scan['key']
+        if key in replayed:
+            attendance = replayed[key]
+            person = roster.resolve(str(attendance.person_id))
+            results[scan['index']] = _result(
+                key, REPLAYED, f'{person.name if person else "Person"} checked in successfully!',
+                person, attendance.event_id,
+            )
+            continue
+        if key in first_index:
+            # Same key twice in one batch; it gets the first scan's outcome
+            duplicates.append((scan['index'], first_index[key]))
+            continue
+        first_index[key] = scan['index']
+
+        person = people.get(scan['identifier'])
+        event = events.get(scan['event_id'])
+        if person is None:
+            results[scan['index']] = _result(key, INVALID, 'Person not found. Please ensure the QR code is valid.')
+            continue
+        if event is None:
+            results[scan['index']] = _result(key, INVALID, 'Event not found.', person)
+            continue
+        if not person.is_active:
+            results[scan['index']] = _result(key, INVALID, f'{person.name} is not active.', person, event.pk)
+            continue
+        if (person.id, event.pk) in existing:
+            results[scan['index']] = _result(
+                key, ALREADY_CHECKED_IN, f'{person.name} is already checked in for this event.',
+                person, event.pk,
+            )
+            continue
+
+        existing.add((person.id, event.pk))
+        to_create.append((scan, person, Attendance(
+            person_id=person.id,
+            event=event,
+            check_in_time=scan['scanned_at'],
+            check_in_method='qr',
+            checked_in_by=user,
+            idempotency_key=scan['key'],
+        )))
+
+    conflicts = []
+    inserted, bulk_created = retry_on_lock(_insert, [attendance for scan, person, attendance in to_create])
+    for (scan, person, attendance), created in zip(to_create, inserted):
+        if created:
+            results[scan['index']] = _result(
+                scan['key'], CREATED, f'{person.name} checked in successfully!',
+                person, attendance.event_id,
+            )
+        else:
+            conflicts.append((scan, person, attendance))
+
+    # bulk_create skips post_save, so wake live attendance streams and
+    # update the dashboard counters, retention and attendance matrix here.
+    # Rows saved one by one after a conflict went through post_save already.
+    if bulk_created:
+        for event_id in {attendance.event_id for scan, person, attendance in to_create}:
+            notify_check_in(event_id)
+        created = [attendance for scan, person, attendance in to_create]
+        count_check_ins(created)
+        event_dates = {attendance.event.event_date for attendance in created}
+        mark_stale_for_attendance(event_dates)
+        invalidate_for_attendance(event_dates)
+
+    if conflicts:
+        # Lost a race with another request: either a retry of this same scan or another kiosk
+        stored_keys = set(
+            Attendance.objects.filter(idempotency_key__in=[scan['key'] for scan, person, attendance in conflicts])
+            .values_list('idempotency_key', flat=True)
+        )
+        for scan, person, attendance in conflicts:
+            if scan['key'] in stored_keys:
+                results[scan['index']] = _result(
+                    scan['key'], REPLAYED, f'{person.name} checked in successfully!',
+                    person, attendance.event_id,
+                )
+            else:
+                results[scan['index']] = _result(
+                    scan['key'], ALREADY_CHECKED_IN, f'{person.name} is already checked in for this event.',
+                    person, attendance.event_id,
+                )
+
+    for index, original_index in duplicates:
+        results[index] = dict(results[original_index], status=REPLAYED if results[original_index]['success'] else INVALID)
+
+    return [results[index] for index in range(len(payload['scans']))]
+
+
+def _insert(attendances):
+    """
+    Insert new attendances in one transaction.
+
+    Another request may check the same person in, or store the same key,
+    between our checks and the insert. The unique constraints catch that;
+    the batch is then inserted row by row so only the conflicting scans
+    are rejected.
+
+    Engagement counters are updated in the same transaction, since
+    bulk_create skips the post_save signal that normally does it. Rows
+    inserted one by one are saved normally, so their signals do the
+    counting. Each call starts afresh, so it can be retried if the
+    database was locked.
+
+    Returns:
+        tuple: (list of bools, True where the attendance was created;
+        True if the batch went in with bulk_create, so post_save didn't run)
+    """
+    if not attendances:
+        return [], True
+    for attendance in attendances:
+        attendance.pk = None
+        attendance._state.adding = True
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create(attendances)
+            record_attendances(attendances)
+        return [True] * len(attendances), True
+    except IntegrityError:
+        logger.info('Batch check-in hit a concurrent check-in; inserting scans one by one')
+
+    created = []
+    with transaction.atomic():
+        for attendance in attendances:
+            try:
+                with transaction.atomic():
+                    attendance.save(force_insert=True)
+                created.append(True)
+            except IntegrityError:
+                created.append(False)
+    return created, False
@@ -0,0 +1,103 @@
+"""
+Attendance listing - Keyset pagination and cached totals for attendance_list.
+
+Pages are cut on (check_in_time, id) rather than OFFSET, so page 500 costs
+the same as page 1: the cursor of the last row on a page becomes a WHERE
+clause for the next one, served by the (check_in_time, id) indexes.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .live import get_version
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(attendance):
+    """Return the cursor for an attendance row: '<epoch microseconds>_<id>'."""
+    delta = attendance.check_in_time - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f'{microseconds}_{attendance.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor from the query string.
+
+    Returns:
+        tuple: (check_in_time, id), or None if the cursor is invalid
+    """
+    try:
+        microseconds, pk = (cursor or '').split('_', 1)
+        return EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
+def get_attendance_page(attendances, after=None, before=None, page_size=None):
+    """
+    Return one page of attendances, newest first.
+
+    Args:
+        attendances: Attendance queryset to page through
+        after: Cursor of the last row on the previous page (next page)
+        before: Cursor of the first row on the following page (previous page)
+        page_size: Rows per page (default: ATTENDANCE_LIST_PAGE_SIZE)
+
+    Returns:
+        dict with 'rows', 'next_cursor' and 'previous_cursor' (None when
+        there is no such page)
+    """
+    page_size = page_size or getattr(settings, 'ATTENDANCE_LIST_PAGE_SIZE', 50)
+    attendances = attendances.select_related('person', 'event', 'checked_in_by')
+
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before and not after else None
+
+    if before:
+        # Walk backwards from the cursor, then put the rows back in page order
+        check_in_time, pk = before
+        rows = list(
+            attendances.filter(Q(check_in_time__gt=check_in_time) | Q(check_in_time=check_in_time, pk__gt=pk))
+            .order_by('check_in_time', 'pk')[:page_size + 1]
+        )
+        has_more_before = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        return {
+            'rows': rows,
+            'previous_cursor': encode_cursor(rows[0]) if has_more_before and rows else None,
+            'next_cursor': encode_cursor(rows[-1]) if rows else None,
+        }
+
+    if after:
+        check_in_time, pk = after
+        attendances = attendances.filter(
+            Q(check_in_time__lt=check_in_time) | Q(check_in_time=check_in_time, pk__lt=pk)
+        )
+    rows = list(attendances.order_by('-check_in_time', '-pk')[:page_size + 1])
+    has_more_after = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        'rows': rows,
+        'previous_cursor': encode_cursor(rows[0]) if after and rows else None,
+        'next_cursor': encode_cursor(rows[-1]) if has_more_after else None,
+    }
+
+
+def get_attendance_total(attendances, event_id=None):
+    """
+    Return the number of attendances, cached until the next check-in.
+
+    The cache key includes the live check-in version, so new check-ins show
+    up immediately; deletions show up within ATTENDANCE_LIST_COUNT_CACHE_SECONDS.
+    """
+    scope = event_id if event_id is not None else 'all'
+    key = f'attendance:total:{scope}:{get_version(scope)}'
+    total = cache.get(key)
+    if total is None:
+        total = attendances.count()
+        cache.set(key, total, getattr(settings, 'ATTENDANCE_LIST_COUNT_CACHE_SECONDS', 300))
+    return total
@@ -0,0 +1,167 @@
+"""
+Live attendance - Pushes check-ins for an event as server-sent events.
+
+Creating an Attendance bumps a per-event version number in the cache.
+Each open stream checks that number every ATTENDANCE_STREAM_POLL_SECONDS
+and only queries the database when it has changed, reading just the
+check-ins newer than the last one it sent. Screens therefore subscribe
+once instead of reloading whole pages.
+
+Streams need an ASGI server (e.g. uvicorn gathering_project.asgi:application)
+and a shared cache (CACHE_URL) when more than one process serves requests.
+Under WSGI (runserver, gunicorn) poll_check_ins answers each request with
+one batch and a retry interval instead, and the browser's EventSource
+reconnects on its own, so the same pages get updates every few seconds.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Attendance
+
+# Most check-ins sent in one delta
+DELTA_LIMIT = 200
+
+
+def _version_key(event_id):
+    return f'attendance:live:{event_id}:version'
+
+
+def notify_check_in(event_id):
+    """Tell open streams for an event that new check-ins may be waiting."""
+    # The 'all' version lets totals across every event notice the change too
+    for key in (_version_key(event_id), _version_key('all')):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def get_version(event_id):
+    """Return the check-in version of an event ('all' for any event)."""
+    return cache.get(_version_key(event_id), 0)
+
+
+def get_check_ins_since(event_id, since_id=0, include_people=True):
+    """
+    Return the check-ins for an event after since_id and the running count.
+
+    Returns:
+        dict with 'count', 'last_id' and 'check_ins' (oldest first; empty when
+        include_people is False)
+    """
+    attendances = Attendance.objects.filter(event_id=event_id)
+    count = attendances.count()
+    new = attendances.filter(pk__gt=since_id or 0).order_by('pk')
+    if include_people:
+        rows = list(
+            new.select_related('person').only(
+                'id', 'check_in_time', 'check_in_method', 'person__first_name', 'person__last_name'
+            )[:DELTA_LIMIT]
+        )
+        check_ins = [
+            {
+                'id': attendance.pk,
+                'name': attendance.person.get_full_name(),
+                'check_in_time': attendance.check_in_time.isoformat(),
+                'method': attendance.check_in_method,
+            }
+            for attendance in rows
+        ]
+        last_id = rows[-1].pk if rows else since_id
+    else:
+        check_ins = []
+        last_id = new.order_by('-pk').values_list('pk', flat=True).first() or since_id
+    return {'count': count, 'last_id': last_id or 0, 'check_ins': check_ins}
+
+
+def _fetch_and_close(event_id, since_id, include_people):
+    # Runs in a worker thread; don't leave its connection open between polls
+    try:
+        return get_check_ins_since(event_id, since_id, include_people)
+    finally:
+        connection.close()
+
+
+def format_event(name, data, event_id=None):
+    """Format one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def poll_check_ins(event_id, since_id=0, include_people=True):
+    """
+    Return one batch of server-sent events for servers that can't stream.
+
+    The batch is what the stream would send first (a snapshot, or the
+    check-ins after since_id), preceded by a retry interval of
+    ATTENDANCE_STREAM_WSGI_POLL_SECONDS that the browser waits before
+    reconnecting with Last-Event-ID.
+    """
+    retry_ms = int(getattr(settings, 'ATTENDANCE_STREAM_WSGI_POLL_SECONDS', 5) * 1000)
+    if since_id:
+        delta = get_check_ins_since(event_id, since_id, include_people)
+        event = format_event('checkin', delta, delta['last_id'])
+    else:
+        delta = get_check_ins_since(event_id, 0, False)
+        event = format_event('snapshot', {'count': delta['count'], 'last_id': delta['last_id']}, delta['last_id'])
+    return f'retry: {retry_ms}\n\n' + event
+
+
+async def stream_check_ins(event_id, since_id=0, include_people=True):
+    """
+    Yield server-sent events for an event's check-ins.
+
+    The first event is a snapshot with the current count; after that a
+    'checkin' event is sent whenever attendances are added. The stream ends
+    after ATTENDANCE_STREAM_MAX_SECONDS and the browser reconnects with the
+    Last-Event-ID header, so nothing is missed.
+    """
+    poll_seconds = getattr(settings, 'ATTENDANCE_STREAM_POLL_SECONDS', 1)
+    max_seconds = getattr(settings, 'ATTENDANCE_STREAM_MAX_SECONDS', 300)
+    heartbeat_seconds = 15
+
+    fetch = sync_to_async(_fetch_and_close, thread_sensitive=False)
+    read_version = sync_to_async(get_version, thread_sensitive=False)
+
+    version = await read_version(event_id)
+    if since_id:
+        # Reconnecting: send whatever was missed first
+        delta = await fetch(event_id, since_id, include_people)
+        last_id = delta['last_id']
+        if len(delta['check_ins']) >= DELTA_LIMIT:
+            version = None
+        yield format_event('checkin', delta, last_id)
+    else:
+        delta = await fetch(event_id, 0, False)
+        last_id = delta['last_id']
+        yield format_event('snapshot', {'count': delta['count'], 'last_id': last_id}, last_id)
+
+    started = time.monotonic()
+    last_sent = started
+    while time.monotonic() - started < max_seconds:
+        await asyncio.sleep(poll_seconds)
+        current = await read_version(event_id)
+        if current != version:
+            version = current
+            delta = await fetch(event_id, last_id, include_people)
+            if len(delta['check_ins']) >= DELTA_LIMIT:
+                version = None  # More waiting; fetch again on the next tick
+            if delta['last_id'] != last_id:
+                last_id = delta['last_id']
+                last_sent = time.monotonic()
+                yield format_event('checkin', delta, last_id)
+                continue
+        if time.monotonic() - last_sent >= heartbeat_seconds:
+            # Comment line keeps proxies from closing an idle connection
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
@@ -0,0 +1,499 @@
+"""
+Load test - Replays event-day traffic against a running server.
+
+Virtual users each hold one keep-alive HTTP connection and send requests
+back to back, choosing each one from a weighted mix of:
+
+    self_check_in   phone number check-ins on the public page
+    check_in_qr     staff QR scans (logged in as the load test user)
+    search          typeahead keystrokes in the manual check-in search
+    register        new registrations on the public form
+
+Seeded people check in once each, in random order, like arrivals at an
+event; once everyone is in, further check-ins are duplicates. The client
+is plain asyncio with no dependencies beyond the standard library.
+"""
+import asyncio
+import random
+import re
+import secrets
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from events.models import Event
+from people.models import Person
+
+ENDPOINTS = ('self_check_in', 'check_in_qr', 'search', 'register')
+
+DEFAULT_MIX = {'self_check_in': 40, 'check_in_qr': 30, 'search': 20, 'register': 10}
+
+# Endpoints sent from the logged-in staff session; the rest are anonymous
+STAFF_ENDPOINTS = ('check_in_qr', 'search')
+
+# Everything the load test creates is marked so cleanup never touches real
+# records: people and the staff user get an address at LOADTEST_EMAIL_DOMAIN
+# (.invalid is reserved and never delivers), and people's phone numbers use
+# the unassigned country code +999 with more digits than any real number
+PHONE_PREFIX = '+999'
+LOADTEST_EMAIL_DOMAIN = 'loadtest.invalid'
+LOADTEST_USERNAME_PREFIX = 'loadtest-'
+LOADTEST_STAFF_EMAIL = f'staff@{LOADTEST_EMAIL_DOMAIN}'
+LOADTEST_EVENT_NAME = 'Load test event'
+LOADTEST_EVENT_DESCRIPTION = 'Created by manage.py loadtest; deleted by manage.py loadtest --cleanup.'
+
+FIRST_NAMES = ['Kwame', 'Ama', 'Kofi', 'Akosua', 'Yaw', 'Abena', 'Kwesi', 'Efua', 'Kojo', 'Adwoa', 'Grace', 'Samuel']
+LAST_NAMES = ['Mensah', 'Owusu', 'Boateng', 'Asante', 'Osei', 'Addo', 'Appiah', 'Darko', 'Agyeman', 'Ofori']
+
+# Responses that mean the server gave up rather than the request being refused
+BUSY_PATTERN = re.compile(rb'system is busy', re.IGNORECASE)
+ERROR_PATTERN = re.compile(rb'An error occurred', re.IGNORECASE)
+
+
+def parse_mix(value):
+    """
+    Parse a mix such as 'self_check_in=40,check_in_qr=30,search=20'.
+
+    Raises:
+        ValueError: for unknown endpoints or weights that aren't positive integers
+    """
+    mix = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'. Choose from: {', '.join(ENDPOINTS)}")
+        try:
+            mix[name] = int(weight)
+        except ValueError:
+            raise ValueError(f"Weight for '{name}' must be an integer")
+        if mix[name] < 0:
+            raise ValueError(f"Weight for '{name}' must not be negative")
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one endpoint with a positive weight')
+    return mix
+
+
+def _loadtest_people():
+    return Person.objects.filter(phone_number__startswith=PHONE_PREFIX, email__endswith=f'@{LOADTEST_EMAIL_DOMAIN}')
+
+
+def _loadtest_events():
+    return Event.objects.filter(name=LOADTEST_EVENT_NAME, description=LOADTEST_EVENT_DESCRIPTION)
+
+
+def _loadtest_users():
+    return User.objects.filter(username__startswith=LOADTEST_USERNAME_PREFIX, email=LOADTEST_STAFF_EMAIL)
+
+
+def seed_loadtest_data(people=2000):
+    """
+    Create a load test user, today's event and people to check in.
+
+    Existing load test people and today's load test event are reused, so
+    seeding twice is cheap. The user is always a new account, so no
+    existing account's password is ever changed.
+
+    Returns:
+        dict with 'username', 'password', 'event_id' and 'people' (a list of
+        (person id, phone number, full name) tuples)
+    """
+    password = secrets.token_urlsafe(16)
+    user = User.objects.create_user(
+        f'{LOADTEST_USERNAME_PREFIX}{secrets.token_hex(4)}', LOADTEST_STAFF_EMAIL, password, is_staff=True
+    )
+
+    today = timezone.localdate()
+    event = _loadtest_events().filter(event_date=today).first()
+    if event is None:
+        event = Event.objects.create(
+            name=LOADTEST_EVENT_NAME,
+            description=LOADTEST_EVENT_DESCRIPTION,
+            event_date=today,
+            event_time=(timezone.localtime() + timedelta(hours=1)).time().replace(second=0, microsecond=0),
+            event_type='special',
+        )
+
+    existing = _loadtest_people().count()
+    rng = random.Random(existing)
+    Person.objects.bulk_create(
+        [
+            Person(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                phone_number=f'{PHONE_PREFIX}{index:012d}',
+                email=f'person{index}@{LOADTEST_EMAIL_DOMAIN}',
+            )
+            for index in range(existing, people)
+        ],
+        batch_size=500,
+    )
+    seeded = list(
+        _loadtest_people().filter(is_active=True)
+        .order_by('phone_number')
+        .values_list('id', 'phone_number', 'first_name', 'last_name')[:people]
+    )
+    return {
+        'username': user.username,
+        'password': password,
+        'event_id': event.pk,
+        'people': [(str(pk), phone, f'{first} {last}') for pk, phone, first, last in seeded],
+    }
+
+
+def cleanup_loadtest_data():
+    """
+    Delete everything the load test created, and nothing else.
+
+    Only records carrying the load test markers are deleted (see
+    PHONE_PREFIX), along with their check-ins.
+
+    Returns:
+        int: number of people deleted
+    """
+    _loadtest_events().delete()
+    count = _loadtest_people().delete()[1].get(Person._meta.label, 0)
+    _loadtest_users().delete()
+    return count
+
+
+class RequestFailed(Exception):
+    """Raised when a request gets no usable HTTP response."""
+
+
+class HTTPClient:
+    """Minimal HTTP/1.1 client with one keep-alive connection and a cookie jar."""
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, data=None, headers=None):
+        """
+        Send a request and return (status, body bytes).
+
+        A reused connection the server has closed is reopened once.
+        """
+        body = urlencode(data).encode() if data is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            f'Content-Length: {len(body)}',
+        ]
+        if data is not None:
+            lines.append('Content-Type: application/x-www-form-urlencoded')
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        for attempt in (1, 2):
+            reused = self._writer is not None
+            try:
+                if not reused:
+                    self._reader, self._writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout
+                    )
+                self._writer.write(message)
+                await self._writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except asyncio.TimeoutError:
+                await self.close()
+                raise
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, RequestFailed) as e:
+                await self.close()
+                if not reused or attempt == 2:
+                    raise RequestFailed(str(e) or e.__class__.__name__)
+
+    async def _read_response(self):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise RequestFailed('Connection closed by server')
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise RequestFailed(f'Bad status line: {status_line[:80]!r}')
+
+        headers = {}
+        set_cookies = []
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                set_cookies.append(value)
+            headers[name] = value
+
+        for header in set_cookies:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, body
+
+    def csrf_headers(self):
+        return {'X-CSRFToken': self.cookies.get('csrftoken', '')}
+
+
+class LoadTest:
+    """
+    One load test run.
+
+    Args:
+        host, port: Server to test
+        seed: Result of seed_loadtest_data()
+        mix: Endpoint weights (see parse_mix)
+        users: Number of concurrent virtual users
+        duration: Seconds to send requests for
+    """
+
+    def __init__(self, host, port, seed, mix=None, users=20, duration=30, timeout=30):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.users = users
+        self.duration = duration
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.outcomes = defaultdict(Counter)
+        self.elapsed = 0
+        arrivals = list(seed['people'])
+        random.shuffle(arrivals)
+        self._arrivals = arrivals
+        self._registrations = 0
+        self._run_id = int(time.time()) % 100000
+
+    def _next_person(self):
+        # Everyone arrives once; after that check-ins are repeats
+        if self._arrivals:
+            return self._arrivals.pop()
+        return random.choice(self.seed['people'])
+
+    def _record(self, endpoint, started, outcome=None, error=None):
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if error:
+            self.errors[endpoint][error] += 1
+        else:
+            self.outcomes[endpoint][outcome or 'ok'] += 1
+
+    async def _timed(self, endpoint, client, method, path, data=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, body = await client.request(method, path, data, headers)
+        except asyncio.TimeoutError:
+            self._record(endpoint, started, error='timeout')
+            return None, None
+        except RequestFailed:
+            self._record(endpoint, started, error='connection')
+            return None, None
+        if status >= 400:
+            self._record(endpoint, started, error=f'http_{status}')
+            return None, None
+        return started, (status, body)
+
+    async def self_check_in(self, client):
+        person_id, phone, name = self._next_person()
+        started, response = await self._timed(
+            'self_check_in', client, 'POST', '/attendance/self-check-in/',
+            {
+                'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+                'phone_number': phone,
+                'event_id': self.seed['event_id'],
+            },
+        )
+        if response:
+            status, body = response
+            if BUSY_PATTERN.search(body):
+                self._record('self_check_in', started, error='busy')
+            elif ERROR_PATTERN.search(body):
+                self._record('self_check_in', started, error='app_error')
+            elif b'Successfully checked in' in body:
+                self._record('self_check_in', started, 'checked_in')
+            elif b'already checked in' in body:
+                self._record('self_check_in', started, 'duplicate')
+            else:
+                self._record('self_check_in', started, error='rejected')
+
+    async def check_in_qr(self, client):
+        person_id, phone, name = self._next_person()
+        started, response = await self._timed(
+            'check_in_qr', client, 'POST', '/attendance/check-in/qr/',
+            {'person_id': person_id, 'event_id': self.seed['event_id']},
+            client.csrf_headers(),
+        )
+        if response:
+            status, body = response
+            if b'"success": true' in body:
+                self._record('check_in_qr', started, 'checked_in')
+            elif b'already checked in' in body:
+                self._record('check_in_qr', started, 'duplicate')
+            elif b'"busy": true' in body:
+                self._record('check_in_qr', started, error='busy')
+            else:
+                self._record('check_in_qr', started, error='app_error')
+
+    async def search(self, client):
+        # One request per keystroke, from the second letter of the name
+        person_id, phone, name = random.choice(self.seed['people'])
+        for length in range(2, len(name) + 1):
+            query = urlencode({'q': name[:length]})
+            started, response = await self._timed('search', client, 'GET', f'/attendance/search/?{query}')
+            if response:
+                status, body = response
+                self._record('search', started, 'hit' if b'"id"' in body else 'no_match')
+
+    async def register(self, client):
+        self._registrations += 1
+        # Shorter than seeded numbers, so the two never collide
+        phone = f'{PHONE_PREFIX}{self._run_id:05d}{self._registrations:05d}'
+        started, response = await self._timed(
+            'register', client, 'POST', '/people/register/',
+            {
+                'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+                'first_name': random.choice(FIRST_NAMES),
+                'last_name': random.choice(LAST_NAMES),
+                'phone_number': phone,
+                'email': f'register{self._run_id}-{self._registrations}@{LOADTEST_EMAIL_DOMAIN}',
+                'notification_preference': 'sms',
+            },
+        )
+        if response:
+            status, body = response
+            if status == 302:
+                self._record('register', started, 'registered')
+            else:
+                self._record('register', started, error='form_error')
+
+    async def _login(self, client):
+        status, body = await client.request('GET', '/accounts/login/')
+        status, body = await client.request(
+            'POST', '/accounts/login/',
+            {
+                'csrfmiddlewaretoken': client.cookies.get('csrftoken', ''),
+                'username': self.seed['username'],
+                'password': self.seed['password'],
+            },
+        )
+        if 'sessionid' not in client.cookies:
+            raise RequestFailed('Load test user could not log in')
+
+    async def _connect(self):
+        """
+        Open the sessions for one virtual user.
+
+        Like a kiosk next to a staff scanner: an anonymous session for the
+        public forms and a logged-in one for the staff endpoints.
+        """
+        public = HTTPClient(self.host, self.port, self.timeout)
+        staff = HTTPClient(self.host, self.port, self.timeout)
+        if any(name not in STAFF_ENDPOINTS for name in self.mix):
+            await public.request('GET', '/attendance/self-check-in/')  # CSRF cookie
+        if any(name in STAFF_ENDPOINTS for name in self.mix):
+            await self._login(staff)
+        return public, staff
+
+    async def _user(self, public, staff, deadline):
+        endpoints = list(self.mix)
+        weights = [self.mix[name] for name in endpoints]
+        try:
+            while time.monotonic() < deadline:
+                endpoint = random.choices(endpoints, weights)[0]
+                await getattr(self, endpoint)(staff if endpoint in STAFF_ENDPOINTS else public)
+        finally:
+            await public.close()
+            await staff.close()
+
+    async def run(self):
+        """
+        Log in the virtual users, then run them until the duration is up.
+
+        Raises:
+            RequestFailed: if the server can't be reached or login fails
+        """
+        # Logins hash passwords, so they aren't part of the measured run
+        sessions = await asyncio.gather(*(self._connect() for _ in range(self.users)))
+        started = time.monotonic()
+        deadline = started + self.duration
+        await asyncio.gather(*(self._user(public, staff, deadline) for public, staff in sessions))
+        self.elapsed = time.monotonic() - started
+        return self.report()
+
+    def report(self):
+        """
+        Summarise the run.
+
+        Returns:
+            dict keyed by endpoint with 'requests', 'throughput' (per second),
+            'p50'/'p95'/'p99' (milliseconds), 'outcomes' and 'errors'
+        """
+        results = {}
+        for endpoint in ENDPOINTS:
+            samples = sorted(self.latencies.get(endpoint, []))
+            if not samples:
+                continue
+            results[endpoint] = {
+                'requests': len(samples),
+                'throughput': len(samples) / self.elapsed if self.elapsed else 0,
+                'p50': percentile(samples, 50) * 1000,
+                'p95': percentile(samples, 95) * 1000,
+                'p99': percentile(samples, 99) * 1000,
+                'outcomes': dict(self.outcomes[endpoint]),
+                'errors': dict(self.errors[endpoint]),
+            }
+        return results
+
+
+def percentile(sorted_samples, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0
+    rank = max(1, -(-len(sorted_samples) * percent // 100))
+    return sorted_samples[int(rank) - 1]
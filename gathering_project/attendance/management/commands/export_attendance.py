@@ -0,0 +1,62 @@
+"""
+Export attendance records to a CSV or XLSX file.
+
+Usage:
+    python manage.py export_attendance --output attendance.csv
+    python manage.py export_attendance --event 12 --output event_12.xlsx
+    python manage.py export_attendance --start 2025-01-01 --end 2025-06-30 --output h1.csv
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from attendance.export import EXPORT_FORMATS, get_export_queryset, write_csv, write_xlsx
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Export attendance for an event and/or a date range to CSV or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, required=True, help="File to write (.csv or .xlsx).")
+        parser.add_argument("--event", type=int, help="Only export this event (id).")
+        parser.add_argument("--start", type=str, help="First check-in date to include (YYYY-MM-DD).")
+        parser.add_argument("--end", type=str, help="Last check-in date to include (YYYY-MM-DD).")
+        parser.add_argument(
+            "--format",
+            choices=EXPORT_FORMATS,
+            help="Output format (default: taken from the --output extension).",
+        )
+        parser.add_argument("--chunk-size", type=int, help="Rows read from the database per chunk.")
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        file_format = options["format"] or output.suffix.lstrip(".").lower()
+        if file_format not in EXPORT_FORMATS:
+            raise CommandError("Use a .csv or .xlsx output file, or pass --format.")
+
+        event = None
+        if options["event"] is not None:
+            try:
+                event = Event.objects.get(pk=options["event"])
+            except Event.DoesNotExist:
+                raise CommandError(f"Event {options['event']} not found.")
+
+        try:
+            start_date = parse_date(options["start"]) if options["start"] else None
+            end_date = parse_date(options["end"]) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        if (options["start"] and start_date is None) or (options["end"] and end_date is None):
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        attendances = get_export_queryset(event, start_date, end_date)
+        if file_format == "xlsx":
+            count = write_xlsx(attendances, output, options["chunk_size"])
+        else:
+            with output.open("w", newline="", encoding="utf-8") as fileobj:
+                count = write_csv(attendances, fileobj, options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} attendance record(s) to {output}"))
@@ -0,0 +1,172 @@
+"""
+Load test the check-in and registration endpoints.
+
+Seeds load test people, an event for today and a staff user, starts a
+local server (unless --url is given), replays a mix of self check-ins, QR
+scans, search keystrokes and registrations from concurrent virtual users,
+and reports throughput, latency percentiles and errors per endpoint.
+
+Usage:
+    python manage.py loadtest
+    python manage.py loadtest --users 50 --duration 60 --server uvicorn
+    python manage.py loadtest --mix self_check_in=70,search=30
+    python manage.py loadtest --url http://127.0.0.1:8000 --keep-data
+    python manage.py loadtest --cleanup
+
+When testing a server that is already running, seed first (--seed-only)
+and then start it, or give it a shared cache (CACHE_URL), so its in-memory
+roster includes the load test people.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.loadtest import (
+    DEFAULT_MIX,
+    LoadTest,
+    RequestFailed,
+    cleanup_loadtest_data,
+    parse_mix,
+    seed_loadtest_data,
+)
+
+
+class Command(BaseCommand):
+    help = "Load test check-in, search and registration endpoints and report throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", type=str, help="Server to test (default: start one on a free local port).")
+        parser.add_argument(
+            "--server",
+            choices=["runserver", "uvicorn"],
+            default="runserver",
+            help="Server to start when --url is not given (default: runserver).",
+        )
+        parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users (default: 20).")
+        parser.add_argument("--duration", type=int, default=30, help="Seconds to run for (default: 30).")
+        parser.add_argument(
+            "--mix",
+            type=str,
+            default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+            help="Endpoint weights (default: %(default)s).",
+        )
+        parser.add_argument("--people", type=int, default=2000, help="Load test people to seed (default: 2000).")
+        parser.add_argument("--timeout", type=int, default=30, help="Seconds before a request counts as timed out.")
+        parser.add_argument("--json", type=str, help="Also write the report to this JSON file.")
+        parser.add_argument("--seed-only", action="store_true", help="Seed the load test data and exit.")
+        parser.add_argument("--keep-data", action="store_true", help="Don't delete the load test data afterwards.")
+        parser.add_argument("--cleanup", action="store_true", help="Delete the load test data and exit.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            count = cleanup_loadtest_data()
+            self.stdout.write(self.style.SUCCESS(f"Deleted load test data ({count} people)."))
+            return
+
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        if options["users"] < 1 or options["duration"] < 1:
+            raise CommandError("--users and --duration must be at least 1.")
+
+        seed = seed_loadtest_data(options["people"])
+        self.stdout.write(f"Seeded {len(seed['people'])} people and event {seed['event_id']}.")
+        if options["seed_only"]:
+            self.stdout.write(self.style.WARNING(f"Load test user '{seed['username']}' password: {seed['password']}"))
+            return
+
+        server = None
+        try:
+            if options["url"]:
+                parts = urlsplit(options["url"])
+                host, port = parts.hostname or "127.0.0.1", parts.port or 80
+            else:
+                host, port = "127.0.0.1", _free_port()
+                server = self._start_server(options["server"], host, port)
+
+            self.stdout.write(
+                f"Running {options['users']} users for {options['duration']}s against http://{host}:{port} ..."
+            )
+            load_test = LoadTest(
+                host, port, seed, mix,
+                users=options["users"], duration=options["duration"], timeout=options["timeout"],
+            )
+            try:
+                report = asyncio.run(load_test.run())
+            except (RequestFailed, asyncio.TimeoutError) as exc:
+                raise CommandError(f"Load test could not start: {exc}") from exc
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            if not options["keep_data"]:
+                cleanup_loadtest_data()
+
+        self._print_report(report, load_test.elapsed)
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as fileobj:
+                json.dump({"duration": load_test.elapsed, "users": options["users"], "endpoints": report}, fileobj, indent=2)
+            self.stdout.write(f"Report written to {options['json']}")
+
+    def _start_server(self, kind, host, port):
+        if kind == "uvicorn":
+            if importlib.util.find_spec("uvicorn") is None:
+                raise CommandError("uvicorn is not installed (pip install uvicorn).")
+            command = [sys.executable, "-m", "uvicorn", "gathering_project.asgi:application", "--host", host, "--port", str(port)]
+        else:
+            command = [sys.executable, "manage.py", "runserver", "--noreload", f"{host}:{port}"]
+        env = dict(os.environ, ALLOWED_HOSTS=f"{host},localhost")
+        server = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"{kind} exited with code {server.returncode}.")
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"{kind} did not start listening on {host}:{port}.")
+
+    def _print_report(self, report, elapsed):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'Endpoint':<15}{'Requests':>10}{'Req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>8}"
+        )
+        total = 0
+        for endpoint, stats in report.items():
+            errors = sum(stats["errors"].values())
+            total += stats["requests"]
+            self.stdout.write(
+                f"{endpoint:<15}{stats['requests']:>10}{stats['throughput']:>9.1f}"
+                f"{stats['p50']:>9.1f}{stats['p95']:>9.1f}{stats['p99']:>9.1f}{errors:>8}"
+            )
+        self.stdout.write(f"{'total':<15}{total:>10}{total / elapsed if elapsed else 0:>9.1f}")
+
+        self.stdout.write("")
+        for endpoint, stats in report.items():
+            outcomes = ", ".join(f"{name} {count}" for name, count in sorted(stats["outcomes"].items()))
+            self.stdout.write(f"{endpoint}: {outcomes or 'no successful requests'}")
+            if stats["errors"]:
+                errors = ", ".join(f"{name} {count}" for name, count in sorted(stats["errors"].items()))
+                self.stdout.write(self.style.ERROR(f"  errors: {errors}"))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
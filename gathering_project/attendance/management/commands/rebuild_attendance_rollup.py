@@ -0,0 +1,18 @@
+"""
+Rebuild the daily attendance rollup used by the attendance analytics.
+
+Usage:
+    python manage.py rebuild_attendance_rollup
+"""
+
+from django.core.management.base import BaseCommand
+
+from attendance.rollup import rebuild_daily_attendance
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyAttendance from the Attendance table."
+
+    def handle(self, *args, **options):
+        count = rebuild_daily_attendance()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily attendance row(s)."))
@@ -0,0 +1,24 @@
+"""
+Recompute every person's engagement counters from the attendance records.
+
+Counters are maintained as attendances are created and deleted; run this
+after importing or editing attendance outside the app.
+
+Usage:
+    python manage.py rebuild_engagement
+"""
+
+from django.core.management.base import BaseCommand
+
+from attendance.engagement import rebuild_engagement
+
+
+class Command(BaseCommand):
+    help = "Rebuild attendance counts, first/last attended dates and weekly streaks for all people."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="People updated per query.")
+
+    def handle(self, *args, **options):
+        updated = rebuild_engagement(chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt engagement counters for {updated} people."))
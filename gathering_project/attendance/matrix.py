@@ -0,0 +1,315 @@
+"""
+Attendance matrix - Who attended which event, as a NumPy boolean array.
+
+Rows are people and columns are closed events (active events dated before
+today) in date order. Questions like "who attended 3 of the last 4
+gatherings", churn risk or co-attendance become array operations instead
+of loops over Attendance objects.
+
+Each worker keeps the matrix in memory. The built matrix is also stored in
+the cache, bit-packed, under a shared version number, so other workers load
+it without querying. Events that close after a build are appended as new
+columns on the next lookup. Anything else that changes the matrix (check-ins
+on closed events, people, events) bumps the version, and workers rebuild on
+their next lookup.
+"""
+import threading
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from events.models import Event
+from people.models import Person
+
+from .models import Attendance
+
+VERSION_KEY = 'attendance:matrix:version'
+DATA_KEY = 'attendance:matrix:data'
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate():
+    """Tell every worker to rebuild the matrix on its next lookup."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        cache.incr(VERSION_KEY)
+
+
+def invalidate_for_attendance(event_dates, today=None):
+    """Rebuild the matrix if check-ins were added to or removed from closed events."""
+    today = today or timezone.localdate()
+    if any(event_date < today for event_date in event_dates):
+        invalidate()
+
+
+class AttendanceMatrix:
+    """
+    People x closed events attendance with index maps both ways.
+
+    Query methods take `last` (only the most recent N events) and
+    `event_type` (e.g. 'weekly') to choose the columns, and return person
+    ids so callers can load the people they need with in_bulk().
+    """
+
+    def __init__(self, person_ids, active, events, attended, closed_before):
+        """
+        Args:
+            person_ids: list of person ids, one per row
+            active: bool array, whether each person is active
+            events: list of (event id, event date, event type), one per column
+            attended: bool array of shape (people, events)
+            closed_before: events dated before this day are included
+        """
+        self.person_ids = person_ids
+        self.person_index = {person_id: row for row, person_id in enumerate(person_ids)}
+        self.active = active
+        self.event_ids = [event[0] for event in events]
+        self.event_index = {event_id: column for column, event_id in enumerate(self.event_ids)}
+        self.event_dates = [event[1] for event in events]
+        self.event_types = np.array([event[2] for event in events], dtype=object)
+        self.attended = attended
+        self.closed_before = closed_before
+
+    @property
+    def shape(self):
+        return self.attended.shape
+
+    def columns(self, last=None, event_type=None):
+        """Return the column indexes of the chosen events, oldest first."""
+        columns = np.arange(self.attended.shape[1])
+        if event_type is not None:
+            columns = columns[self.event_types == event_type]
+        if last is not None:
+            columns = columns[len(columns) - min(last, len(columns)):]
+        return columns
+
+    def _rows(self, mask, active_only):
+        if active_only:
+            mask = mask & self.active
+        return np.flatnonzero(mask)
+
+    def _ids(self, rows):
+        return [self.person_ids[row] for row in rows]
+
+    def counts(self, last=None, event_type=None):
+        """Return the number of chosen events each person attended, by row."""
+        return self.attended[:, self.columns(last, event_type)].sum(axis=1)
+
+    def attended_at_least(self, times, last, event_type=None, active_only=True):
+        """Return the ids of people who attended `times` or more of the last `last` events."""
+        return self._ids(self._rows(self.counts(last, event_type) >= times, active_only))
+
+    def never_attended(self, active_only=True):
+        """Return the ids of people with no check-in at any closed event."""
+        return self._ids(self._rows(~self.attended.any(axis=1), active_only))
+
+    def streaks(self, event_type=None):
+        """
+        Return each person's current streak, by row.
+
+        A streak is the number of consecutive chosen events attended,
+        counting back from the most recent one.
+        """
+        missed = ~self.attended[:, self.columns(event_type=event_type)[::-1]]
+        if missed.shape[1] == 0:
+            # argmax fails on an empty axis
+            return np.zeros(missed.shape[0], dtype=int)
+        return np.where(missed.any(axis=1), missed.argmax(axis=1), missed.shape[1])
+
+    def rolling_rates(self, window, event_type=None):
+        """
+        Return the share of the trailing `window` events each person attended.
+
+        Returns:
+            float array of shape (people, events - window + 1); column j
+            covers chosen events j to j + window - 1
+        """
+        selected = self.attended[:, self.columns(event_type=event_type)]
+        if window < 1 or selected.shape[1] < window:
+            return np.zeros((selected.shape[0], 0))
+        totals = np.zeros((selected.shape[0], selected.shape[1] + 1), dtype=np.int32)
+        np.cumsum(selected, axis=1, out=totals[:, 1:])
+        return (totals[:, window:] - totals[:, :-window]) / window
+
+    def top_attendees(self, limit=10, last=None, event_type=None, active_only=True):
+        """Return [(person id, events attended)], most first."""
+        counts = self.counts(last, event_type)
+        if active_only:
+            counts = np.where(self.active, counts, 0)
+        return [(self.person_ids[row], int(counts[row])) for row in _top(counts, limit) if counts[row] > 0]
+
+    def top_streaks(self, limit=10, event_type=None, active_only=True):
+        """Return [(person id, current streak)], longest first."""
+        streaks = self.streaks(event_type)
+        if active_only:
+            streaks = np.where(self.active, streaks, 0)
+        return [(self.person_ids[row], int(streaks[row])) for row in _top(streaks, limit) if streaks[row] > 0]
+
+    def churn_risk(self, recent=4, baseline=8, min_rate=0.5, event_type=None, limit=None):
+        """
+        Return active people who used to attend but have missed every recent event.
+
+        A person is at risk when they attended at least `min_rate` of the
+        `baseline` events before the last `recent` events, and none of the
+        last `recent`.
+
+        Returns:
+            list of (person id, baseline attendance rate), highest rate first
+        """
+        columns = self.columns(last=recent + baseline, event_type=event_type)
+        if len(columns) <= recent:
+            return []
+        selected = self.attended[:, columns]
+        earlier, latest = selected[:, :-recent], selected[:, -recent:]
+        rates = earlier.sum(axis=1) / earlier.shape[1]
+        rows = self._rows((rates >= min_rate) & ~latest.any(axis=1), active_only=True)
+        rows = rows[np.argsort(-rates[rows], kind='stable')][:limit]
+        return [(self.person_ids[row], float(rates[row])) for row in rows]
+
+    def co_attendance(self, person_id, limit=5):
+        """
+        Return the people who most often attended the same events as person_id.
+
+        Returns:
+            list of (person id, shared events), most first
+        """
+        row = self.person_index.get(person_id)
+        if row is None:
+            return []
+        attended = self.attended[row]
+        shared = self.attended[:, attended].sum(axis=1)
+        shared[row] = 0
+        return [(self.person_ids[other], int(shared[other])) for other in _top(shared, limit) if shared[other] > 0]
+
+    def to_cache(self, version):
+        """Return a picklable, bit-packed copy tagged with version."""
+        return {
+            'version': version,
+            'person_ids': self.person_ids,
+            'active': np.packbits(self.active),
+            'events': list(zip(self.event_ids, self.event_dates, self.event_types.tolist())),
+            'attended': np.packbits(self.attended, axis=1),
+            'closed_before': self.closed_before,
+        }
+
+    @classmethod
+    def from_cache(cls, data):
+        people, events = len(data['person_ids']), len(data['events'])
+        return cls(
+            data['person_ids'],
+            np.unpackbits(data['active'], count=people).astype(bool),
+            data['events'],
+            np.unpackbits(data['attended'], axis=1, count=events).astype(bool).reshape(people, events),
+            data['closed_before'],
+        )
+
+
+def _top(values, limit):
+    """Return the row indexes of the `limit` largest values, largest first."""
+    if limit is None or limit >= len(values):
+        return np.argsort(-values, kind='stable')
+    rows = np.argpartition(-values, limit)[:limit]
+    return rows[np.argsort(-values[rows], kind='stable')]
+
+
+def _closed_events(start=None, end=None):
+    """Return [(id, date, type)] of active events dated from start up to (not including) end."""
+    events = Event.objects.filter(is_active=True, event_date__lt=end)
+    if start is not None:
+        events = events.filter(event_date__gte=start)
+    return list(events.order_by('event_date', 'event_time', 'pk').values_list('id', 'event_date', 'event_type'))
+
+
+def _fill(attended, person_index, event_index, event_ids):
+    """Set the cells of every check-in at the given events; returns the number set."""
+    pairs = Attendance.objects.filter(event_id__in=event_ids).values_list('person_id', 'event_id')
+    rows, columns = [], []
+    for person_id, event_id in pairs.iterator(chunk_size=5000):
+        row = person_index.get(person_id)
+        if row is not None:
+            rows.append(row)
+            columns.append(event_index[event_id])
+    attended[np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)] = True
+    return len(rows)
+
+
+def build_matrix(today=None):
+    """Build the matrix from the database."""
+    today = today or timezone.localdate()
+    people = list(Person.objects.order_by('pk').values_list('id', 'is_active'))
+    events = _closed_events(end=today)
+    person_ids = [person_id for person_id, is_active in people]
+    active = np.array([is_active for person_id, is_active in people], dtype=bool)
+    matrix = AttendanceMatrix(person_ids, active, events, np.zeros((len(people), len(events)), dtype=bool), today)
+    _fill(matrix.attended, matrix.person_index, matrix.event_index, matrix.event_ids)
+    return matrix
+
+
+def append_closed_events(matrix, today=None):
+    """Return a matrix with columns added for events that closed since it was built."""
+    today = today or timezone.localdate()
+    events = _closed_events(start=matrix.closed_before, end=today)
+    columns = np.zeros((matrix.attended.shape[0], len(events)), dtype=bool)
+    if events:
+        _fill(columns, matrix.person_index, {event[0]: column for column, event in enumerate(events)},
+              [event[0] for event in events])
+    existing = list(zip(matrix.event_ids, matrix.event_dates, matrix.event_types.tolist()))
+    return AttendanceMatrix(
+        matrix.person_ids, matrix.active, existing + events, np.hstack([matrix.attended, columns]), today
+    )
+
+
+class MatrixStore:
+    """This worker's copy of the matrix, refreshed from the cache or database as needed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._matrix = None
+
+    def get(self, today=None):
+        """Return a current AttendanceMatrix."""
+        today = today or timezone.localdate()
+        with self._lock:
+            # Read the version before any query, so a change made during a
+            # build is never stored under the version that follows it
+            version = _shared_version()
+            matrix = self._matrix if self._version == version else None
+            if matrix is None:
+                data = cache.get(DATA_KEY)
+                if data is not None and data['version'] == version:
+                    matrix = AttendanceMatrix.from_cache(data)
+            changed = False
+            if matrix is None:
+                matrix = build_matrix(today)
+                changed = True
+            elif matrix.closed_before < today:
+                matrix = append_closed_events(matrix, today)
+                changed = True
+            if changed:
+                cache.set(DATA_KEY, matrix.to_cache(version), None)
+            self._matrix, self._version = matrix, version
+            return matrix
+
+    def clear(self):
+        """Forget this worker's copy; the next lookup reloads it."""
+        with self._lock:
+            self._matrix, self._version = None, None
+
+
+store = MatrixStore()
+
+
+def get_matrix(today=None):
+    """Return the current attendance matrix."""
+    return store.get(today)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-generated key of the scan that created this record (batch check-in API)', max_length=64, null=True, unique=True),
+        ),
+    ]
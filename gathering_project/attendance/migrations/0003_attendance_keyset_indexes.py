@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendance_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['check_in_time', 'id'], name='attendance_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['event', 'check_in_time', 'id'], name='attendance_event_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:28
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_daily_attendance(apps, schema_editor):
+    """Build DailyAttendance from the existing attendance records."""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    DailyAttendance = apps.get_model('attendance', 'DailyAttendance')
+    rows = (
+        Attendance.objects.annotate(day=TruncDate('check_in_time'))
+        .values('day', 'event_id', 'check_in_method')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    DailyAttendance.objects.bulk_create(
+        [
+            DailyAttendance(day=row['day'], event_id=row['event_id'], check_in_method=row['check_in_method'], count=row['count'])
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_topic'),
+        ('attendance', '0003_attendance_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('check_in_method', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='events.event')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily attendance',
+                'ordering': ['-day', 'event', 'check_in_method'],
+                'unique_together': {('day', 'event', 'check_in_method')},
+            },
+        ),
+        migrations.RunPython(fill_daily_attendance, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,80 @@
-from django.db import models
+from collections import Counter
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from people.models import Person
 from events.models import Event
 
 
+# Marks an Attendance whose stored bucket is not known (e.g. built by hand)
+_UNKNOWN_ROLLUP_KEY = object()
+
+
+def _rollup_key(attendance):
+    """The DailyAttendance bucket an attendance falls in."""
+    return (timezone.localdate(attendance.check_in_time), attendance.event_id, attendance.check_in_method)
+
+
+class DailyAttendance(models.Model):
+    """
+    Number of check-ins per local day, event and check-in method.
+    
+    Kept up to date as attendances are created, changed or deleted, so the
+    attendance analytics never have to scan the Attendance table.
+    Rebuild with: python manage.py rebuild_attendance_rollup
+    """
+    
+    day = models.DateField()
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='daily_attendance')
+    check_in_method = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'event', 'check_in_method']
+        ordering = ['-day', 'event', 'check_in_method']
+        verbose_name_plural = 'Daily attendance'
+    
+    def __str__(self):
+        return f"{self.day} {self.event_id} {self.check_in_method}: {self.count}"
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Add deltas to the counters.
+        
+        Args:
+            deltas: dict mapping (day, event_id, check_in_method) to the change in count
+        """
+        for (day, event_id, method), delta in deltas.items():
+            if not delta:
+                continue
+            rows = cls.objects.filter(day=day, event_id=event_id, check_in_method=method)
+            if rows.update(count=F('count') + delta) or delta < 0:
+                # A missing row on removal means the event itself is being deleted
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(day=day, event_id=event_id, check_in_method=method, count=delta)
+            except IntegrityError:
+                # Another process created the row first
+                rows.update(count=F('count') + delta)
+
+
+class AttendanceQuerySet(models.QuerySet):
+    """Keeps DailyAttendance in step with bulk inserts."""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            DailyAttendance.apply_deltas(Counter(_rollup_key(obj) for obj in created))
+        for obj in created:
+            obj._original_rollup_key = _rollup_key(obj)
+        return created
+
+
 class Attendance(models.Model):
     """Model to track attendance records."""
     
@@ -25,11 +96,109 @@ class Attendance(models.Model):
         related_name='checked_in_records'
     )
     notes = models.TextField(blank=True, null=True)
+    idempotency_key = models.CharField(
+        max_length=64,
+        unique=True,
+        blank=True,
+        null=True,
+        help_text='Client-generated key of the scan that created this record (batch check-in API)'
+    )
     
     class Meta:
         ordering = ['-check_in_time']
         unique_together = ['person', 'event']  # Prevent duplicate check-ins
+        indexes = [
+            # Keyset pagination of attendance_list, overall and per event
+            models.Index(fields=['check_in_time', 'id'], name='attendance_time_id_idx'),
+            models.Index(fields=['event', 'check_in_time', 'id'], name='attendance_event_time_id_idx'),
+        ]
+    
+    objects = AttendanceQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.person.get_full_name()} - {self.event.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored bucket so a changed day, event or method is counted on save
+        if all(field in instance.__dict__ for field in ('check_in_time', 'event_id', 'check_in_method')):
+            instance._original_rollup_key = _rollup_key(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        original = None if adding else getattr(self, '_original_rollup_key', _UNKNOWN_ROLLUP_KEY)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'check_in_time', 'event', 'check_in_method'} & set(update_fields):
+            original = _UNKNOWN_ROLLUP_KEY  # Bucket isn't being written
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = _rollup_key(self)
+            if original is not _UNKNOWN_ROLLUP_KEY and original != current:
+                deltas = Counter({current: 1})
+                if original is not None:
+                    deltas[original] -= 1
+                DailyAttendance.apply_deltas(deltas)
+        self._original_rollup_key = current
+
+
+@receiver(post_save, sender=Attendance)
+def notify_live_attendance(sender, instance, created, **kwargs):
+    """Wake up live attendance streams for the event once the check-in is committed."""
+    if created:
+        from .live import notify_check_in
+        event_id = instance.event_id
+        transaction.on_commit(lambda: notify_check_in(event_id))
+
+
+@receiver(post_save, sender=Attendance)
+def count_attendance(sender, instance, created, raw=False, **kwargs):
+    """Add a new check-in to the person's engagement counters."""
+    if created and not raw:
+        from .engagement import record_attendance
+        record_attendance(instance.person_id, instance.event.event_date)
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_attendance(sender, instance, **kwargs):
+    """Recompute the person's engagement counters without the deleted check-in."""
+    from .engagement import refresh_engagement
+    refresh_engagement(instance.person_id)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_attendance_from_rollup(sender, instance, **kwargs):
+    """Take a deleted check-in out of DailyAttendance."""
+    DailyAttendance.apply_deltas({_rollup_key(instance): -1})
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_matrix(sender, instance, created, raw=False, **kwargs):
+    """Rebuild the attendance matrix when a closed event's check-ins change."""
+    from . import matrix
+    if created and not raw:
+        event_dates = [instance.event.event_date]
+        transaction.on_commit(lambda: matrix.invalidate_for_attendance(event_dates))
+    elif not created:
+        # The check-in may have moved to another person or event
+        transaction.on_commit(matrix.invalidate)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_from_attendance_matrix(sender, instance, **kwargs):
+    """Rebuild the attendance matrix when a closed event loses a check-in."""
+    from . import matrix
+    event_dates = [instance.event.event_date]
+    transaction.on_commit(lambda: matrix.invalidate_for_attendance(event_dates))
+
 
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def reshape_attendance_matrix(sender, **kwargs):
+    """Rebuild the attendance matrix when its rows (people) or columns (events) change."""
+    from . import matrix
+    transaction.on_commit(matrix.invalidate)
@@ -0,0 +1,76 @@
+"""
+Attendance rollup - Check-in counts read from DailyAttendance.
+
+DailyAttendance holds one row per local day, event and check-in method,
+so these totals cost a query over days and events, however many
+attendance records are stored. Days are grouped with TruncDate in the
+current time zone, which works the same on SQLite and PostgreSQL.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from .models import Attendance, DailyAttendance
+
+
+def get_event_totals():
+    """
+    Return check-ins per event for every event with any.
+
+    Returns:
+        dict mapping event id to count
+    """
+    rows = (
+        DailyAttendance.objects.values('event_id')
+        .annotate(total=Sum('count'))
+        .filter(total__gt=0)
+        .order_by()
+    )
+    return {row['event_id']: row['total'] for row in rows}
+
+
+def get_method_totals():
+    """Return [{'check_in_method', 'count'}], most used first."""
+    return list(
+        DailyAttendance.objects.values('check_in_method')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('-count', 'check_in_method')
+    )
+
+
+def get_daily_totals(start, end):
+    """
+    Return [{'day', 'count'}] for days from start to end inclusive that
+    have check-ins, oldest first.
+    """
+    return list(
+        DailyAttendance.objects.filter(day__gte=start, day__lte=end)
+        .values('day')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('day')
+    )
+
+
+def rebuild_daily_attendance():
+    """
+    Recompute DailyAttendance from the Attendance table.
+
+    Returns:
+        int: number of rollup rows written
+    """
+    rows = (
+        Attendance.objects.annotate(day=TruncDate('check_in_time'))
+        .values('day', 'event_id', 'check_in_method')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    counters = [
+        DailyAttendance(day=row['day'], event_id=row['event_id'], check_in_method=row['check_in_method'], count=row['count'])
+        for row in rows
+    ]
+    with transaction.atomic():
+        DailyAttendance.objects.all().delete()
+        DailyAttendance.objects.bulk_create(counters, batch_size=500)
+    return len(counters)
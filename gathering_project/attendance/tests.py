@@ -0,0 +1,252 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event
+from people.models import Person
+
+from dashboard.metrics import get_metrics
+
+from .listing import get_attendance_page, get_attendance_total
+from .matrix import MatrixStore, build_matrix, get_matrix, store
+from .models import Attendance, DailyAttendance
+from .writes import save_attendance
+
+
+class ConcurrentCheckInTests(TransactionTestCase):
+    """Check-in surges against the WAL / BEGIN IMMEDIATE SQLite backend."""
+
+    THREADS = 16
+    PEOPLE = 200
+
+    def setUp(self):
+        self.event = Event.objects.create(
+            name='Sunday Gathering', event_date=timezone.localdate(), event_time=time(10)
+        )
+        self.people = [
+            Person.objects.create(first_name=f'Person{i}', last_name='Test', phone_number=f'+23355{i:07d}')
+            for i in range(self.PEOPLE)
+        ]
+
+    def _check_in(self, person):
+        try:
+            save_attendance(Attendance(person=person, event=self.event, check_in_method='qr'))
+            return 'created'
+        except IntegrityError:
+            return 'duplicate'
+        finally:
+            connection.close()
+
+    def test_no_check_ins_are_lost(self):
+        # Everyone scans twice, so duplicates race the first check-in too
+        scans = self.people + self.people
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            results = list(pool.map(self._check_in, scans))
+
+        self.assertEqual(results.count('created'), self.PEOPLE)
+        self.assertEqual(results.count('duplicate'), self.PEOPLE)
+        self.assertEqual(Attendance.objects.filter(event=self.event).count(), self.PEOPLE)
+        # Counters written in the same transactions agree with the rows
+        self.assertEqual(DailyAttendance.objects.aggregate(total=Sum('count'))['total'], self.PEOPLE)
+        self.assertEqual(Person.objects.filter(attendance_count=1).count(), self.PEOPLE)
+
+
+class EmptyMatrixTests(TestCase):
+    """People registered before any event has closed."""
+
+    def setUp(self):
+        cache.clear()
+        store.clear()
+        # Only upcoming events, so the matrix has no columns
+        Event.objects.create(name='First Gathering', event_date=timezone.localdate(), event_time=time(10))
+        for i in range(3):
+            Person.objects.create(first_name=f'Person{i}', last_name='Test', phone_number=f'+23355{i:07d}')
+
+    def test_streaks_without_closed_events(self):
+        matrix = build_matrix()
+        self.assertEqual(matrix.shape, (3, 0))
+        self.assertEqual(matrix.streaks().tolist(), [0, 0, 0])
+        self.assertEqual(matrix.top_streaks(), [])
+
+    def test_streaks_panel_without_closed_events(self):
+        self.client.force_login(User.objects.create_user('staff', password='unused'))
+        response = self.client.get(reverse('dashboard:panel', args=['people', 'streaks']))
+        self.assertEqual(response.status_code, 200)
+
+
+class BatchCheckInTests(TestCase):
+    """The kiosk batch API (attendance.ingest)."""
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(
+            name='Sunday Gathering', event_date=timezone.localdate(), event_time=time(10)
+        )
+        self.people = [
+            Person.objects.create(first_name=f'Person{i}', last_name='Test', phone_number=f'+23355{i:07d}')
+            for i in range(3)
+        ]
+        self.client.force_login(User.objects.create_user('kiosk', password='unused'))
+
+    def _post(self, scans):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('attendance:check_in_batch'),
+                json.dumps({'event_id': self.event.pk, 'scans': scans}),
+                content_type='application/json',
+            )
+
+    def _statuses(self, response):
+        return [result['status'] for result in response.json()['results']]
+
+    def test_replayed_batch_returns_original_results(self):
+        scans = [
+            {'key': 'scan-1', 'person_id': str(self.people[0].pk)},
+            {'key': 'scan-2', 'person_id': self.people[1].qr_code, 'scanned_at': '2026-01-04T09:55:00Z'},
+            {'key': 'scan-3', 'person_id': 'no-such-person'},
+        ]
+        first = self._post(scans)
+        self.assertEqual(self._statuses(first), ['created', 'created', 'invalid'])
+
+        # The kiosk got no response and sends the same batch again
+        replay = self._post(scans)
+        self.assertEqual(self._statuses(replay), ['replayed', 'replayed', 'invalid'])
+        self.assertTrue(all(result['success'] for result in replay.json()['results'][:2]))
+        self.assertEqual(replay.json()['created'], 0)
+
+        # Each check-in is stored and counted once
+        self.assertEqual(Attendance.objects.count(), 2)
+        self.assertEqual(
+            Attendance.objects.get(idempotency_key='scan-2').check_in_time,
+            datetime(2026, 1, 4, 9, 55, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(DailyAttendance.objects.aggregate(total=Sum('count'))['total'], 2)
+        self.assertEqual(Person.objects.filter(attendance_count=1).count(), 2)
+        self.assertEqual(get_metrics()['total_attendance'], 2)
+
+    def test_new_key_for_a_checked_in_person_is_already_checked_in(self):
+        self._post([{'key': 'scan-1', 'person_id': str(self.people[0].pk)}])
+        response = self._post([
+            {'key': 'scan-2', 'person_id': str(self.people[0].pk)},
+            {'key': 'scan-3', 'person_id': str(self.people[1].pk)},
+            {'key': 'scan-3', 'person_id': str(self.people[1].pk)},
+        ])
+        self.assertEqual(self._statuses(response), ['already_checked_in', 'created', 'replayed'])
+        self.assertEqual(Attendance.objects.count(), 2)
+
+    @override_settings(ATTENDANCE_BATCH_MAX_SCANS=2)
+    def test_oversized_batch_is_rejected(self):
+        response = self._post([{'key': f'scan-{i}', 'person_id': str(person.pk)} for i, person in enumerate(self.people)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Attendance.objects.count(), 0)
+
+
+class AttendancePageTests(TestCase):
+    """Keyset pagination of the attendance list (attendance.listing)."""
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(
+            name='Sunday Gathering', event_date=timezone.localdate(), event_time=time(10)
+        )
+        # Pairs of check-ins share a timestamp, so pages must break ties on id
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(7):
+            person = Person.objects.create(first_name=f'Person{i}', last_name='Test', phone_number=f'+23355{i:07d}')
+            Attendance.objects.create(person=person, event=self.event, check_in_time=start + timedelta(minutes=i // 2))
+        self.newest_first = list(Attendance.objects.order_by('-check_in_time', '-pk').values_list('pk', flat=True))
+
+    def _ids(self, page):
+        return [attendance.pk for attendance in page['rows']]
+
+    def test_pages_forward_and_back_without_gaps(self):
+        pages = [get_attendance_page(Attendance.objects.all(), page_size=3)]
+        while pages[-1]['next_cursor']:
+            pages.append(get_attendance_page(Attendance.objects.all(), after=pages[-1]['next_cursor'], page_size=3))
+        self.assertEqual([len(page['rows']) for page in pages], [3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in self._ids(page)], self.newest_first)
+        self.assertIsNone(pages[0]['previous_cursor'])
+
+        back = get_attendance_page(Attendance.objects.all(), before=pages[2]['previous_cursor'], page_size=3)
+        self.assertEqual(self._ids(back), self._ids(pages[1]))
+        back = get_attendance_page(Attendance.objects.all(), before=back['previous_cursor'], page_size=3)
+        self.assertEqual(self._ids(back), self._ids(pages[0]))
+        self.assertIsNone(back['previous_cursor'])
+
+    def test_page_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(User.objects.create_user('staff', password='unused'))
+        get_attendance_total(Attendance.objects.all())
+        with self.assertNumQueries(3):  # session, user, page (the total is cached)
+            self.client.get(reverse('attendance:list'))
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        self.client.force_login(User.objects.create_user('staff', password='unused'))
+        response = self.client.get(reverse('attendance:list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([attendance.pk for attendance in response.context['attendances']], self.newest_first)
+
+    def test_total_updates_on_the_next_check_in(self):
+        self.assertEqual(get_attendance_total(Attendance.objects.all()), 7)
+        person = Person.objects.create(first_name='Late', last_name='Test', phone_number='+233559999999')
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(person=person, event=self.event)
+        self.assertEqual(get_attendance_total(Attendance.objects.all()), 8)
+
+
+class MatrixCacheTests(TestCase):
+    """The shared, versioned attendance matrix (attendance.matrix)."""
+
+    def setUp(self):
+        cache.clear()
+        store.clear()
+        self.today = timezone.localdate()
+        self.events = [
+            Event.objects.create(name=f'Week {i}', event_date=self.today - timedelta(days=7 * (3 - i)), event_time=time(10))
+            for i in range(3)
+        ]
+        self.people = [
+            Person.objects.create(first_name=f'Person{i}', last_name='Test', phone_number=f'+23355{i:07d}')
+            for i in range(3)
+        ]
+        # Person0 came every week, Person1 only to the first one
+        for event in self.events:
+            Attendance.objects.create(person=self.people[0], event=event)
+        Attendance.objects.create(person=self.people[1], event=self.events[0])
+
+    def test_queries(self):
+        matrix = get_matrix(self.today)
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(matrix.top_streaks(), [(self.people[0].pk, 3)])
+        self.assertEqual(matrix.attended_at_least(2, last=3), [self.people[0].pk])
+        self.assertEqual(matrix.never_attended(), [self.people[2].pk])
+
+    def test_other_workers_load_the_matrix_from_the_cache(self):
+        built = get_matrix(self.today)
+        with self.assertNumQueries(0):
+            loaded = MatrixStore().get(self.today)
+        self.assertEqual(loaded.person_ids, built.person_ids)
+        self.assertEqual(loaded.attended.tolist(), built.attended.tolist())
+
+    def test_check_in_on_a_closed_event_rebuilds_the_matrix(self):
+        get_matrix(self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(person=self.people[2], event=self.events[2])
+        self.assertEqual(get_matrix(self.today).never_attended(), [])
+
+    def test_event_closing_is_appended_as_a_column(self):
+        get_matrix(self.today)
+        tonight = Event.objects.create(name='Tonight', event_date=self.today, event_time=time(19))
+        Attendance.objects.create(person=self.people[0], event=tonight)
+
+        matrix = get_matrix(self.today + timedelta(days=1))
+        self.assertEqual(matrix.shape, (3, 4))
+        self.assertEqual(matrix.event_ids[-1], tonight.pk)
+        self.assertEqual(matrix.top_streaks(), [(self.people[0].pk, 4)])
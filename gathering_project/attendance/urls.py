@@ -10,9 +10,12 @@ urlpatterns = [
     # Admin check-in (requires login)
     path('check-in/', views.check_in, name='check_in'),
     path('check-in/qr/', views.check_in_qr, name='check_in_qr'),
+    path('check-in/batch/', views.check_in_batch, name='check_in_batch'),
     path('search/', views.search_person, name='search_person'),
     path('', views.attendance_list, name='list'),
     path('event/<int:event_id>/', views.attendance_list, name='list_by_event'),
+    path('event/<int:event_id>/stream/', views.attendance_stream, name='stream'),
+    path('export/', views.attendance_export, name='export'),
     path('person/<uuid:person_id>/', views.person_attendance_history, name='person_history'),
 ]
 
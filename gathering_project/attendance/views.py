@@ -1,14 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
-from django.utils import timezone
-from datetime import timedelta
+from django.db import IntegrityError, OperationalError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_POST
+import json
+import logging
 from .models import Attendance
 from .forms import CheckInForm
+from .ingest import BatchError, ingest_scans
+from .export import EXPORT_FORMATS, build_xlsx_file, get_export_filename, get_export_queryset, stream_csv, XLSX_CONTENT_TYPE
+from .listing import get_attendance_page, get_attendance_total
+from .live import poll_check_ins, stream_check_ins
+from .matrix import get_matrix
+from .writes import BUSY_MESSAGE, is_lock_error, save_attendance
 from people.models import Person
+from people.roster import roster
 from events.models import Event
+from events.cache import get_check_in_events, get_active_event
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
@@ -17,46 +30,17 @@ def self_check_in(request):
     error_message = None
     success_message = None
     
-    # Get event from query parameter (from QR code)
-    event_from_qr = None
+    # Upcoming events and the default (next Saturday's) event are cached per day
+    check_in_events = get_check_in_events()
+    upcoming_events = check_in_events['upcoming_events']
+    default_event = check_in_events['default_event']
+    
+    # Event from query parameter (from QR code) takes priority
     event_id_param = request.GET.get('event')
     if event_id_param:
-        try:
-            event_from_qr = Event.objects.get(pk=event_id_param, is_active=True)
-        except (Event.DoesNotExist, ValueError):
-            pass
-    
-    # Get upcoming events
-    upcoming_events = Event.objects.filter(
-        is_active=True,
-        event_date__gte=timezone.now().date()
-    ).order_by('event_date', 'event_time')[:5]
-    
-    # Find the next upcoming Saturday event
-    today = timezone.now().date()
-    days_until_saturday = (5 - today.weekday()) % 7  # Saturday is weekday 5
-    
-    # If today is Saturday, check today first, otherwise get next Saturday
-    if days_until_saturday == 0:  # Today is Saturday
-        next_saturday = today
-    else:
-        next_saturday = today + timedelta(days=days_until_saturday)
-    
-    # Try to find an event on the next Saturday
-    default_event = None
-    saturday_events = Event.objects.filter(
-        is_active=True,
-        event_date=next_saturday
-    ).order_by('event_time').first()
-    
-    # Priority: event from QR code > Saturday event > first upcoming event
-    if event_from_qr:
-        default_event = event_from_qr
-    elif saturday_events:
-        default_event = saturday_events
-    elif upcoming_events.exists():
-        # If no Saturday event found, use the first upcoming event
-        default_event = upcoming_events.first()
+        event_from_qr = get_active_event(event_id_param, check_in_events)
+        if event_from_qr:
+            default_event = event_from_qr
     
     if request.method == 'POST':
         phone_number = request.POST.get('phone_number', '').strip()
@@ -68,27 +52,39 @@ def self_check_in(request):
             error_message = "Please select an event."
         else:
             try:
-                # Find person by phone number
-                person = Person.objects.get(phone_number=phone_number, is_active=True)
-                event = Event.objects.get(pk=event_id, is_active=True)
+                # Find person by phone number (from the in-memory roster)
+                person = roster.resolve_phone(phone_number)
+                if person is None or not person.is_active:
+                    raise Person.DoesNotExist
+                event = get_active_event(event_id, check_in_events)
+                if event is None:
+                    raise Event.DoesNotExist
                 
                 # Check if already checked in
-                if Attendance.objects.filter(person=person, event=event).exists():
+                if Attendance.objects.filter(person_id=person.id, event=event).exists():
                     error_message = f"You are already checked in for {event.name}."
                 else:
                     # Create attendance record
-                    Attendance.objects.create(
-                        person=person,
+                    save_attendance(Attendance(
+                        person_id=person.id,
                         event=event,
                         check_in_method='manual',
                         checked_in_by=None  # Self check-in
-                    )
-                    success_message = f"Successfully checked in for {event.name}! Welcome, {person.get_full_name()}."
+                    ))
+                    success_message = f"Successfully checked in for {event.name}! Welcome, {person.name}."
                     
             except Person.DoesNotExist:
                 error_message = "Phone number not found. Please register first or contact administrator."
             except Event.DoesNotExist:
                 error_message = "Invalid event selected."
+            except IntegrityError:
+                # Checked in by another request since the check above
+                error_message = f"You are already checked in for {event.name}."
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                logger.warning(f"Self check-in gave up waiting for the database: {str(e)}")
+                error_message = BUSY_MESSAGE
             except Exception as e:
                 error_message = "An error occurred. Please try again or contact administrator."
     
@@ -109,9 +105,18 @@ def check_in(request):
         if form.is_valid():
             attendance = form.save(commit=False)
             attendance.checked_in_by = request.user
-            attendance.save()
-            messages.success(request, f'{attendance.person.get_full_name()} checked in successfully!')
-            return redirect('attendance:check_in')
+            try:
+                save_attendance(attendance)
+            except IntegrityError:
+                form.add_error(None, f'{attendance.person.get_full_name()} is already checked in for this event.')
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                logger.warning(f"Check-in gave up waiting for the database: {str(e)}")
+                form.add_error(None, BUSY_MESSAGE)
+            else:
+                messages.success(request, f'{attendance.person.get_full_name()} checked in successfully!')
+                return redirect('attendance:check_in')
     else:
         form = CheckInForm()
     
@@ -139,12 +144,10 @@ def check_in_qr(request):
             })
         
         try:
-            # Try to get person by ID (UUID) or by qr_code field
-            try:
-                person = Person.objects.get(pk=person_id)
-            except Person.DoesNotExist:
-                # Try finding by qr_code field as fallback
-                person = Person.objects.get(qr_code=person_id)
+            # Resolve the QR code or person ID from the in-memory roster
+            person = roster.resolve(person_id)
+            if person is None:
+                raise Person.DoesNotExist
             
             event = Event.objects.get(pk=event_id)
             
@@ -152,27 +155,27 @@ def check_in_qr(request):
             if not person.is_active:
                 return JsonResponse({
                     'success': False,
-                    'message': f'{person.get_full_name()} is not active.'
+                    'message': f'{person.name} is not active.'
                 })
             
             # Check if already checked in
-            if Attendance.objects.filter(person=person, event=event).exists():
+            if Attendance.objects.filter(person_id=person.id, event=event).exists():
                 return JsonResponse({
                     'success': False,
-                    'message': f'{person.get_full_name()} is already checked in for this event.'
+                    'message': f'{person.name} is already checked in for this event.'
                 })
             
             # Create attendance record
-            attendance = Attendance.objects.create(
-                person=person,
+            save_attendance(Attendance(
+                person_id=person.id,
                 event=event,
                 check_in_method='qr',
                 checked_in_by=request.user
-            )
+            ))
             
             return JsonResponse({
                 'success': True,
-                'message': f'{person.get_full_name()} checked in successfully!'
+                'message': f'{person.name} checked in successfully!'
             })
         except Person.DoesNotExist:
             return JsonResponse({
@@ -184,6 +187,21 @@ def check_in_qr(request):
                 'success': False,
                 'message': 'Event not found.'
             })
+        except IntegrityError:
+            # Checked in by another scanner since the check above
+            return JsonResponse({
+                'success': False,
+                'message': f'{person.name} is already checked in for this event.'
+            })
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            logger.warning(f"QR check-in gave up waiting for the database: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'busy': True,
+                'message': BUSY_MESSAGE
+            })
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -193,17 +211,42 @@ def check_in_qr(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method.'})
 
 
+@login_required
+@require_POST
+def check_in_batch(request):
+    """
+    Record a batch of kiosk scans (JSON API).
+
+    Expects {"event_id": ..., "scans": [{"key", "person_id", "event_id",
+    "scanned_at"}, ...]} and returns one result per scan, in order. Scans
+    are idempotent on their key, so a kiosk can safely resend a batch it
+    got no response for.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON.'}, status=400)
+    
+    try:
+        results = ingest_scans(payload, user=request.user)
+    except BatchError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'created': sum(1 for result in results if result['status'] == 'created'),
+        'results': results,
+    })
+
+
 @login_required
 def search_person(request):
     """Search for a person by name or phone (for manual check-in)."""
     query = request.GET.get('q', '')
     if query:
-        people = Person.objects.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(phone_number__icontains=query)
-        )[:10]  # Limit to 10 results
-        results = [{'id': str(p.id), 'name': p.get_full_name(), 'phone': p.phone_number} for p in people]
+        # Name-prefix / phone-suffix search against the in-memory roster
+        people = roster.search(query, limit=10)
+        results = [{'id': str(p.id), 'name': p.name, 'phone': p.phone_number} for p in people]
     else:
         results = []
     
@@ -221,21 +264,119 @@ def attendance_list(request, event_id=None):
     else:
         event = None
     
+    # Keyset pagination: cost stays flat however much history there is
+    page = get_attendance_page(
+        attendances,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    
     context = {
-        'attendances': attendances,
+        'attendances': page['rows'],
+        'next_cursor': page['next_cursor'],
+        'previous_cursor': page['previous_cursor'],
+        'total_count': get_attendance_total(attendances, event.pk if event else None),
         'event': event,
     }
     return render(request, 'attendance/attendance_list.html', context)
 
 
+@login_required
+def attendance_export(request):
+    """
+    Download attendance as CSV or XLSX.
+    
+    Query parameters: format (csv or xlsx), event (id), start and end
+    (YYYY-MM-DD check-in dates). Rows are streamed, so large exports don't
+    load into memory.
+    """
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Format must be csv or xlsx.')
+    
+    event = None
+    if request.GET.get('event'):
+        if not request.GET['event'].isdigit():
+            return HttpResponseBadRequest('Invalid event.')
+        event = get_object_or_404(Event, pk=request.GET['event'])
+    
+    start = request.GET.get('start') or ''
+    end = request.GET.get('end') or ''
+    try:
+        start_date = parse_date(start)
+        end_date = parse_date(end)
+    except ValueError:
+        return HttpResponseBadRequest('Dates must be in YYYY-MM-DD format.')
+    # parse_date returns None for malformed input; don't silently export everything
+    if (start and start_date is None) or (end and end_date is None):
+        return HttpResponseBadRequest('Dates must be in YYYY-MM-DD format.')
+    
+    attendances = get_export_queryset(event, start_date, end_date)
+    filename = get_export_filename(event, start_date, end_date, file_format)
+    
+    if file_format == 'xlsx':
+        return FileResponse(
+            build_xlsx_file(attendances),
+            as_attachment=True,
+            filename=filename,
+            content_type=XLSX_CONTENT_TYPE
+        )
+    
+    response = StreamingHttpResponse(stream_csv(attendances), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def person_attendance_history(request, person_id):
     """View attendance history for a specific person."""
     person = get_object_or_404(Person, pk=person_id)
-    attendances = Attendance.objects.filter(person=person)
+    # Totals come from the person's engagement counters
+    attendances = Attendance.objects.filter(person=person).select_related('event')
+    
+    # People who most often attended the same events, from the attendance matrix
+    shared = get_matrix().co_attendance(person.pk, limit=5)
+    companions = Person.objects.in_bulk([person_id for person_id, count in shared])
+    attends_with = [
+        {'person': companions[person_id], 'events': count}
+        for person_id, count in shared if person_id in companions
+    ]
     
     context = {
         'person': person,
         'attendances': attendances,
+        'attends_with': attends_with,
     }
     return render(request, 'attendance/person_history.html', context)
+
+
+def attendance_stream(request, event_id):
+    """
+    Server-sent event stream of check-ins for an event.
+
+    Public so the QR display screen can show the running count; names are
+    only included for logged-in staff. Streams under ASGI; under WSGI each
+    request answers with the latest check-ins and the browser reconnects
+    every ATTENDANCE_STREAM_WSGI_POLL_SECONDS.
+    """
+    event = get_object_or_404(Event, pk=event_id)
+    try:
+        since_id = int(request.headers.get('Last-Event-ID') or request.GET.get('since') or 0)
+    except ValueError:
+        since_id = 0
+    include_people = request.user.is_authenticated
+    
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            stream_check_ins(event.pk, since_id, include_people=include_people),
+            content_type='text/event-stream'
+        )
+    else:
+        # WSGI would buffer the async stream and tie up a worker thread
+        response = HttpResponse(
+            poll_check_ins(event.pk, since_id, include_people=include_people),
+            content_type='text/event-stream'
+        )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
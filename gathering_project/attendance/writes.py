@@ -0,0 +1,72 @@
+"""
+Check-in writes - Saving attendances under write contention.
+
+SQLite allows one writer at a time. Connections wait up to the busy
+timeout for the write lock (see gathering_project.sqlite_backend), and the
+check-in paths retry a few more times on top of that before reporting the
+database as busy, so an event-day surge queues up instead of losing
+check-ins.
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = 'The system is busy right now. Please try again in a moment.'
+
+
+def is_lock_error(exc):
+    """Return True if exc is SQLite reporting the database as locked or busy."""
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def retry_on_lock(func, *args, **kwargs):
+    """
+    Call func, retrying with backoff while the database is locked.
+
+    func must do its writes in its own transaction so a failed attempt
+    leaves nothing behind. Inside an outer atomic block there is nothing
+    to retry, so the error is raised straight away.
+
+    Raises:
+        OperationalError: if the database is still locked after
+        ATTENDANCE_WRITE_RETRIES retries
+    """
+    retries = getattr(settings, 'ATTENDANCE_WRITE_RETRIES', 3)
+    delay = getattr(settings, 'ATTENDANCE_WRITE_RETRY_DELAY', 0.1)
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt >= retries or connection.in_atomic_block:
+                raise
+            attempt += 1
+            logger.info(f"Database locked on check-in write; retry {attempt} of {retries}")
+            # Jitter keeps waiting writers from all retrying at the same moment
+            time.sleep(delay * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+
+def save_attendance(attendance):
+    """
+    Insert a new Attendance and update its counters in one transaction,
+    retrying if the database is locked.
+
+    Raises:
+        IntegrityError: if the person is already checked in for the event
+        OperationalError: if the database stayed locked
+    """
+    def insert():
+        # Start over as a new row if an earlier attempt was rolled back
+        attendance.pk = None
+        attendance._state.adding = True
+        with transaction.atomic():
+            attendance.save(force_insert=True)
+        return attendance
+
+    return retry_on_lock(insert)
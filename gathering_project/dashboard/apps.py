@@ -6,3 +6,6 @@ class DashboardConfig(AppConfig):
     name = 'dashboard'
     verbose_name = 'Dashboard'
 
+    def ready(self):
+        # Keep the cached dashboard metrics in step with model changes
+        from . import signals  # noqa: F401
@@ -0,0 +1,18 @@
+"""
+Recompute every registration cohort used by the retention analytics.
+
+Usage:
+    python manage.py rebuild_retention
+"""
+
+from django.core.management.base import BaseCommand
+
+from dashboard.retention import rebuild_cohorts
+
+
+class Command(BaseCommand):
+    help = "Recompute RetentionCohort rows from the Person and Attendance tables."
+
+    def handle(self, *args, **options):
+        count = rebuild_cohorts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} retention cohort(s)."))
@@ -0,0 +1,212 @@
+"""
+Dashboard metrics - The numbers on the dashboard home, kept in the cache.
+
+Each total is its own cache counter, and registrations and check-ins also
+have one counter per day so "last 30 days" and "last 7 days" are sums of
+day counters. Model save/delete signals (see signals.py) adjust the
+counters as records change, and get_metrics() reads every counter plus
+the short lists on the page with one cache round trip.
+
+Counters can drift (bulk inserts skip signals, a write can race a
+reconcile), so a full recount runs whenever the reconciled marker expires,
+every DASHBOARD_METRICS_RECONCILE_SECONDS, or when a counter is missing.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from attendance.models import Attendance
+from events.models import Event
+from feedback.models import Feedback
+from people.models import Person
+
+PREFIX = 'dashboard:metrics:'
+RECONCILED_KEY = PREFIX + 'reconciled'
+LISTS_KEY = PREFIX + 'lists'
+
+TOTALS = ('total_people', 'total_events', 'total_attendance', 'pending_feedback')
+
+# Calendar days (including today) covered by the recent counts
+REGISTRATION_DAYS = 30
+ATTENDANCE_DAYS = 7
+
+# Day counters outlive the longest window, then expire on their own
+DAY_KEY_TIMEOUT = 60 * 60 * 24 * (REGISTRATION_DAYS + 2)
+
+# Rows in the upcoming events and recent registrations lists
+LIST_LIMIT = 5
+
+
+def _total_key(name):
+    return f'{PREFIX}{name}'
+
+
+def _day_key(kind, day):
+    return f'{PREFIX}{kind}:{day.isoformat()}'
+
+
+def _days(today, count):
+    return [today - timedelta(days=offset) for offset in range(count)]
+
+
+def get_metrics(today=None):
+    """
+    Return the dashboard home metrics.
+
+    Returns:
+        dict with the TOTALS, 'recent_registrations', 'recent_attendance',
+        'upcoming_events' and 'recent_people'
+    """
+    today = today or timezone.localdate()
+    registration_keys = [_day_key('registrations', day) for day in _days(today, REGISTRATION_DAYS)]
+    attendance_keys = [_day_key('attendance', day) for day in _days(today, ATTENDANCE_DAYS)]
+    total_keys = [_total_key(name) for name in TOTALS]
+
+    values = cache.get_many([RECONCILED_KEY, LISTS_KEY, *total_keys, *registration_keys, *attendance_keys])
+    if RECONCILED_KEY not in values or any(key not in values for key in total_keys):
+        return reconcile_metrics(today)
+
+    metrics = {name: values[_total_key(name)] for name in TOTALS}
+    metrics['recent_registrations'] = sum(values.get(key, 0) for key in registration_keys)
+    metrics['recent_attendance'] = sum(values.get(key, 0) for key in attendance_keys)
+
+    lists = values.get(LISTS_KEY)
+    if lists is None or lists['date'] != today:
+        lists = _build_lists(today)
+    metrics['upcoming_events'] = lists['upcoming_events']
+    metrics['recent_people'] = lists['recent_people']
+    return metrics
+
+
+def reconcile_metrics(today=None):
+    """
+    Recount every metric from the database and store the counters.
+
+    Returns:
+        dict in the same form as get_metrics()
+    """
+    today = today or timezone.localdate()
+    metrics = {
+        'total_people': Person.objects.filter(is_active=True).count(),
+        'total_events': Event.objects.count(),
+        'total_attendance': Attendance.objects.count(),
+        'pending_feedback': Feedback.objects.filter(status='new').count(),
+    }
+    registrations = _count_by_day(Person.objects.all(), 'date_registered', today, REGISTRATION_DAYS)
+    attendance = _count_by_day(Attendance.objects.all(), 'check_in_time', today, ATTENDANCE_DAYS)
+
+    cache.set_many({_total_key(name): metrics[name] for name in TOTALS}, None)
+    cache.set_many(
+        {
+            **{_day_key('registrations', day): count for day, count in registrations.items()},
+            **{_day_key('attendance', day): count for day, count in attendance.items()},
+        },
+        DAY_KEY_TIMEOUT,
+    )
+    cache.set(RECONCILED_KEY, timezone.now(), getattr(settings, 'DASHBOARD_METRICS_RECONCILE_SECONDS', 900))
+
+    metrics['recent_registrations'] = sum(registrations.values())
+    metrics['recent_attendance'] = sum(attendance.values())
+    lists = _build_lists(today)
+    metrics['upcoming_events'] = lists['upcoming_events']
+    metrics['recent_people'] = lists['recent_people']
+    return metrics
+
+
+def _count_by_day(queryset, field, today, days):
+    """Return {date: count} for the last `days` local days, zeros included."""
+    start = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time.min))
+    counts = {day: 0 for day in _days(today, days)}
+    rows = (
+        queryset.filter(**{f'{field}__gte': start})
+        .annotate(day=TruncDate(field))
+        .values('day')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    for row in rows:
+        if row['day'] in counts:
+            counts[row['day']] = row['count']
+    return counts
+
+
+def _build_lists(today):
+    next_week = today + timedelta(days=7)
+    lists = {
+        'date': today,
+        'upcoming_events': list(
+            Event.objects.filter(event_date__lte=next_week, event_date__gte=today, is_active=True)
+            .order_by('event_date', 'event_time')[:LIST_LIMIT]
+        ),
+        'recent_people': list(Person.objects.filter(is_active=True).order_by('-date_registered')[:LIST_LIMIT]),
+    }
+    cache.set(LISTS_KEY, lists, None)
+    return lists
+
+
+def invalidate_lists():
+    """Drop the cached upcoming events and recent registrations lists."""
+    cache.delete(LISTS_KEY)
+
+
+def apply_deltas(totals=None, registrations=None, attendance=None):
+    """
+    Adjust the counters.
+
+    Args:
+        totals: {total name: delta}
+        registrations: {date: delta} for registration day counters
+        attendance: {date: delta} for check-in day counters
+    """
+    if cache.get(RECONCILED_KEY) is None:
+        return  # Counters are stale or missing; the next read recounts them
+
+    for name, delta in (totals or {}).items():
+        if delta:
+            try:
+                cache.incr(_total_key(name), delta)
+            except ValueError:
+                cache.delete(RECONCILED_KEY)
+                return
+    for kind, deltas in (('registrations', registrations), ('attendance', attendance)):
+        for day, delta in (deltas or {}).items():
+            if not delta:
+                continue
+            key = _day_key(kind, day)
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                # First record of a new day; older days have aged out of the windows
+                if delta > 0:
+                    cache.add(key, 0, DAY_KEY_TIMEOUT)
+                    cache.incr(key, delta)
+
+
+def count_check_ins(attendances):
+    """Add attendances created without signals (e.g. by bulk_create)."""
+    attendance = {}
+    for item in attendances:
+        day = timezone.localdate(item.check_in_time)
+        attendance[day] = attendance.get(day, 0) + 1
+    if attendance:
+        apply_deltas({'total_attendance': sum(attendance.values())}, attendance=attendance)
+
+
+def refresh_people_metrics(today=None):
+    """Recount the people metrics after a person was edited."""
+    if cache.get(RECONCILED_KEY) is None:
+        return
+    today = today or timezone.localdate()
+    registrations = _count_by_day(Person.objects.all(), 'date_registered', today, REGISTRATION_DAYS)
+    cache.set(_total_key('total_people'), Person.objects.filter(is_active=True).count(), None)
+    cache.set_many({_day_key('registrations', day): count for day, count in registrations.items()}, DAY_KEY_TIMEOUT)
+
+
+def refresh_feedback_metrics():
+    """Recount pending feedback after a feedback's status may have changed."""
+    if cache.get(RECONCILED_KEY) is not None:
+        cache.set(_total_key('pending_feedback'), Feedback.objects.filter(status='new').count(), None)
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionCohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort', models.DateField(help_text='First day of the registration month', unique=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('retained', models.JSONField(default=list)),
+                ('is_stale', models.BooleanField(default=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-cohort'],
+            },
+        ),
+    ]
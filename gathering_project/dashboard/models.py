@@ -1,3 +1,27 @@
-# Dashboard app doesn't need models - it displays data from other apps
-# All analytics are calculated from existing models
+from django.db import models
 
+# Most dashboard analytics are calculated from the other apps' models; the
+# models here only store results that are too costly to compute per request
+
+
+class RetentionCohort(models.Model):
+    """
+    Retention of the people who registered in one month.
+    
+    retained[k] is how many of them attended an event k months after the
+    month they registered (k = 0 is the registration month itself).
+    Computed by dashboard.retention; check-ins and registrations mark the
+    cohorts they affect as stale so only those are recomputed.
+    """
+    
+    cohort = models.DateField(unique=True, help_text='First day of the registration month')
+    size = models.PositiveIntegerField(default=0)
+    retained = models.JSONField(default=list)
+    is_stale = models.BooleanField(default=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-cohort']
+    
+    def __str__(self):
+        return f"Cohort {self.cohort:%Y-%m}: {self.size} people"
@@ -0,0 +1,244 @@
+"""
+Dashboard panels - Each card on the dashboard pages as its own JSON fragment.
+
+The dashboard pages render only their layout, and the browser fetches every
+panel from views.panel in parallel, so one slow aggregation no longer holds
+up the rest of the page. A panel is a function returning its template
+context, registered with @panel(page, name) and rendered with
+templates/dashboard/panels/<page>/<name>.html.
+
+Rendered panels are cached one by one for DASHBOARD_PANEL_CACHE_SECONDS
+and served with an ETag, so a panel that hasn't changed is answered with
+304 Not Modified.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from attendance.matrix import get_matrix
+from attendance.models import Attendance
+from attendance.rollup import get_daily_totals, get_event_totals, get_method_totals
+from events.models import Event
+from people.models import Person
+
+from .metrics import get_metrics
+
+PREFIX = 'dashboard:panel:'
+
+# (page, name) -> (context function, cache seconds or None for the setting)
+PANELS = {}
+
+# People analytics: a regular attended REGULAR_MIN_EVENTS of the last
+# REGULAR_WINDOW events; someone who attended half of the CHURN_BASELINE_EVENTS
+# before that window but none in it is at risk
+REGULAR_MIN_EVENTS = 3
+REGULAR_WINDOW = 4
+CHURN_BASELINE_EVENTS = 8
+
+
+def panel(page, name, cache_seconds=None):
+    """Register a panel's context function."""
+    def register(func):
+        PANELS[(page, name)] = (func, cache_seconds)
+        return func
+    return register
+
+
+def render_panel(page, name):
+    """
+    Render a panel, or return it from the cache.
+
+    Returns:
+        tuple (JSON body, quoted ETag)
+
+    Raises:
+        KeyError: if no such panel is registered
+    """
+    func, cache_seconds = PANELS[(page, name)]
+    if cache_seconds is None:
+        cache_seconds = getattr(settings, 'DASHBOARD_PANEL_CACHE_SECONDS', 60)
+    key = f'{PREFIX}{page}:{name}'
+    rendered = cache.get(key) if cache_seconds else None
+    if rendered is None:
+        html = render_to_string(f'dashboard/panels/{page}/{name}.html', func())
+        body = json.dumps({'html': html})
+        rendered = (body, quote_etag(hashlib.md5(body.encode()).hexdigest()))
+        if cache_seconds:
+            cache.set(key, rendered, cache_seconds)
+    return rendered
+
+
+# Dashboard home: read from the metrics snapshot (metrics.py), which signals
+# keep current, so these are not cached again
+
+@panel('index', 'summary', cache_seconds=0)
+@panel('index', 'activity', cache_seconds=0)
+def index_metrics():
+    return get_metrics()
+
+
+@panel('index', 'upcoming_events', cache_seconds=0)
+def upcoming_events():
+    return {'upcoming_events': get_metrics()['upcoming_events']}
+
+
+@panel('index', 'recent_people', cache_seconds=0)
+def recent_people():
+    return {'recent_people': get_metrics()['recent_people']}
+
+
+# Attendance analytics: every count comes from the DailyAttendance rollup
+
+@panel('attendance', 'summary')
+def attendance_summary():
+    event_totals = get_event_totals()
+    total_attendance = sum(event_totals.values())
+    today = timezone.localdate()
+    recent_count = sum(day['count'] for day in get_daily_totals(today - timedelta(days=29), today))
+    return {
+        'total_attendance': total_attendance,
+        'recent_count': recent_count,
+        'avg_attendance': round(total_attendance / len(event_totals), 1) if event_totals else 0,
+        'events_tracked': len(event_totals),
+    }
+
+
+@panel('attendance', 'top_events')
+def top_events():
+    event_totals = get_event_totals()
+    top_event_ids = sorted(event_totals, key=event_totals.get, reverse=True)[:10]
+    events = Event.objects.in_bulk(top_event_ids)
+    event_attendance = []
+    for event_id in top_event_ids:
+        # Skip events deleted since the totals were read
+        event = events.get(event_id)
+        if event is None:
+            continue
+        event.attendance_count = event_totals[event_id]
+        event_attendance.append(event)
+    return {'event_attendance': event_attendance}
+
+
+@panel('attendance', 'check_in_methods')
+def check_in_methods():
+    methods = get_method_totals()
+    return {
+        'check_in_methods': methods,
+        'total_attendance': sum(method['count'] for method in methods),
+    }
+
+
+@panel('attendance', 'recent_checkins')
+def recent_checkins():
+    return {
+        'recent_checkins': Attendance.objects.select_related('person', 'event').only(
+            'check_in_time', 'check_in_method', 'person__first_name', 'person__last_name', 'event__name'
+        ).order_by('-check_in_time')[:10],
+    }
+
+
+@panel('attendance', 'trend')
+def attendance_trend():
+    # Last 30 days, including today
+    today = timezone.localdate()
+    attendance_by_day = get_daily_totals(today - timedelta(days=29), today)
+    return {
+        'attendance_by_day': attendance_by_day,
+        'recent_count': sum(day['count'] for day in attendance_by_day),
+    }
+
+
+# People analytics
+
+def _people_counts():
+    total_people = Person.objects.filter(is_active=True).count()
+    people_with_attendance = Person.objects.filter(attendance_count__gt=0).count()
+    return {
+        'total_people': total_people,
+        'recent_registrations': Person.objects.filter(
+            date_registered__gte=timezone.now() - timedelta(days=30)
+        ).count(),
+        'people_with_attendance': people_with_attendance,
+        'people_without_attendance': total_people - people_with_attendance,
+    }
+
+
+@panel('people', 'summary')
+def people_summary():
+    return _people_counts()
+
+
+@panel('people', 'overview')
+def people_overview():
+    counts = _people_counts()
+    counts['inactive_people'] = Person.objects.filter(is_active=False).count()
+    return counts
+
+
+@panel('people', 'active_attendees')
+def active_attendees():
+    return {
+        'active_attendees': Person.objects.filter(
+            attendance_count__gt=0, is_active=True
+        ).order_by('-attendance_count')[:10],
+    }
+
+
+@panel('people', 'notification_prefs')
+def notification_prefs():
+    return {
+        'notification_prefs': Person.objects.values('notification_preference').annotate(
+            count=Count('id')
+        ).order_by('-count'),
+        'total_people': Person.objects.filter(is_active=True).count(),
+    }
+
+
+@panel('people', 'at_risk')
+def at_risk():
+    # Attendance patterns over recent closed events, from the attendance matrix
+    matrix = get_matrix()
+    at_risk = matrix.churn_risk(recent=REGULAR_WINDOW, baseline=CHURN_BASELINE_EVENTS, limit=10)
+    people = Person.objects.in_bulk([person_id for person_id, rate in at_risk])
+    return {
+        'regulars': len(matrix.attended_at_least(REGULAR_MIN_EVENTS, last=REGULAR_WINDOW)),
+        'regular_min_events': REGULAR_MIN_EVENTS,
+        'regular_window': REGULAR_WINDOW,
+        'at_risk': [
+            {'person': people[person_id], 'percent': round(rate * 100)}
+            for person_id, rate in at_risk if person_id in people
+        ],
+    }
+
+
+@panel('people', 'streaks')
+def streaks():
+    streak_leaders = get_matrix().top_streaks(limit=10)
+    people = Person.objects.in_bulk([person_id for person_id, streak in streak_leaders])
+    return {
+        'streak_leaders': [
+            {'person': people[person_id], 'streak': streak}
+            for person_id, streak in streak_leaders if person_id in people
+        ],
+    }
+
+
+@panel('people', 'registration_trends')
+def registration_trends():
+    # Registration by month (last 6 months)
+    six_months_ago = timezone.now() - timedelta(days=180)
+    return {
+        'recent_registrations_by_month': Person.objects.filter(
+            date_registered__gte=six_months_ago
+        ).annotate(
+            month=TruncMonth('date_registered')
+        ).values('month').annotate(count=Count('id')).order_by('month'),
+    }
@@ -0,0 +1,213 @@
+"""
+Cohort retention - Of the people who registered in month M, how many
+attended in months M+1 .. M+RETENTION_PERIODS.
+
+Cohorts are stored as RetentionCohort rows. Refreshing recomputes only
+the cohorts that are missing or marked stale, with two grouped queries
+whatever their number: one for cohort sizes and one counting distinct
+attendees per (cohort, attendance month). A check-in in month X can only
+change cohorts X-RETENTION_PERIODS .. X, and a registration only its own
+cohort, so those are the rows the signals mark stale.
+
+Months are calendar months in the current time zone; attendance is dated
+by the event date.
+"""
+from datetime import date, datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, Min
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from attendance.models import Attendance
+from people.models import Person
+from .models import RetentionCohort
+
+# Months after registration tracked per cohort
+RETENTION_PERIODS = 6
+
+
+def month_start(day):
+    """Return the first day of the month a date (or datetime) falls in."""
+    if isinstance(day, datetime):
+        day = timezone.localdate(day)
+    return day.replace(day=1)
+
+
+def add_months(month, months):
+    """Return the first day of the month `months` after (or before) month."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(start, end):
+    """Return the number of whole months from start's month to end's month."""
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def mark_stale(cohorts):
+    """
+    Mark cohorts for recomputation.
+
+    Args:
+        cohorts: iterable of cohort months (first day of the month)
+    """
+    cohorts = set(cohorts)
+    if cohorts:
+        RetentionCohort.objects.filter(cohort__in=cohorts, is_stale=False).update(is_stale=True)
+
+
+def mark_all_stale():
+    """Mark every cohort for recomputation (after deletes and event date changes)."""
+    RetentionCohort.objects.filter(is_stale=False).update(is_stale=True)
+
+
+def mark_stale_for_attendance(event_dates):
+    """Mark the cohorts that attendance on these event dates can affect."""
+    cohorts = set()
+    for event_date in event_dates:
+        month = month_start(event_date)
+        cohorts.update(add_months(month, -offset) for offset in range(RETENTION_PERIODS + 1))
+    mark_stale(cohorts)
+
+
+def _aware_month_start(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def compute_cohorts(first, last):
+    """
+    Compute retention for every cohort from month first to month last.
+
+    Returns:
+        dict mapping cohort month to {'size': int, 'retained': list of ints}
+    """
+    registered = Person.objects.filter(
+        date_registered__gte=_aware_month_start(first),
+        date_registered__lt=_aware_month_start(add_months(last, 1)),
+    )
+    results = {}
+    month = first
+    while month <= last:
+        results[month] = {'size': 0, 'retained': [0] * (RETENTION_PERIODS + 1)}
+        month = add_months(month, 1)
+
+    sizes = (
+        registered.annotate(cohort=TruncMonth('date_registered', output_field=DateField()))
+        .values('cohort')
+        .annotate(size=Count('id'))
+        .order_by()
+    )
+    for row in sizes:
+        if row['cohort'] in results:
+            results[row['cohort']]['size'] = row['size']
+
+    returns = (
+        Attendance.objects.filter(person__in=registered.values('pk'))
+        .annotate(
+            cohort=TruncMonth('person__date_registered', output_field=DateField()),
+            month=TruncMonth('event__event_date'),
+        )
+        .values('cohort', 'month')
+        .annotate(people=Count('person_id', distinct=True))
+        .order_by()
+    )
+    for row in returns:
+        period = months_between(row['cohort'], row['month'])
+        if row['cohort'] in results and 0 <= period <= RETENTION_PERIODS:
+            results[row['cohort']]['retained'][period] = row['people']
+    return results
+
+
+def refresh_cohorts(first, last):
+    """
+    Recompute the missing and stale cohorts between first and last.
+
+    Returns:
+        int: number of cohorts recomputed
+    """
+    stored = {
+        row.cohort: row
+        for row in RetentionCohort.objects.filter(cohort__gte=first, cohort__lte=last)
+    }
+    pending = []
+    month = first
+    while month <= last:
+        row = stored.get(month)
+        if row is None or row.is_stale:
+            pending.append(month)
+        month = add_months(month, 1)
+    if not pending:
+        return 0
+
+    # Cleared before computing, so a check-in that lands meanwhile re-marks it
+    RetentionCohort.objects.filter(cohort__in=pending).update(is_stale=False)
+    results = compute_cohorts(min(pending), max(pending))
+    now = timezone.now()
+    for month in pending:
+        result = results[month]
+        # is_stale is left alone so a mark made during the computation sticks
+        updated = RetentionCohort.objects.filter(cohort=month).update(
+            size=result['size'], retained=result['retained'], computed_at=now
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    RetentionCohort.objects.create(
+                        cohort=month, size=result['size'], retained=result['retained'],
+                        is_stale=False, computed_at=now,
+                    )
+            except IntegrityError:
+                pass  # Another request stored it first
+    return len(pending)
+
+
+def rebuild_cohorts():
+    """
+    Recompute every cohort from the first registration to this month.
+
+    Returns:
+        int: number of cohorts computed
+    """
+    first = Person.objects.aggregate(first=Min('date_registered'))['first']
+    RetentionCohort.objects.update(is_stale=True)
+    if first is None:
+        return 0
+    return refresh_cohorts(month_start(first), month_start(timezone.localdate()))
+
+
+def get_retention(months=12, today=None):
+    """
+    Return the retention matrix for the last `months` cohorts, newest first.
+
+    Periods that haven't happened yet are None.
+
+    Returns:
+        list of dicts with 'cohort', 'size' and 'periods' (a list of
+        {'people', 'percent'} dicts or None, for months 1..RETENTION_PERIODS),
+        plus 'registration_month' for month 0
+    """
+    current = month_start(today or timezone.localdate())
+    first = add_months(current, -(months - 1))
+    refresh_cohorts(first, current)
+
+    matrix = []
+    for row in RetentionCohort.objects.filter(cohort__gte=first, cohort__lte=current).order_by('-cohort'):
+        elapsed = months_between(row.cohort, current)
+        cells = []
+        for period in range(RETENTION_PERIODS + 1):
+            if period > elapsed:
+                cells.append(None)
+                continue
+            people = row.retained[period] if period < len(row.retained) else 0
+            cells.append({
+                'people': people,
+                'percent': round(people * 100 / row.size, 1) if row.size else 0,
+            })
+        matrix.append({
+            'cohort': row.cohort,
+            'size': row.size,
+            'registration_month': cells[0],
+            'periods': cells[1:],
+        })
+    return matrix
@@ -0,0 +1,94 @@
+"""
+Signal receivers that keep the dashboard metrics (metrics.py) current and
+mark the retention cohorts (retention.py) that need recomputing.
+
+Changes are applied once the surrounding transaction commits, so a
+rolled-back write never shows up on the dashboard.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from attendance.models import Attendance
+from events.models import Event
+from feedback.models import Feedback
+from people.models import Person
+
+from . import metrics, retention
+
+
+@receiver(post_save, sender=Person)
+def person_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        totals = {'total_people': 1 if instance.is_active else 0}
+        registrations = {timezone.localdate(instance.date_registered): 1}
+        transaction.on_commit(lambda: metrics.apply_deltas(totals, registrations=registrations))
+    else:
+        # Edits may have changed is_active; recounting is cheaper than tracking the old value
+        transaction.on_commit(metrics.refresh_people_metrics)
+    transaction.on_commit(metrics.invalidate_lists)
+    cohort = retention.month_start(instance.date_registered)
+    transaction.on_commit(lambda: retention.mark_stale([cohort]))
+
+
+@receiver(post_delete, sender=Person)
+def person_deleted(sender, instance, **kwargs):
+    totals = {'total_people': -1 if instance.is_active else 0}
+    registrations = {timezone.localdate(instance.date_registered): -1}
+    transaction.on_commit(lambda: metrics.apply_deltas(totals, registrations=registrations))
+    transaction.on_commit(metrics.invalidate_lists)
+    transaction.on_commit(retention.mark_all_stale)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        transaction.on_commit(lambda: metrics.apply_deltas({'total_events': 1}))
+    else:
+        # The event date may have moved its check-ins to another month
+        transaction.on_commit(retention.mark_all_stale)
+    transaction.on_commit(metrics.invalidate_lists)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: metrics.apply_deltas({'total_events': -1}))
+    transaction.on_commit(metrics.invalidate_lists)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        attendance = [instance]
+        event_dates = [instance.event.event_date]
+        transaction.on_commit(lambda: metrics.count_check_ins(attendance))
+        transaction.on_commit(lambda: retention.mark_stale_for_attendance(event_dates))
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    day = timezone.localdate(instance.check_in_time)
+    transaction.on_commit(lambda: metrics.apply_deltas({'total_attendance': -1}, attendance={day: -1}))
+    transaction.on_commit(retention.mark_all_stale)
+
+
+@receiver(post_save, sender=Feedback)
+def feedback_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        delta = 1 if instance.status == 'new' else 0
+        transaction.on_commit(lambda: metrics.apply_deltas({'pending_feedback': delta}))
+    else:
+        transaction.on_commit(metrics.refresh_feedback_metrics)
+
+
+@receiver(post_delete, sender=Feedback)
+def feedback_deleted(sender, instance, **kwargs):
+    if instance.status == 'new':
+        transaction.on_commit(lambda: metrics.apply_deltas({'pending_feedback': -1}))
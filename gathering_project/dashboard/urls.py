@@ -7,5 +7,7 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('attendance/', views.attendance_analytics, name='attendance_analytics'),
     path('people/', views.people_analytics, name='people_analytics'),
+    path('retention/', views.retention_analytics, name='retention_analytics'),
+    path('panels/<slug:page>/<slug:name>/', views.panel, name='panel'),
 ]
 
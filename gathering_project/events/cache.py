@@ -0,0 +1,105 @@
+"""
+Event cache - Resolves the events shown on the public self check-in page.
+
+The upcoming events and the default event for a day are read with one
+query and cached under a key made of the date and a generation number.
+Saving or deleting an Event bumps the generation, so every cached day is
+dropped at once without having to know which keys exist.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event
+
+# Number of upcoming events offered on the check-in page
+UPCOMING_EVENTS_LIMIT = 5
+
+GENERATION_KEY = 'events:check_in:generation'
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def invalidate_check_in_events():
+    """Drop every cached check-in event resolution."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key missing (cold or evicted cache); any new generation will do
+        cache.set(GENERATION_KEY, int(timezone.now().timestamp()), None)
+
+
+def get_next_saturday(today):
+    """Return today if it is a Saturday, otherwise the coming Saturday."""
+    days_until_saturday = (5 - today.weekday()) % 7  # Saturday is weekday 5
+    return today + timedelta(days=days_until_saturday)
+
+
+def _resolve_check_in_events(today):
+    next_saturday = get_next_saturday(today)
+    upcoming = Event.objects.filter(is_active=True, event_date__gte=today).order_by('event_date', 'event_time')
+    first_upcoming = upcoming.values('pk')[:UPCOMING_EVENTS_LIMIT]
+
+    # One query for the first upcoming events plus any on the next Saturday
+    events = list(upcoming.filter(Q(pk__in=first_upcoming) | Q(event_date=next_saturday)))
+
+    upcoming_events = events[:UPCOMING_EVENTS_LIMIT]
+    saturday_events = [event for event in events if event.event_date == next_saturday]
+
+    # Priority: Saturday event > first upcoming event
+    default_event = None
+    if saturday_events:
+        default_event = saturday_events[0]
+    elif upcoming_events:
+        default_event = upcoming_events[0]
+
+    return {
+        'upcoming_events': upcoming_events,
+        'default_event': default_event,
+    }
+
+
+def get_check_in_events(today=None):
+    """
+    Return the upcoming events and the default event for the check-in page.
+
+    Args:
+        today: Date to resolve for (default: today)
+
+    Returns:
+        dict with 'upcoming_events' (list of Event) and 'default_event'
+        (Event or None)
+    """
+    today = today or timezone.now().date()
+    key = f'events:check_in:{_generation()}:{today.isoformat()}'
+    resolved = cache.get(key)
+    if resolved is None:
+        resolved = _resolve_check_in_events(today)
+        cache.set(key, resolved, getattr(settings, 'CHECK_IN_EVENTS_CACHE_SECONDS', 3600))
+    return resolved
+
+
+def get_active_event(event_id, check_in_events=None):
+    """
+    Return the active event with this id, or None.
+
+    Looks in the cached upcoming events first, since QR codes almost always
+    point at one of them, and only queries the database otherwise.
+    """
+    if check_in_events:
+        for event in check_in_events['upcoming_events']:
+            if str(event.pk) == str(event_id):
+                return event
+    try:
+        return Event.objects.get(pk=event_id, is_active=True)
+    except (Event.DoesNotExist, ValueError):
+        return None
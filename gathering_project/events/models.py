@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 
@@ -38,3 +40,10 @@ class Event(models.Model):
         )
         return event_datetime > timezone.now()
 
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_caches(sender, **kwargs):
+    """Clear cached event lookups whenever an event changes."""
+    from .cache import invalidate_check_in_events
+    invalidate_check_in_events()
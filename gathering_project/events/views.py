@@ -48,14 +48,12 @@ def event_create(request):
 def event_detail(request, pk):
     """View details of a specific event."""
     event = get_object_or_404(Event, pk=pk)
-    # Get attendance for this event
+    # Initial count only; the page follows new check-ins over the live stream
     from attendance.models import Attendance
-    attendance_list = Attendance.objects.filter(event=event)
     
     context = {
         'event': event,
-        'attendance_list': attendance_list,
-        'attendance_count': attendance_list.count(),
+        'attendance_count': Attendance.objects.filter(event=event).count(),
     }
     return render(request, 'events/event_detail.html', context)
 
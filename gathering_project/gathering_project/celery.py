@@ -0,0 +1,20 @@
+"""
+Celery application for background tasks (campaign sends, reminders).
+
+Start a worker with:
+    celery -A gathering_project worker -l info
+
+and the periodic tasks in CELERY_BEAT_SCHEDULE with:
+    celery -A gathering_project beat -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gathering_project.settings')
+
+app = Celery('gathering_project')
+
+# Read the CELERY_* values from settings.py
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -5,6 +5,7 @@ Generated for The Gathering Attendance & Messaging System.
 """
 
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config
 import os
 
@@ -78,8 +79,20 @@ WSGI_APPLICATION = 'gathering_project.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Django's SQLite backend plus WAL and BEGIN IMMEDIATE, so check-in
+        # surges queue for the write lock instead of failing with "database is locked"
+        'ENGINE': 'gathering_project.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds a connection waits for the write lock before giving up
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+        # Tests use a file too, so WAL and concurrent connections behave as in production
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -136,6 +149,101 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Dashboard home metrics are counted from scratch at least this often (seconds)
+DASHBOARD_METRICS_RECONCILE_SECONDS = config('DASHBOARD_METRICS_RECONCILE_SECONDS', default=900, cast=int)
+
+# Periodic tasks, run by: celery -A gathering_project beat -l info
+CELERY_BEAT_SCHEDULE = {
+    # Re-queue campaigns whose worker stopped sending heartbeats
+    'resume-stalled-campaigns': {
+        'task': 'messaging.tasks.resume_stalled_campaigns',
+        'schedule': 60 * 5,
+    },
+    # Poll the SMS API for delivery statuses of outstanding messages
+    'reconcile-message-statuses': {
+        'task': 'messaging.tasks.reconcile_message_statuses',
+        'schedule': 60,
+    },
+    # Remind people about tomorrow's events, hourly in the daytime so no one
+    # gets a reminder at night; completed events are skipped, so the later
+    # runs only pick up runs that stopped part way
+    'send-event-reminders': {
+        'task': 'messaging.tasks.send_event_reminders',
+        'schedule': crontab(minute=0, hour='9-18'),
+    },
+    # Recount the dashboard metrics before their reconciled marker expires,
+    # so the full recount never runs on a dashboard page load
+    'reconcile-dashboard-metrics': {
+        'task': 'dashboard.tasks.reconcile_dashboard_metrics',
+        'schedule': DASHBOARD_METRICS_RECONCILE_SECONDS * 2 // 3,
+    },
+}
+
+# Cache
+# Per-process memory cache by default; set CACHE_URL (e.g. redis://localhost:6379/1)
+# so every web process shares the cache and sees invalidations. Production with
+# more than one worker process needs it: the check-in roster, dashboard metrics
+# and attendance matrix are invalidated through the cache
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Self check-in page: how long the resolved events for a day are cached
+# (Event saves and deletes clear it straight away)
+CHECK_IN_EVENTS_CACHE_SECONDS = config('CHECK_IN_EVENTS_CACHE_SECONDS', default=3600, cast=int)
+
+# Batch check-in API for scanner kiosks: maximum scans per request
+ATTENDANCE_BATCH_MAX_SCANS = config('ATTENDANCE_BATCH_MAX_SCANS', default=500, cast=int)
+
+# Check-in writes: extra attempts after SQLITE_BUSY_TIMEOUT runs out, and the first backoff in seconds
+ATTENDANCE_WRITE_RETRIES = config('ATTENDANCE_WRITE_RETRIES', default=3, cast=int)
+ATTENDANCE_WRITE_RETRY_DELAY = config('ATTENDANCE_WRITE_RETRY_DELAY', default=0.1, cast=float)
+
+# Dashboard panels (lazy-loaded JSON fragments): how long a rendered analytics panel is reused (seconds)
+DASHBOARD_PANEL_CACHE_SECONDS = config('DASHBOARD_PANEL_CACHE_SECONDS', default=60, cast=int)
+
+# Attendance list: rows per page, and how long the cached total may lag behind deletions
+ATTENDANCE_LIST_PAGE_SIZE = config('ATTENDANCE_LIST_PAGE_SIZE', default=50, cast=int)
+ATTENDANCE_LIST_COUNT_CACHE_SECONDS = config('ATTENDANCE_LIST_COUNT_CACHE_SECONDS', default=300, cast=int)
+
+# Attendance export: rows read from the database per chunk
+ATTENDANCE_EXPORT_CHUNK_SIZE = config('ATTENDANCE_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Live attendance streams (server-sent events; stream under ASGI, polled under WSGI)
+# How often open streams check for new check-ins, and how long before the browser reconnects
+ATTENDANCE_STREAM_POLL_SECONDS = config('ATTENDANCE_STREAM_POLL_SECONDS', default=1, cast=float)
+ATTENDANCE_STREAM_MAX_SECONDS = config('ATTENDANCE_STREAM_MAX_SECONDS', default=300, cast=int)
+# Under WSGI streams can't stay open; browsers poll the stream URL this often instead
+ATTENDANCE_STREAM_WSGI_POLL_SECONDS = config('ATTENDANCE_STREAM_WSGI_POLL_SECONDS', default=5, cast=float)
+
+# Background message campaigns
+# Number of send-sms chunks a campaign worker sends at the same time
+MESSAGING_CAMPAIGN_CONCURRENCY = config('MESSAGING_CAMPAIGN_CONCURRENCY', default=4, cast=int)
+# Campaigns without a worker heartbeat for this long are re-queued
+MESSAGING_CAMPAIGN_STALL_MINUTES = config('MESSAGING_CAMPAIGN_STALL_MINUTES', default=10, cast=int)
+
+# Event reminders (messaging.tasks.send_event_reminders)
+# People read and sent per chunk; the checkpoint is saved after each chunk
+MESSAGING_REMINDER_CHUNK_SIZE = config('MESSAGING_REMINDER_CHUNK_SIZE', default=500, cast=int)
+# How long a reminder run holds its lock without checkpointing before another run may take over
+MESSAGING_REMINDER_LOCK_SECONDS = config('MESSAGING_REMINDER_LOCK_SECONDS', default=900, cast=int)
+
+# Background delivery status reconciler (messaging.tasks.reconcile_message_statuses)
+# Maximum messages looked at per run, and status checks made at the same time
+MESSAGING_STATUS_BATCH_SIZE = config('MESSAGING_STATUS_BATCH_SIZE', default=500, cast=int)
+MESSAGING_STATUS_CONCURRENCY = config('MESSAGING_STATUS_CONCURRENCY', default=8, cast=int)
+
 # SMS API Settings
 # Default to the hosted API at prompt.pywe.org; can be overridden in .env
 SMS_API_BASE_URL = config('SMS_API_BASE_URL', default='https://prompt.pywe.org/api/client')
@@ -143,6 +251,19 @@ SMS_API_PUBLIC_KEY = config('SMS_API_PUBLIC_KEY', default='DJbhctlognNbQuEhPMTB9
 SMS_API_SECRET_KEY = config('SMS_API_SECRET_KEY', default='9fzban1DkdoJUbOfOrzvD-H-7BUc6QP96uf0gYSKUn8')
 # Approved sender ID from Push.R dashboard (max 11 chars)
 SMS_SENDER_ID = config('SMS_SENDER_ID', default='COME CENTRE')
+# Maximum recipients per bulk send-sms request
+SMS_API_BATCH_SIZE = config('SMS_API_BATCH_SIZE', default=100, cast=int)
+# Shared HTTP transport for the SMS API (see messaging/transport.py)
+SMS_API_POOL_SIZE = config('SMS_API_POOL_SIZE', default=10, cast=int)
+SMS_API_RATE_LIMIT = config('SMS_API_RATE_LIMIT', default=10, cast=float)  # Requests per second, 0 disables
+SMS_API_RATE_BURST = config('SMS_API_RATE_BURST', default=20, cast=int)
+SMS_API_MAX_RETRIES = config('SMS_API_MAX_RETRIES', default=3, cast=int)
+SMS_API_RETRY_BACKOFF = config('SMS_API_RETRY_BACKOFF', default=0.5, cast=float)  # Seconds, doubled per retry
+SMS_API_RETRY_STATUSES = [429, 502, 503, 504]
+SMS_API_CIRCUIT_FAILURE_THRESHOLD = config('SMS_API_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+SMS_API_CIRCUIT_RESET_SECONDS = config('SMS_API_CIRCUIT_RESET_SECONDS', default=30, cast=int)
+# Shared secret used to sign delivery receipt webhooks (endpoint is disabled when empty)
+SMS_WEBHOOK_SECRET = config('SMS_WEBHOOK_SECRET', default='')
 
 # Twilio Settings (for SMS/WhatsApp) - Legacy, kept for backward compatibility
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
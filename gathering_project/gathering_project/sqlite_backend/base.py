@@ -0,0 +1,50 @@
+"""
+SQLite backend for concurrent check-ins.
+
+Django's own SQLite backend with the two connection options Django 5.1
+added, so the settings keep working unchanged after an upgrade:
+
+    'OPTIONS': {
+        'timeout': 20,                   # Busy timeout in seconds
+        'transaction_mode': 'IMMEDIATE', # BEGIN IMMEDIATE for atomic blocks
+        'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+    }
+
+WAL lets readers carry on while one connection writes. BEGIN IMMEDIATE
+takes the write lock when a transaction starts, so a transaction that
+reads and then writes waits (up to the busy timeout) for other writers
+instead of failing with "database is locked" when it tries to upgrade.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        # Not sqlite3.connect() arguments; used below instead
+        self.transaction_mode = (conn_params.pop('transaction_mode', None) or '').upper() or None
+        self.init_command = conn_params.pop('init_command', None)
+        if self.transaction_mode and self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES['{self.alias}']['OPTIONS']['transaction_mode'] "
+                f"must be one of {', '.join(TRANSACTION_MODES)}."
+            )
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
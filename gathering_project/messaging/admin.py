@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MessageTemplate, MessageLog
+from .models import MessageTemplate, MessageLog, Campaign, ReminderRun, MessageStatusCount, AudienceSegment
 
 
 @admin.register(MessageTemplate)
@@ -10,6 +10,20 @@ class MessageTemplateAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(AudienceSegment)
+class AudienceSegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'segment_type', 'event', 'number', 'notification_preference', 'is_active')
+    list_filter = ('segment_type', 'is_active')
+    search_fields = ('name',)
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ('template', 'segment', 'event', 'status', 'total_recipients', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'updated_at')
+
+
 @admin.register(MessageLog)
 class MessageLogAdmin(admin.ModelAdmin):
     list_display = ('person', 'event', 'message_type', 'status', 'sent_at', 'created_at')
@@ -18,3 +32,16 @@ class MessageLogAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     readonly_fields = ('created_at',)
 
+
+
+@admin.register(ReminderRun)
+class ReminderRunAdmin(admin.ModelAdmin):
+    list_display = ('event', 'status', 'sent_count', 'skipped_count', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'finished_at')
+
+
+@admin.register(MessageStatusCount)
+class MessageStatusCountAdmin(admin.ModelAdmin):
+    list_display = ('hour', 'status', 'count')
+    list_filter = ('status',)
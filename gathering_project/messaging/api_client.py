@@ -3,6 +3,7 @@ SMS API Client - Handles communication with the SMS API service.
 """
 import requests
 from django.conf import settings
+from .transport import get_transport
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,8 @@ class SMSAPIClient:
         self.public_key = getattr(settings, 'SMS_API_PUBLIC_KEY', '')
         self.secret_key = getattr(settings, 'SMS_API_SECRET_KEY', '')
         self.sender_id = getattr(settings, 'SMS_SENDER_ID', 'TheGathering')
+        # Shared across clients so connections and the rate limit are process-wide
+        self.transport = get_transport()
         
         if not self.public_key or not self.secret_key:
             logger.warning("SMS API keys not configured. SMS sending will fail.")
@@ -105,6 +108,86 @@ class SMSAPIClient:
                 'error': f'Invalid phone number format. API requires Ghana format (233XXXXXXXXX, 12 digits). Got: {formatted_phone}. Original: {to}'
             }
         
+        payload = self._build_sms_payload(body, [formatted_phone], sender_id)
+        
+        logger.info(f"Sending SMS to {to} via {url}")
+        return self._post_sms(url, payload, headers)
+    
+    def send_bulk_sms(self, recipients, body, sender_id=None):
+        """
+        Send the same SMS body to many recipients.
+        
+        Recipients are sent in chunks of SMS_API_BATCH_SIZE numbers per
+        request instead of one request per number. The API returns one
+        message ID and a total cost per request, so every recipient in a
+        chunk shares that ID and gets an equal share of the cost.
+        
+        Args:
+            recipients: List of recipient phone numbers
+            body: Message content (max 500 characters)
+            sender_id: Optional sender ID (defaults to settings value, max 11 chars)
+        
+        Returns:
+            dict mapping each original phone number to a result dict in the
+            same shape as send_sms
+        """
+        results = {}
+        
+        if not self.public_key or not self.secret_key:
+            error = 'SMS API keys not configured. Please add SMS_API_PUBLIC_KEY and SMS_API_SECRET_KEY to your .env file.'
+            return {to: {'success': False, 'error': error} for to in recipients}
+        
+        if len(body) > 500:
+            error = f'Message is too long ({len(body)} characters). Maximum is 500 characters.'
+            return {to: {'success': False, 'error': error} for to in recipients}
+        
+        # Format and validate every number up front; invalid numbers fail
+        # on their own without holding back the rest of the chunk
+        formatted = {}
+        for to in recipients:
+            formatted_phone = self._format_phone_number(to)
+            if not formatted_phone.startswith('233') or len(formatted_phone) != 12 or not formatted_phone.isdigit():
+                results[to] = {
+                    'success': False,
+                    'error': f'Invalid phone number format. API requires Ghana format (233XXXXXXXXX, 12 digits). Got: {formatted_phone}. Original: {to}'
+                }
+                continue
+            # Two spellings of the same number only need one recipient slot
+            formatted.setdefault(formatted_phone, []).append(to)
+        
+        url = f"{self.base_url}/sms/send-sms"
+        headers = self._get_headers()
+        batch_size = max(1, getattr(settings, 'SMS_API_BATCH_SIZE', 100))
+        phones = list(formatted.keys())
+        
+        for start in range(0, len(phones), batch_size):
+            chunk = phones[start:start + batch_size]
+            payload = self._build_sms_payload(body, chunk, sender_id)
+            
+            logger.info(f"Sending SMS to {len(chunk)} recipient(s) via {url}")
+            result = self._post_sms(url, payload, headers)
+            
+            if result['success']:
+                # Split the request cost evenly across the chunk
+                count = int(result.get('recipients_count') or len(chunk))
+                per_recipient = {
+                    'success': True,
+                    'message_id': result.get('message_id'),
+                    'cost': result.get('cost', 0) / count if count else 0,
+                    'currency': result.get('currency'),
+                    'segments': result.get('segments', 1),
+                }
+            else:
+                per_recipient = result
+            
+            for phone in chunk:
+                for to in formatted[phone]:
+                    results[to] = dict(per_recipient)
+        
+        return results
+    
+    def _build_sms_payload(self, body, formatted_recipients, sender_id=None):
+        """Build the send-sms request body for already formatted recipients."""
         # According to API docs: API keys go in the request body, not headers
         # recipients must be an array
         # Include scheduled fields as per API documentation
@@ -112,7 +195,7 @@ class SMSAPIClient:
             'api_key_public': self.public_key,
             'api_key_secret': self.secret_key,
             'message': body,
-            'recipients': [formatted_phone],  # Must be an array
+            'recipients': list(formatted_recipients),  # Must be an array
             'scheduled': False,  # Explicitly set as per API docs
             'time_scheduled': None,  # Explicitly set as per API docs
         }
@@ -126,12 +209,23 @@ class SMSAPIClient:
             payload['sender_id'] = self.sender_id[:11]  # Max 11 characters
         # If no sender_id, API will use first approved one automatically
         
+        return payload
+    
+    def _post_sms(self, url, payload, headers):
+        """
+        POST a send-sms payload and normalise the API response.
+        
+        Shared by send_sms and send_bulk_sms so single and bulk sends
+        report errors the same way.
+        
+        Returns:
+            dict in the same shape as send_sms
+        """
         try:
-            logger.info(f"Sending SMS to {to} via {url}")
             logger.debug(f"Payload: {payload}")
             logger.debug(f"Headers: {dict(headers)}")
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self.transport.post(url, endpoint='send_sms', json=payload, headers=headers, timeout=30)
             
             logger.info(f"API Response Status: {response.status_code}")
             logger.info(f"API Response Headers: {dict(response.headers)}")
@@ -169,6 +263,7 @@ class SMSAPIClient:
                     'cost': float(response_data.get('cost', 0)) if response_data.get('cost') else 0,
                     'currency': 'GHS',  # Ghana Cedis according to API
                     'segments': 1,  # API doesn't return segments, defaulting to 1
+                    'recipients_count': response_data.get('recipients_count') or len(payload.get('recipients', [])),
                 }
             else:
                 # According to API docs, error responses have a "detail" field
@@ -216,7 +311,7 @@ class SMSAPIClient:
                 logger.error(f"Full response text: {response.text}")
                 logger.error(f"Request URL: {url}")
                 logger.error(f"Request payload: {payload}")
-                logger.error(f"Formatted phone: {formatted_phone} (from {to})")
+                logger.error(f"Recipients: {payload.get('recipients')}")
                 
                 # Include more details in the error message for user
                 detailed_error = error_message
@@ -292,7 +387,7 @@ class SMSAPIClient:
             data['event_id'] = event_id
         
         try:
-            response = requests.post(url, files=files, data=data, headers=headers, timeout=60)
+            response = self.transport.post(url, endpoint='send_customized_sms', files=files, data=data, headers=headers, timeout=60)
             
             if response.status_code == 200 or response.status_code == 201:
                 response_data = response.json()
@@ -346,7 +441,7 @@ class SMSAPIClient:
         
         try:
             # Use a small timeout so status checks don't block the UI for long
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self.transport.get(url, endpoint='check_message_status', headers=headers, timeout=5)
             
             if response.status_code == 200:
                 try:
@@ -0,0 +1,267 @@
+"""
+Campaigns - Background sending of a template to a frozen audience.
+
+The send view creates a Campaign and one pending MessageLog per recipient,
+then hands the campaign to a Celery worker. The worker sends the pending
+logs in chunks with a bounded number of threads. Because progress lives in
+the MessageLog rows themselves, a campaign can be restarted at any time and
+will only send the logs that are still pending. Each chunk is claimed
+before it is sent, so two workers running the same campaign never send a
+log twice; a claim left by a worker that died expires after
+MESSAGING_CAMPAIGN_STALL_MINUTES.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Campaign, MessageLog
+from .services import dispatch_message_logs, get_recipient
+from .templating import get_compiled_template
+
+logger = logging.getLogger(__name__)
+
+# People read and inserted per query when freezing an audience
+FREEZE_CHUNK_SIZE = 500
+
+
+def create_campaign(template, people, event=None, created_by=None, segment=None):
+    """
+    Create a campaign and freeze its audience as pending MessageLogs.
+
+    People without the contact details the template needs are logged as
+    failed straight away so they still show up in the campaign progress.
+
+    Args:
+        template: MessageTemplate instance
+        people: Person queryset or iterable of Person instances
+        event: Event instance (optional)
+        created_by: User who started the campaign (optional)
+        segment: AudienceSegment the people came from (optional)
+
+    Returns:
+        Campaign instance
+    """
+    campaign = Campaign.objects.create(
+        template=template,
+        event=event,
+        created_by=created_by,
+        segment=segment,
+        status='queued',
+    )
+
+    if hasattr(people, 'iterator'):
+        people = people.iterator(chunk_size=FREEZE_CHUNK_SIZE)
+
+    compiled = get_compiled_template(template)
+    total = 0
+    chunk = []
+    for person in people:
+        chunk.append(person)
+        if len(chunk) >= FREEZE_CHUNK_SIZE:
+            total += _freeze_chunk(campaign, template, compiled, chunk, event)
+            chunk = []
+    if chunk:
+        total += _freeze_chunk(campaign, template, compiled, chunk, event)
+
+    campaign.total_recipients = total
+    campaign.save(update_fields=['total_recipients', 'updated_at'])
+    return campaign
+
+
+def _freeze_chunk(campaign, template, compiled, people, event):
+    """Render and bulk insert the MessageLogs for one chunk of the audience."""
+    message_logs = []
+    for person, body in zip(people, compiled.render_batch(people, event)):
+        recipient = get_recipient(person, template)
+        message_log = MessageLog(
+            person=person,
+            event=event,
+            template=template,
+            campaign=campaign,
+            message_type=template.message_type,
+            recipient=recipient,
+            subject=template.subject,
+            body=body,
+            status='pending',
+        )
+        if not recipient:
+            message_log.status = 'failed'
+            if template.message_type == 'email':
+                message_log.error_message = 'Person has no email address'
+            else:
+                message_log.error_message = 'Person has no phone number'
+        message_logs.append(message_log)
+
+    MessageLog.objects.bulk_create(message_logs)
+    return len(message_logs)
+
+
+def start_campaign(campaign):
+    """
+    Queue a campaign on the Celery worker.
+
+    If the broker cannot be reached (e.g. Redis is not running in
+    development) the campaign is run in a background thread instead so the
+    request still returns immediately.
+    """
+    from .tasks import run_campaign
+
+    try:
+        run_campaign.apply_async(args=[campaign.pk], retry=False)
+    except Exception as e:
+        logger.warning(f"Could not queue campaign {campaign.pk} on Celery ({str(e)}). Running in a thread instead.")
+        thread = threading.Thread(target=_run_campaign_in_thread, args=(campaign.pk,), daemon=True)
+        thread.start()
+
+
+def _run_campaign_in_thread(campaign_id):
+    try:
+        dispatch_campaign(campaign_id)
+    finally:
+        connection.close()
+
+
+def dispatch_campaign(campaign_id):
+    """
+    Send every pending MessageLog of a campaign.
+
+    Pending logs are read in primary key order, SMS_API_BATCH_SIZE logs per
+    chunk, and up to MESSAGING_CAMPAIGN_CONCURRENCY chunks are sent at once.
+    Safe to call again on a campaign that was interrupted.
+
+    Args:
+        campaign_id: Primary key of the Campaign
+
+    Returns:
+        Campaign instance
+    """
+    campaign = Campaign.objects.select_related('template').get(pk=campaign_id)
+    if campaign.status == 'completed':
+        return campaign
+
+    template = campaign.template
+    if template is None:
+        # Template was deleted before the campaign ran
+        message_logs = list(campaign.message_logs.filter(status='pending'))
+        for message_log in message_logs:
+            message_log.status = 'failed'
+            message_log.error_message = 'Message template was deleted'
+        MessageLog.objects.bulk_update(message_logs, ['status', 'error_message'], batch_size=500)
+        campaign.status = 'failed'
+        campaign.error_message = 'Message template was deleted'
+        campaign.finished_at = timezone.now()
+        campaign.save()
+        return campaign
+
+    campaign.status = 'running'
+    if not campaign.started_at:
+        campaign.started_at = timezone.now()
+    campaign.save()
+
+    batch_size = max(1, getattr(settings, 'SMS_API_BATCH_SIZE', 100))
+    concurrency = max(1, getattr(settings, 'MESSAGING_CAMPAIGN_CONCURRENCY', 4))
+
+    try:
+        last_pk = 0
+        while True:
+            pending_ids = list(
+                campaign.message_logs.filter(status='pending', pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size * concurrency]
+            )
+            if not pending_ids:
+                break
+            last_pk = pending_ids[-1]
+
+            chunks = [pending_ids[i:i + batch_size] for i in range(0, len(pending_ids), batch_size)]
+            if len(chunks) == 1:
+                _dispatch_chunk(chunks[0], template)
+            else:
+                with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as pool:
+                    list(pool.map(_dispatch_chunk_in_thread, chunks, [template] * len(chunks)))
+
+            # Heartbeat so stalled campaigns can be detected and resumed
+            campaign.save(update_fields=['updated_at'])
+    except Exception as e:
+        logger.error(f"Campaign {campaign.pk} stopped: {str(e)}")
+        campaign.status = 'failed'
+        campaign.error_message = str(e)
+        campaign.save()
+        raise
+
+    if campaign.message_logs.filter(status='pending').exists():
+        # Logs claimed by another worker are still being sent; whichever
+        # run sends the last of them completes the campaign
+        return campaign
+
+    campaign.status = 'completed'
+    campaign.finished_at = timezone.now()
+    campaign.save()
+    return campaign
+
+
+def _claim_stale_before(now):
+    return now - timedelta(minutes=getattr(settings, 'MESSAGING_CAMPAIGN_STALL_MINUTES', 10))
+
+
+def claim_message_logs(message_log_ids):
+    """
+    Claim pending logs for this worker.
+
+    Logs that another worker claimed recently are skipped. The claim is a
+    single conditional UPDATE, so only one worker can win each log.
+
+    Returns:
+        list of the claimed MessageLog instances, in primary key order
+    """
+    now = timezone.now()
+    claimed = MessageLog.objects.filter(pk__in=message_log_ids, status='pending').filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=_claim_stale_before(now))
+    ).update(claimed_at=now)
+    if not claimed:
+        return []
+    return list(
+        MessageLog.objects.filter(pk__in=message_log_ids, status='pending', claimed_at=now).order_by('pk')
+    )
+
+
+def _dispatch_chunk(message_log_ids, template):
+    """Claim and send one chunk of pending logs."""
+    message_logs = claim_message_logs(message_log_ids)
+    if message_logs:
+        dispatch_message_logs(message_logs, template)
+
+
+def _dispatch_chunk_in_thread(message_log_ids, template):
+    # Worker threads get their own database connection; close it when done
+    close_old_connections()
+    try:
+        _dispatch_chunk(message_log_ids, template)
+    finally:
+        connection.close()
+
+
+def resume_stalled_campaigns():
+    """
+    Re-queue campaigns whose worker stopped sending a heartbeat.
+
+    Returns:
+        int: number of campaigns re-queued
+    """
+    stall_minutes = getattr(settings, 'MESSAGING_CAMPAIGN_STALL_MINUTES', 10)
+    cutoff = timezone.now() - timedelta(minutes=stall_minutes)
+    stalled = Campaign.objects.filter(status__in=['queued', 'running'], updated_at__lt=cutoff)
+
+    count = 0
+    for campaign in stalled:
+        # Touch the heartbeat so the next check doesn't queue it twice
+        campaign.save(update_fields=['updated_at'])
+        start_campaign(campaign)
+        count += 1
+    return count
@@ -1,6 +1,5 @@
 from django import forms
-from .models import MessageTemplate
-from people.models import Person
+from .models import MessageTemplate, AudienceSegment
 from events.models import Event
 
 
@@ -19,7 +18,7 @@ class MessageTemplateForm(forms.ModelForm):
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
         help_texts = {
-            'body': 'Use variables like {name}, {event_name}, {event_date}, {event_time}, {event_location}',
+            'body': 'Use variables like {name}, {event_name}, {event_date}, {event_time}, {event_location}, {event_topic}',
             'variables': 'Comma-separated list of available variables',
         }
 
@@ -33,11 +32,11 @@ class SendMessageForm(forms.Form):
         empty_label="Select a template..."
     )
     
-    people = forms.ModelMultipleChoiceField(
-        queryset=Person.objects.filter(is_active=True),
-        widget=forms.SelectMultiple(attrs={'class': 'form-control', 'size': '10'}),
-        required=True,
-        help_text="Hold Ctrl (Cmd on Mac) to select multiple people"
+    segment = forms.ModelChoiceField(
+        queryset=AudienceSegment.objects.filter(is_active=True),
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        empty_label="Select an audience...",
+        help_text="Recipients are looked up when the message is sent"
     )
     
     event = forms.ModelChoiceField(
@@ -46,3 +45,20 @@ class SendMessageForm(forms.Form):
         required=False,
         empty_label="No event (optional)"
     )
+
+
+class AudienceSegmentForm(forms.ModelForm):
+    """Form for creating/editing audience segments."""
+    
+    class Meta:
+        model = AudienceSegment
+        fields = ['name', 'segment_type', 'event', 'number', 'notification_preference', 'description', 'is_active']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'segment_type': forms.Select(attrs={'class': 'form-control'}),
+            'event': forms.Select(attrs={'class': 'form-control'}),
+            'number': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'notification_preference': forms.Select(attrs={'class': 'form-control'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
@@ -0,0 +1,4 @@
+"""
+Management package for messaging app.
+"""
+
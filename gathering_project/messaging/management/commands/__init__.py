@@ -0,0 +1,4 @@
+"""
+Custom management commands for the messaging app.
+"""
+
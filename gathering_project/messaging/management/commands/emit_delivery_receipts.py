@@ -0,0 +1,111 @@
+"""
+Stand-in for the SMS provider: post signed delivery receipts for sent
+messages to the receipt webhook.
+
+Useful for testing the webhook locally. Receipts can be shuffled and
+duplicated to check that replays and out-of-order delivery are harmless.
+
+Usage:
+    python manage.py emit_delivery_receipts
+    python manage.py emit_delivery_receipts --url http://127.0.0.1:8000/messaging/webhooks/delivery-receipts/
+    python manage.py emit_delivery_receipts --limit 500 --batch-size 100 --failure-rate 0.1 --replay
+"""
+
+import json
+import random
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from messaging.models import MessageLog
+from messaging.receipts import sign_body
+
+
+class Command(BaseCommand):
+    help = "Post fake delivery receipts for sent messages to the receipt webhook."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            type=str,
+            default="http://127.0.0.1:8000/messaging/webhooks/delivery-receipts/",
+            help="Webhook URL (default: local development server).",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Maximum number of sent messages to emit receipts for (default: 100).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Receipts per request (default: 50).",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of receipts reported as failed (default: 0).",
+        )
+        parser.add_argument(
+            "--replay",
+            action="store_true",
+            help="Shuffle receipts and send every one twice, with stale 'sent' receipts mixed in.",
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, "SMS_WEBHOOK_SECRET", ""):
+            raise CommandError("SMS_WEBHOOK_SECRET is not set; the webhook would reject every receipt.")
+
+        message_logs = MessageLog.objects.filter(
+            status="sent", external_id__isnull=False
+        ).exclude(external_id="").order_by("-created_at")[: options["limit"]]
+
+        receipts = []
+        for message_log in message_logs:
+            failed = random.random() < options["failure_rate"]
+            receipts.append({
+                "external_id": message_log.external_id,
+                "recipient": message_log.recipient,
+                "status": "failed" if failed else "delivered",
+                "delivered_at": None if failed else timezone.now().isoformat(),
+                "error": "Handset unreachable" if failed else None,
+            })
+
+        if options["replay"]:
+            stale = [dict(receipt, status="sent", delivered_at=None) for receipt in receipts]
+            receipts = receipts + receipts + stale
+            random.shuffle(receipts)
+
+        if not receipts:
+            self.stdout.write(self.style.WARNING("No sent messages with external IDs found."))
+            return
+
+        batch_size = max(1, options["batch_size"])
+        updated = 0
+        for start in range(0, len(receipts), batch_size):
+            body = json.dumps({"receipts": receipts[start:start + batch_size]}).encode()
+            try:
+                response = requests.post(
+                    options["url"],
+                    data=body,
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Webhook-Signature": sign_body(body),
+                    },
+                    timeout=30,
+                )
+            except requests.exceptions.RequestException as exc:
+                raise CommandError(f"Could not reach {options['url']}: {exc}") from exc
+
+            if response.status_code != 200:
+                raise CommandError(f"Webhook returned {response.status_code}: {response.text[:200]}")
+            updated += response.json().get("updated", 0)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {len(receipts)} receipt(s); {updated} message(s) updated.")
+        )
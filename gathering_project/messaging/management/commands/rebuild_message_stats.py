@@ -0,0 +1,18 @@
+"""
+Rebuild the message status counters used by the message log summary.
+
+Usage:
+    python manage.py rebuild_message_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from messaging.stats import rebuild_status_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute MessageStatusCount from the MessageLog table."
+
+    def handle(self, *args, **options):
+        count = rebuild_status_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} message status counter(s)."))
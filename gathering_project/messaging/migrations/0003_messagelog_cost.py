@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_messagelog_external_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagelog',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Cost reported by the API for this recipient', max_digits=10, null=True),
+        ),
+    ]
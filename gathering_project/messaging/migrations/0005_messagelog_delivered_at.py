@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagelog',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagelog',
+            name='status_checked_at',
+            field=models.DateTimeField(blank=True, help_text='Last delivery status check with the API', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='messagelog',
+            index=models.Index(fields=['status', 'created_at'], name='messaging_m_status_98bf52_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_messagelog_delivered_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagelog',
+            index=models.Index(fields=['external_id'], name='messaging_m_externa_3be893_idx'),
+        ),
+    ]
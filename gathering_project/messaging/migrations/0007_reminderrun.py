@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_topic'),
+        ('messaging', '0006_messagelog_external_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20)),
+                ('last_person_id', models.UUIDField(blank=True, null=True)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('lock_token', models.CharField(blank=True, max_length=64, null=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_run', to='events.event')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
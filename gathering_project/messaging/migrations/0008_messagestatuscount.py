@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:02
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+import datetime
+
+
+def fill_message_status_counts(apps, schema_editor):
+    """Build MessageStatusCount from the existing message logs."""
+    MessageLog = apps.get_model('messaging', 'MessageLog')
+    MessageStatusCount = apps.get_model('messaging', 'MessageStatusCount')
+    rows = (
+        MessageLog.objects.annotate(hour=TruncHour('created_at', tzinfo=datetime.timezone.utc))
+        .values('hour', 'status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    MessageStatusCount.objects.bulk_create(
+        [MessageStatusCount(hour=row['hour'], status=row['status'], count=row['count']) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_reminderrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour', 'status'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='messagelog',
+            index=models.Index(fields=['created_at'], name='messaging_m_created_ce7090_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='messagestatuscount',
+            unique_together={('hour', 'status')},
+        ),
+        migrations.RunPython(fill_message_status_counts, migrations.RunPython.noop),
+    ]
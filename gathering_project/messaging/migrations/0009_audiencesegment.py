@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_default_segments(apps, schema_editor):
+    AudienceSegment = apps.get_model('messaging', 'AudienceSegment')
+    AudienceSegment.objects.get_or_create(
+        name='All active people',
+        defaults={'segment_type': 'all_active'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_topic'),
+        ('messaging', '0008_messagestatuscount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudienceSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('segment_type', models.CharField(choices=[('all_active', 'All active people'), ('event_attendees', 'Attendees of an event'), ('absent_recent', 'Absent for the last N gatherings'), ('preference', 'Notification preference'), ('registered_recent', 'Registered in the last N days')], default='all_active', max_length=30)),
+                ('number', models.PositiveIntegerField(blank=True, help_text='N gatherings (absent for the last N gatherings) or N days (registered in the last N days)', null=True)),
+                ('notification_preference', models.CharField(blank=True, choices=[('whatsapp', 'WhatsApp'), ('sms', 'SMS'), ('both', 'Both'), ('none', 'None')], help_text='Preference to match (notification preference)', max_length=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.ForeignKey(blank=True, help_text='Event whose attendees to include (attendees of an event)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='audience_segments', to='events.event')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='segment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campaigns', to='messaging.audiencesegment'),
+        ),
+        migrations.RunPython(create_default_segments, migrations.RunPython.noop),
+    ]
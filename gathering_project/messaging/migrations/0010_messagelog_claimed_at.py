@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0009_audiencesegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagelog',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a campaign worker claimed this log for sending', null=True),
+        ),
+    ]
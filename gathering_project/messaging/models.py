@@ -1,4 +1,10 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from people.models import Person
 from events.models import Event
@@ -31,6 +37,315 @@ class MessageTemplate(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_message_type_display()})"
+    
+    def clean(self):
+        from .templating import validate_template_body
+        
+        try:
+            validate_template_body(self.body)
+        except ValidationError as e:
+            raise ValidationError({'body': e.messages})
+
+
+class AudienceSegment(models.Model):
+    """A saved rule for choosing message recipients, resolved in SQL at send time."""
+    
+    SEGMENT_TYPE_CHOICES = [
+        ('all_active', 'All active people'),
+        ('event_attendees', 'Attendees of an event'),
+        ('absent_recent', 'Absent for the last N gatherings'),
+        ('preference', 'Notification preference'),
+        ('registered_recent', 'Registered in the last N days'),
+    ]
+    
+    PREFERENCE_CHOICES = [
+        ('whatsapp', 'WhatsApp'),
+        ('sms', 'SMS'),
+        ('both', 'Both'),
+        ('none', 'None'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    segment_type = models.CharField(max_length=30, choices=SEGMENT_TYPE_CHOICES, default='all_active')
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='audience_segments',
+        help_text='Event whose attendees to include (attendees of an event)'
+    )
+    number = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='N gatherings (absent for the last N gatherings) or N days (registered in the last N days)'
+    )
+    notification_preference = models.CharField(
+        max_length=20,
+        choices=PREFERENCE_CHOICES,
+        blank=True,
+        help_text='Preference to match (notification preference)'
+    )
+    description = models.TextField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        if self.segment_type == 'event_attendees' and not self.event_id:
+            raise ValidationError({'event': 'Choose the event whose attendees to include.'})
+        if self.segment_type in ['absent_recent', 'registered_recent'] and not self.number:
+            raise ValidationError({'number': 'Enter how many gatherings or days to look back.'})
+        if self.segment_type == 'preference' and not self.notification_preference:
+            raise ValidationError({'notification_preference': 'Choose a notification preference.'})
+    
+    def get_queryset(self):
+        """Return the active people in this segment as a single queryset."""
+        people = Person.objects.filter(is_active=True)
+        
+        if self.segment_type == 'event_attendees':
+            people = people.filter(attendances__event_id=self.event_id)
+        elif self.segment_type == 'absent_recent':
+            recent_events = Event.objects.filter(
+                is_active=True,
+                event_date__lte=timezone.now().date()
+            ).order_by('-event_date', '-event_time').values('pk')[:self.number or 1]
+            people = people.exclude(attendances__event__in=recent_events)
+        elif self.segment_type == 'preference':
+            people = people.filter(notification_preference=self.notification_preference)
+        elif self.segment_type == 'registered_recent':
+            since = timezone.now() - timedelta(days=self.number or 30)
+            people = people.filter(date_registered__gte=since)
+        
+        return people
+    
+    def count(self):
+        return self.get_queryset().count()
+
+
+class Campaign(models.Model):
+    """A background send of one template to a frozen audience."""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    template = models.ForeignKey(
+        MessageTemplate,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='campaigns'
+    )
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='campaigns'
+    )
+    segment = models.ForeignKey(
+        AudienceSegment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='campaigns'
+    )
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='campaigns'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_recipients = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Doubles as the worker heartbeat
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        template_name = self.template.name if self.template else 'Deleted template'
+        return f"{template_name} - {self.get_status_display()} - {self.created_at}"
+    
+    def get_progress(self):
+        """Return sent/failed/remaining counts from the campaign's message logs."""
+        counts = self.message_logs.aggregate(
+            sent=Count('id', filter=Q(status__in=['sent', 'delivered'])),
+            failed=Count('id', filter=Q(status='failed')),
+            remaining=Count('id', filter=Q(status='pending')),
+        )
+        counts['total'] = self.total_recipients
+        return counts
+
+
+# Marks a MessageLog whose stored status is not known (e.g. built by hand)
+_UNKNOWN_STATUS = object()
+
+
+def _status_hour(created_at):
+    """The MessageStatusCount bucket a log created at created_at falls in."""
+    return created_at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class MessageStatusCount(models.Model):
+    """
+    Number of MessageLogs per status, bucketed by the hour they were created.
+    
+    Kept up to date as logs are created, change status or are deleted, so
+    the message log summary never has to count the MessageLog table.
+    Rebuild with: python manage.py rebuild_message_stats
+    """
+    
+    hour = models.DateTimeField()
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['hour', 'status']
+        ordering = ['-hour', 'status']
+    
+    def __str__(self):
+        return f"{self.hour} {self.status}: {self.count}"
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Add deltas to the counters.
+        
+        Args:
+            deltas: dict mapping (hour, status) to the change in count
+        """
+        for (hour, status), delta in deltas.items():
+            if not delta:
+                continue
+            updated = cls.objects.filter(hour=hour, status=status).update(count=F('count') + delta)
+            if updated:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(hour=hour, status=status, count=delta)
+            except IntegrityError:
+                # Another process created the row first
+                cls.objects.filter(hour=hour, status=status).update(count=F('count') + delta)
+
+
+class MessageLogQuerySet(models.QuerySet):
+    """Keeps MessageStatusCount in step with bulk writes."""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            deltas = Counter((_status_hour(obj.created_at), obj.status) for obj in created)
+            MessageStatusCount.apply_deltas(deltas)
+        for obj in created:
+            obj._original_status = obj.status
+        return created
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'status' not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        
+        deltas = Counter()
+        for obj in objs:
+            original = getattr(obj, '_original_status', _UNKNOWN_STATUS)
+            if original is _UNKNOWN_STATUS or original == obj.status:
+                continue
+            hour = _status_hour(obj.created_at)
+            deltas[(hour, original)] -= 1
+            deltas[(hour, obj.status)] += 1
+        
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            MessageStatusCount.apply_deltas(deltas)
+        for obj in objs:
+            obj._original_status = obj.status
+        return rows
+    
+    def move_status(self, message_log, previous_status, **fields):
+        """
+        Write message_log's status (and fields) only if the stored status is still previous_status.
+        
+        Guards against overwriting a status written meanwhile (e.g. by a
+        delivery receipt), and keeps MessageStatusCount in step.
+        
+        Returns:
+            bool: True if the row was updated
+        """
+        with transaction.atomic(using=self.db):
+            updated = self.filter(pk=message_log.pk, status=previous_status).update(
+                status=message_log.status, **fields
+            )
+            if updated:
+                hour = _status_hour(message_log.created_at)
+                MessageStatusCount.apply_deltas({(hour, previous_status): -1, (hour, message_log.status): 1})
+        if updated:
+            message_log._original_status = message_log.status
+        return bool(updated)
+    
+    def move_statuses(self, previous_statuses, status, changes, batch_size=500):
+        """
+        Move many logs to status, each only if its stored status is one of previous_statuses.
+        
+        The bulk form of move_status: one guarded UPDATE per batch, with
+        per-log fields written as CASE expressions like bulk_update.
+        MessageStatusCount is adjusted from the statuses the rows had when
+        they were moved, not from copies read earlier.
+        
+        Args:
+            previous_statuses: statuses a log may be moved from
+            status: the new status
+            changes: dict mapping MessageLog pk to a dict of other fields to write
+        
+        Returns:
+            list of the pks that were moved
+        """
+        moved = []
+        pks = list(changes)
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            with transaction.atomic(using=self.db):
+                rows = list(
+                    self.select_for_update().filter(pk__in=batch, status__in=previous_statuses)
+                    .values_list('pk', 'status', 'created_at')
+                )
+                if not rows:
+                    continue
+                fields = {}
+                for name in {name for pk, _, _ in rows for name in changes[pk]}:
+                    output_field = self.model._meta.get_field(name)
+                    fields[name] = Case(
+                        *[
+                            When(pk=pk, then=Value(changes[pk][name], output_field=output_field))
+                            for pk, _, _ in rows if name in changes[pk]
+                        ],
+                        default=F(name),
+                        output_field=output_field,
+                    )
+                self.filter(pk__in=[pk for pk, _, _ in rows]).update(status=status, **fields)
+                deltas = Counter()
+                for pk, previous_status, created_at in rows:
+                    hour = _status_hour(created_at)
+                    deltas[(hour, previous_status)] -= 1
+                    deltas[(hour, status)] += 1
+                MessageStatusCount.apply_deltas(deltas)
+            moved.extend(pk for pk, _, _ in rows)
+        return moved
 
 
 class MessageLog(models.Model):
@@ -64,19 +379,106 @@ class MessageLog(models.Model):
         blank=True,
         related_name='logs'
     )
+    campaign = models.ForeignKey(
+        Campaign,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='message_logs'
+    )
     message_type = models.CharField(max_length=20, choices=MESSAGE_TYPE_CHOICES)
     recipient = models.CharField(max_length=100)  # Phone number or email
     subject = models.CharField(max_length=200, blank=True, null=True)
     body = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     sent_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    status_checked_at = models.DateTimeField(null=True, blank=True, help_text='Last delivery status check with the API')
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text='When a campaign worker claimed this log for sending')
     error_message = models.TextField(blank=True, null=True)
     external_id = models.CharField(max_length=200, blank=True, null=True, help_text='External message ID from API')
+    cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        help_text='Cost reported by the API for this recipient'
+    )
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Used by the delivery status reconciler
+            models.Index(fields=['status', 'created_at']),
+            # Used to match delivery receipts
+            models.Index(fields=['external_id']),
+            # Used by the recent-batch summary on the message log page
+            models.Index(fields=['created_at']),
+        ]
+    
+    objects = MessageLogQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.person.get_full_name()} - {self.get_status_display()} - {self.created_at}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so a change can be counted on save
+        instance._original_status = instance.__dict__.get('status', _UNKNOWN_STATUS)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        original = None if adding else getattr(self, '_original_status', _UNKNOWN_STATUS)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            original = self.status  # Status isn't being written
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if original is not _UNKNOWN_STATUS and original != self.status:
+                hour = _status_hour(self.created_at)
+                deltas = Counter({(hour, self.status): 1})
+                if original is not None:
+                    deltas[(hour, original)] -= 1
+                MessageStatusCount.apply_deltas(deltas)
+        self._original_status = self.status
+
+
+class ReminderRun(models.Model):
+    """
+    Progress and lock for the event reminder task, one row per event.
+    
+    last_person_id is a checkpoint: people are processed in primary key
+    order, so a crashed run resumes after the last person it finished.
+    locked_until stops two overlapping task runs sending the same reminders.
+    """
+    
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    ]
+    
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='reminder_run')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    last_person_id = models.UUIDField(null=True, blank=True)
+    sent_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    lock_token = models.CharField(max_length=64, blank=True, null=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Reminders for {self.event} - {self.get_status_display()}"
+
 
+@receiver(post_delete, sender=MessageLog)
+def remove_message_log_from_counts(sender, instance, **kwargs):
+    """Take a deleted log out of MessageStatusCount."""
+    MessageStatusCount.apply_deltas({(_status_hour(instance.created_at), instance.status): -1})
@@ -0,0 +1,156 @@
+"""
+Delivery receipts - Applies delivery reports pushed by the SMS provider.
+
+Receipts are matched to MessageLogs by external_id (and by recipient, since
+one bulk request gives every recipient the same external_id). A batch of
+receipts is applied with one query to load the logs and one guarded update
+per new status.
+
+Statuses only ever move forward (pending -> sent -> delivered/failed), so
+replayed or out-of-order receipts never undo a newer state. The update
+checks the stored status, so a status written meanwhile by the reconciler
+(tasks.reconcile_message_statuses) is never overwritten either.
+
+Each webhook request is applied as it arrives, as one batch; receipts are
+not held back across requests, since the provider only stops retrying a
+batch once it has been acknowledged.
+"""
+import hashlib
+import hmac
+import re
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MessageLog
+from .utils import STATUS_MAPPING, STATUS_RANK
+
+
+def verify_signature(body, signature):
+    """
+    Check the X-Webhook-Signature header of a receipt request.
+
+    The signature is the hex HMAC-SHA256 of the raw request body keyed with
+    SMS_WEBHOOK_SECRET. Requests are always rejected when no secret is set.
+    """
+    secret = getattr(settings, 'SMS_WEBHOOK_SECRET', '')
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def sign_body(body):
+    """Return the signature the receipt endpoint expects for body."""
+    secret = getattr(settings, 'SMS_WEBHOOK_SECRET', '')
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _digits(phone_number):
+    return re.sub(r'\D', '', phone_number or '')
+
+
+def _recipient_key(phone_number):
+    """Normalise a phone number so '+233...' and '233...' compare equal."""
+    digits = _digits(phone_number)
+    if digits.startswith('0'):
+        digits = '233' + digits[1:]
+    return digits
+
+
+def normalize_receipts(payload):
+    """
+    Turn a webhook payload into a list of receipt dicts.
+
+    Accepts a single receipt, a list of receipts, or {"receipts": [...]}.
+    Each receipt needs an id (as "external_id", "message_id" or "id") and a
+    "status"; "recipient", "delivered_at" and "error" are optional.
+
+    Returns:
+        tuple: (receipts, invalid_count)
+    """
+    if isinstance(payload, dict) and isinstance(payload.get('receipts'), list):
+        items = payload['receipts']
+    elif isinstance(payload, list):
+        items = payload
+    else:
+        items = [payload]
+
+    receipts = []
+    invalid = 0
+    for item in items:
+        if not isinstance(item, dict):
+            invalid += 1
+            continue
+        external_id = item.get('external_id') or item.get('message_id') or item.get('id')
+        status = STATUS_MAPPING.get(str(item.get('status', '')).lower())
+        if external_id in (None, '') or status is None:
+            invalid += 1
+            continue
+        delivered_at = None
+        if item.get('delivered_at'):
+            delivered_at = parse_datetime(str(item['delivered_at']).replace('Z', '+00:00'))
+        receipts.append({
+            'external_id': str(external_id),
+            'status': status,
+            'recipient': _recipient_key(item.get('recipient')),
+            'delivered_at': delivered_at,
+            'error': item.get('error') or item.get('error_message'),
+        })
+    return receipts, invalid
+
+
+def apply_receipts(receipts):
+    """
+    Apply normalised receipts to MessageLogs in bulk.
+
+    Args:
+        receipts: list of dicts from normalize_receipts
+
+    Returns:
+        tuple: (updated_count, ignored_count)
+    """
+    if not receipts:
+        return 0, 0
+
+    external_ids = {receipt['external_id'] for receipt in receipts}
+    logs_by_external_id = {}
+    for message_log in MessageLog.objects.filter(external_id__in=external_ids):
+        logs_by_external_id.setdefault(message_log.external_id, []).append(message_log)
+
+    now = timezone.now()
+    changed = {}
+    ignored = 0
+    for receipt in receipts:
+        matched = False
+        for message_log in logs_by_external_id.get(receipt['external_id'], []):
+            if receipt['recipient'] and _recipient_key(message_log.recipient) != receipt['recipient']:
+                continue
+            matched = True
+            if STATUS_RANK[receipt['status']] <= STATUS_RANK.get(message_log.status, 0):
+                continue  # Replay or older receipt
+            message_log.status = receipt['status']
+            message_log.status_checked_at = now
+            if receipt['status'] == 'delivered' and not message_log.delivered_at:
+                message_log.delivered_at = receipt['delivered_at'] or now
+            if receipt['status'] == 'failed' and receipt['error']:
+                message_log.error_message = str(receipt['error'])
+            changed[message_log.pk] = message_log
+        if not matched:
+            ignored += 1
+
+    # One guarded update per new status: a log only moves if its stored
+    # status still ranks below the receipt's
+    by_status = {}
+    for message_log in changed.values():
+        by_status.setdefault(message_log.status, {})[message_log.pk] = {
+            'status_checked_at': message_log.status_checked_at,
+            'delivered_at': message_log.delivered_at,
+            'error_message': message_log.error_message,
+        }
+    updated = 0
+    for status, changes in by_status.items():
+        lower = [other for other, rank in STATUS_RANK.items() if rank < STATUS_RANK[status]]
+        updated += len(MessageLog.objects.move_statuses(lower, status, changes))
+    return updated, ignored
@@ -0,0 +1,186 @@
+"""
+Event reminders - Streams active people through the reminder templates.
+
+For each event people are read in primary key order, in chunks, and routed
+to a channel by their notification preference. Anyone who already has a
+sent, delivered or failed MessageLog for the event and template is skipped,
+so running the task twice never sends twice. Progress is checkpointed on a
+ReminderRun row, which also acts as a lock between overlapping task runs.
+
+A run that stopped between writing a chunk's logs and sending them leaves
+them pending; the run that resumes sends those logs instead of skipping
+their people.
+"""
+from datetime import timedelta
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from people.models import Person
+from .models import MessageLog, MessageTemplate, ReminderRun
+from .services import dispatch_message_logs, send_bulk_message
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TEMPLATE_NAME = 'Event Reminder'
+
+# Which template channels each notification preference receives
+PREFERENCE_CHANNELS = {
+    'sms': ['sms'],
+    'whatsapp': ['whatsapp'],
+    'both': ['sms', 'whatsapp'],
+    'none': [],
+}
+
+
+def get_reminder_templates():
+    """
+    Return the active reminder templates keyed by message type.
+
+    WhatsApp goes through the same SMS API, so when there is only an SMS
+    reminder template it is used for WhatsApp too (and vice versa).
+    """
+    templates = {}
+    for template in MessageTemplate.objects.filter(name=REMINDER_TEMPLATE_NAME, is_active=True).order_by('-updated_at'):
+        templates.setdefault(template.message_type, template)
+    if 'whatsapp' not in templates and 'sms' in templates:
+        templates['whatsapp'] = templates['sms']
+    if 'sms' not in templates and 'whatsapp' in templates:
+        templates['sms'] = templates['whatsapp']
+    return templates
+
+
+def route_people(people, templates):
+    """
+    Group people by the reminder template they should get.
+
+    Returns:
+        dict mapping template to list of people
+    """
+    routed = {}
+    for person in people:
+        chosen = []
+        for channel in PREFERENCE_CHANNELS.get(person.notification_preference, ['sms']):
+            template = templates.get(channel)
+            # 'both' with a single shared template only sends once
+            if template is not None and template not in chosen:
+                chosen.append(template)
+        for template in chosen:
+            routed.setdefault(template, []).append(person)
+    return routed
+
+
+def acquire_run(event):
+    """
+    Lock the ReminderRun for an event.
+
+    Returns:
+        ReminderRun, or None if it is completed or locked by another run
+    """
+    lock_seconds = getattr(settings, 'MESSAGING_REMINDER_LOCK_SECONDS', 900)
+    try:
+        ReminderRun.objects.get_or_create(event=event)
+    except IntegrityError:
+        pass  # Created by a concurrent run
+
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    # Conditional UPDATE so only one process can take the lock
+    locked = ReminderRun.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        event=event,
+        status='running',
+    ).update(lock_token=token, locked_until=now + timedelta(seconds=lock_seconds))
+    if not locked:
+        return None
+    return ReminderRun.objects.get(event=event, lock_token=token)
+
+
+def _extend_lock(run):
+    lock_seconds = getattr(settings, 'MESSAGING_REMINDER_LOCK_SECONDS', 900)
+    return ReminderRun.objects.filter(pk=run.pk, lock_token=run.lock_token).update(
+        locked_until=timezone.now() + timedelta(seconds=lock_seconds)
+    )
+
+
+def send_reminders_for_event(event, templates):
+    """
+    Send reminders for one event, resuming from the last checkpoint.
+
+    Returns:
+        int: reminders sent by this run (0 if another run holds the lock)
+    """
+    run = acquire_run(event)
+    if run is None:
+        logger.info(f"Reminders for {event} are completed or running elsewhere; skipping")
+        return 0
+
+    chunk_size = max(1, getattr(settings, 'MESSAGING_REMINDER_CHUNK_SIZE', 500))
+    people = Person.objects.filter(is_active=True).exclude(notification_preference='none').order_by('pk')
+    if run.last_person_id:
+        people = people.filter(pk__gt=run.last_person_id)
+
+    sent = 0
+    chunk = []
+    try:
+        for person in people.iterator(chunk_size=chunk_size):
+            chunk.append(person)
+            if len(chunk) >= chunk_size:
+                sent += _send_chunk(run, event, chunk, templates)
+                chunk = []
+        if chunk:
+            sent += _send_chunk(run, event, chunk, templates)
+    finally:
+        # Release the lock whether or not the run finished
+        ReminderRun.objects.filter(pk=run.pk, lock_token=run.lock_token).update(lock_token=None, locked_until=None)
+
+    ReminderRun.objects.filter(pk=run.pk).update(status='completed', finished_at=timezone.now())
+    return sent
+
+
+def _send_chunk(run, event, chunk, templates):
+    """Send one chunk of people, skipping anyone already reminded, then checkpoint."""
+    sent = 0
+    skipped = 0
+    for template, people in route_people(chunk, templates).items():
+        reminded = set()
+        unsent = {}
+        logs = MessageLog.objects.filter(
+            event=event,
+            template=template,
+            person_id__in=[person.pk for person in people],
+        ).values_list('pk', 'person_id', 'status', 'campaign_id')
+        for pk, person_id, status, campaign_id in logs:
+            if status == 'pending' and campaign_id is None:
+                # Written by a reminder run that stopped before sending it
+                unsent.setdefault(person_id, pk)
+            else:
+                # Pending campaign logs are sent by the campaign
+                reminded.add(person_id)
+        unsent = {person_id: pk for person_id, pk in unsent.items() if person_id not in reminded}
+        recipients = [
+            person for person in people
+            if person.pk not in reminded and person.pk not in unsent and person.phone_number
+        ]
+        skipped += len(people) - len(recipients) - len(unsent)
+        message_logs = []
+        if unsent:
+            resumed = list(MessageLog.objects.filter(pk__in=unsent.values(), status='pending').order_by('pk'))
+            dispatch_message_logs(resumed, template)
+            message_logs.extend(resumed)
+        if recipients:
+            message_logs.extend(send_bulk_message(recipients, template, event))
+        sent += sum(1 for message_log in message_logs if message_log.status == 'sent')
+
+    ReminderRun.objects.filter(pk=run.pk, lock_token=run.lock_token).update(
+        last_person_id=chunk[-1].pk,
+        sent_count=F('sent_count') + sent,
+        skipped_count=F('skipped_count') + skipped,
+    )
+    if not _extend_lock(run):
+        raise RuntimeError(f"Lost the reminder lock for {event}")
+    return sent
@@ -1,14 +1,20 @@
 """
 Messaging service - Handles sending messages via SMS/WhatsApp/Email.
 """
+from collections import OrderedDict
+from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
 from .models import MessageLog
 from .api_client import SMSAPIClient
+from .templating import get_compiled_template
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns written back to a MessageLog after a send attempt
+SEND_RESULT_FIELDS = ['status', 'sent_at', 'external_id', 'error_message', 'cost']
+
 
 def send_message(person, template, event=None):
     """
@@ -22,22 +28,8 @@ def send_message(person, template, event=None):
     Returns:
         MessageLog instance
     """
-    # Format message body with variables
-    body = template.body
-    if event:
-        body = body.replace('{event_name}', event.name or '')
-        body = body.replace('{event_date}', str(event.event_date) if event.event_date else '')
-        body = body.replace('{event_time}', str(event.event_time) if event.event_time else '')
-        body = body.replace('{event_location}', event.location or '')
-        body = body.replace('{event_topic}', event.topic or '')
-    
-    body = body.replace('{name}', person.get_full_name())
-    
-    # Determine recipient
-    if template.message_type == 'email':
-        recipient = person.email or ''
-    else:
-        recipient = person.phone_number
+    body = render_message_body(template, person, event)
+    recipient = get_recipient(person, template)
     
     # Create message log
     message_log = MessageLog.objects.create(
@@ -55,23 +47,10 @@ def send_message(person, template, event=None):
     try:
         if template.message_type in ['sms', 'whatsapp']:
             result = send_sms_or_whatsapp(recipient, body, template.message_type)
-            if result['success']:
-                message_log.status = 'sent'
-                message_log.sent_at = timezone.now()
-                # Store message ID if available
-                if 'message_id' in result:
-                    message_log.external_id = result['message_id']
-            else:
-                message_log.status = 'failed'
-                message_log.error_message = result.get('error', 'Unknown error')
+            _apply_send_result(message_log, result)
         elif template.message_type == 'email':
             result = send_email(recipient, template.subject or '', body)
-            if result['success']:
-                message_log.status = 'sent'
-                message_log.sent_at = timezone.now()
-            else:
-                message_log.status = 'failed'
-                message_log.error_message = result.get('error', 'Unknown error')
+            _apply_send_result(message_log, result)
         
         message_log.save()
     except Exception as e:
@@ -83,6 +62,144 @@ def send_message(person, template, event=None):
     return message_log
 
 
+def render_message_body(template, person, event=None):
+    """Fill in the template variables for one person (and optional event)."""
+    return get_compiled_template(template).render(person, event)
+
+
+def get_recipient(person, template):
+    """Return the phone number or email address a template should go to."""
+    if template.message_type == 'email':
+        return person.email or ''
+    return person.phone_number
+
+
+def send_bulk_message(people, template, event=None):
+    """
+    Send a template to many people, batching SMS requests and database writes.
+    
+    People are handled in chunks of SMS_API_BATCH_SIZE: the chunk's pending
+    logs are written with one bulk_create, sent, and their results saved
+    with one bulk_update.
+    
+    Args:
+        people: Iterable of Person instances
+        template: MessageTemplate instance
+        event: Event instance (optional)
+    
+    Returns:
+        list of MessageLog instances, in the same order as people
+    """
+    people = list(people)
+    bodies = get_compiled_template(template).render_batch(people, event)
+    batch_size = max(1, getattr(settings, 'SMS_API_BATCH_SIZE', 100))
+    
+    message_logs = []
+    for start in range(0, len(people), batch_size):
+        chunk = []
+        for person, body in zip(people[start:start + batch_size], bodies[start:start + batch_size]):
+            chunk.append(MessageLog(
+                person=person,
+                event=event,
+                template=template,
+                message_type=template.message_type,
+                recipient=get_recipient(person, template),
+                subject=template.subject,
+                body=body,
+                status='pending'
+            ))
+        _bulk_create_logs(chunk)
+        dispatch_message_logs(chunk, template)
+        message_logs.extend(chunk)
+    
+    return message_logs
+
+
+def _bulk_create_logs(message_logs):
+    """Insert MessageLogs in one statement, making sure each gets its pk."""
+    MessageLog.objects.bulk_create(message_logs)
+    # Databases that can't return ids from a bulk insert leave pk unset;
+    # bulk_update needs it, so fall back to single inserts there
+    for message_log in message_logs:
+        if message_log.pk is None:
+            message_log.save()
+
+
+def dispatch_message_logs(message_logs, template):
+    """
+    Send already created pending MessageLogs and record the results.
+    
+    Logs whose rendered body is identical (e.g. templates without {name})
+    are grouped and sent through SMSAPIClient.send_bulk_sms, which puts up
+    to SMS_API_BATCH_SIZE numbers in each request. The returned message ID
+    and cost are copied back onto every MessageLog in the group. Email, and
+    SMS when only Twilio is configured, are still sent one by one.
+    
+    Results are written with a single bulk_update of SEND_RESULT_FIELDS
+    once every log has been sent.
+    
+    Args:
+        message_logs: List of pending MessageLog instances
+        template: MessageTemplate the logs were rendered from
+    """
+    api_configured = (
+        getattr(settings, 'SMS_API_PUBLIC_KEY', '') and getattr(settings, 'SMS_API_SECRET_KEY', '')
+    )
+    
+    if template.message_type in ['sms', 'whatsapp'] and api_configured:
+        # Group logs by rendered body so each distinct message is sent once
+        groups = OrderedDict()
+        for message_log in message_logs:
+            groups.setdefault(message_log.body, []).append(message_log)
+        
+        api_client = SMSAPIClient()
+        sender_id = getattr(settings, 'SMS_SENDER_ID', 'TheGathering')
+        for body, group in groups.items():
+            try:
+                results = api_client.send_bulk_sms(
+                    [message_log.recipient for message_log in group],
+                    body,
+                    sender_id=sender_id
+                )
+            except Exception as e:
+                logger.error(f"Error sending bulk message: {str(e)}")
+                results = {}
+                for message_log in group:
+                    results[message_log.recipient] = {'success': False, 'error': str(e)}
+            
+            for message_log in group:
+                result = results.get(message_log.recipient, {'success': False, 'error': 'Unknown error'})
+                _apply_send_result(message_log, result)
+    else:
+        for message_log in message_logs:
+            try:
+                if template.message_type == 'email':
+                    result = send_email(message_log.recipient, template.subject or '', message_log.body)
+                else:
+                    result = send_sms_or_whatsapp(message_log.recipient, message_log.body, template.message_type)
+            except Exception as e:
+                logger.error(f"Error sending message: {str(e)}")
+                result = {'success': False, 'error': str(e)}
+            _apply_send_result(message_log, result)
+    
+    if message_logs:
+        MessageLog.objects.bulk_update(message_logs, SEND_RESULT_FIELDS, batch_size=len(message_logs))
+
+
+def _apply_send_result(message_log, result):
+    """Copy a send result dict onto a MessageLog (without saving it)."""
+    if result['success']:
+        message_log.status = 'sent'
+        message_log.sent_at = timezone.now()
+        if result.get('message_id') is not None:
+            message_log.external_id = str(result['message_id'])
+        if result.get('cost') is not None:
+            message_log.cost = Decimal(str(result['cost'])).quantize(Decimal('0.0001'))
+    else:
+        message_log.status = 'failed'
+        message_log.error_message = result.get('error', 'Unknown error')
+
+
 def send_sms_or_whatsapp(phone_number, message_body, message_type='sms'):
     """
     Send SMS or WhatsApp message using the SMS API.
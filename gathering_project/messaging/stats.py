@@ -0,0 +1,61 @@
+"""
+Message statistics - Summary numbers for the message log page.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from .models import MessageLog, MessageStatusCount
+
+STATUSES = ['pending', 'sent', 'failed', 'delivered']
+
+
+def get_status_totals():
+    """
+    Return all-time message counts per status from MessageStatusCount.
+
+    Returns:
+        dict with 'total' and one key per status
+    """
+    totals = {status: 0 for status in STATUSES}
+    rows = MessageStatusCount.objects.values('status').annotate(total=Sum('count')).order_by()
+    for row in rows:
+        totals[row['status']] = row['total'] or 0
+    totals['total'] = sum(totals[status] for status in STATUSES)
+    return totals
+
+
+def get_recent_stats(hours=1):
+    """
+    Return message counts per status for logs created in the last N hours,
+    using a single conditional aggregation query.
+
+    Returns:
+        dict with 'total' and one key per status
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    aggregates = {'total': Count('id')}
+    for status in STATUSES:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    return MessageLog.objects.filter(created_at__gte=since).aggregate(**aggregates)
+
+
+def rebuild_status_counts():
+    """
+    Recompute MessageStatusCount from the MessageLog table.
+
+    Returns:
+        int: number of counter rows written
+    """
+    rows = (
+        MessageLog.objects.annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('hour', 'status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    counters = [MessageStatusCount(hour=row['hour'], status=row['status'], count=row['count']) for row in rows]
+    with transaction.atomic():
+        MessageStatusCount.objects.all().delete()
+        MessageStatusCount.objects.bulk_create(counters, batch_size=500)
+    return len(counters)
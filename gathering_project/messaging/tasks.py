@@ -1,47 +1,76 @@
 """
-Celery tasks for scheduled messaging.
-Will be implemented when Celery is set up.
+Celery tasks for scheduled messaging and background campaigns.
 """
 from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from events.models import Event
-from people.models import Person
-from messaging.models import MessageTemplate
-from messaging.services import send_message
 
 
 @shared_task
 def send_event_reminders():
     """
     Send reminders for upcoming events.
-    This task should run daily to check for events happening in the next 24 hours.
+    Scheduled by beat (CELERY_BEAT_SCHEDULE) to check for events happening tomorrow.
+    
+    Safe to run more than once: people who already got a reminder for an
+    event are skipped, and an interrupted run resumes where it stopped.
     """
+    from messaging.reminders import get_reminder_templates, send_reminders_for_event
+    
     # Find events happening tomorrow
     tomorrow = timezone.now().date() + timedelta(days=1)
-    upcoming_events = Event.objects.filter(
+    upcoming_events = list(Event.objects.filter(
         event_date=tomorrow,
         is_active=True
-    )
+    ))
     
-    # Get reminder template (you'll need to create this)
-    try:
-        template = MessageTemplate.objects.get(name='Event Reminder', is_active=True)
-    except MessageTemplate.DoesNotExist:
+    # Reminder templates are named 'Event Reminder' (one per channel)
+    templates = get_reminder_templates()
+    if not templates:
         return "No reminder template found"
     
-    # Send reminders to all active people
-    people = Person.objects.filter(is_active=True)
     sent_count = 0
-    
     for event in upcoming_events:
-        for person in people:
-            if person.phone_number:  # Only send if they have a phone number
-                try:
-                    send_message(person, template, event)
-                    sent_count += 1
-                except Exception as e:
-                    print(f"Error sending message to {person.get_full_name()}: {e}")
+        sent_count += send_reminders_for_event(event, templates)
+    
+    return f"Sent {sent_count} reminders for {len(upcoming_events)} events"
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_campaign(campaign_id):
+    """
+    Send a campaign in the background.
+    
+    The task is acknowledged only after it finishes, so if the worker dies
+    partway the broker hands it to another worker, which carries on with
+    the logs that are still pending.
+    """
+    from messaging.campaigns import dispatch_campaign
+    
+    campaign = dispatch_campaign(campaign_id)
+    return f"Campaign {campaign.pk}: {campaign.get_status_display()}"
+
+
+@shared_task
+def resume_stalled_campaigns():
+    """
+    Re-queue campaigns whose worker stopped sending heartbeats.
+    This task should run every few minutes.
+    """
+    from messaging.campaigns import resume_stalled_campaigns as resume
     
-    return f"Sent {sent_count} reminders for {upcoming_events.count()} events"
+    return f"Resumed {resume()} stalled campaign(s)"
 
+
+@shared_task
+def reconcile_message_statuses():
+    """
+    Refresh delivery statuses for outstanding SMS/WhatsApp messages.
+    This task should run every minute; each message is only polled when
+    it is due for a check (see messaging.utils.STATUS_CHECK_SCHEDULE).
+    """
+    from messaging.utils import reconcile_message_statuses as reconcile
+    
+    updated_count, total_checked = reconcile()
+    return f"Updated {updated_count} of {total_checked} message status(es)"
@@ -0,0 +1,150 @@
+"""
+Message template compiler - Parses MessageTemplate bodies once and renders
+them for many people.
+
+A body such as "Hi {name}, see you at {event_location}" is split into
+literal text and variable segments. Compiled templates are cached by
+template id and updated_at, so editing a template recompiles it.
+"""
+import re
+import threading
+
+from django.core.exceptions import ValidationError
+
+# Variables a template body may use
+PERSON_VARIABLES = ('name',)
+EVENT_VARIABLES = ('event_name', 'event_date', 'event_time', 'event_location', 'event_topic')
+TEMPLATE_VARIABLES = PERSON_VARIABLES + EVENT_VARIABLES
+
+PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+# Keep at most this many compiled templates per process
+CACHE_SIZE = 256
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def find_unknown_variables(body):
+    """Return the placeholders in body that are not template variables, in order."""
+    unknown = []
+    for match in PLACEHOLDER_RE.finditer(body or ''):
+        variable = match.group(1)
+        if variable not in TEMPLATE_VARIABLES and variable not in unknown:
+            unknown.append(variable)
+    return unknown
+
+
+def validate_template_body(body):
+    """
+    Raise ValidationError if body uses a variable we can't fill in.
+
+    Called when a template is saved, so a typo like {event_nme} is caught
+    before the template is sent to thousands of people.
+    """
+    unknown = find_unknown_variables(body)
+    if unknown:
+        allowed = ', '.join('{' + v + '}' for v in TEMPLATE_VARIABLES)
+        found = ', '.join('{' + v + '}' for v in unknown)
+        raise ValidationError(
+            f'Unknown variable(s): {found}. Available variables: {allowed}',
+            code='unknown_variable',
+        )
+
+
+def get_event_values(event):
+    """Return the event variable values for an event."""
+    return {
+        'event_name': event.name or '',
+        'event_date': str(event.event_date) if event.event_date else '',
+        'event_time': str(event.event_time) if event.event_time else '',
+        'event_location': event.location or '',
+        'event_topic': event.topic or '',
+    }
+
+
+class CompiledTemplate:
+    """A template body split into literal and variable segments."""
+
+    def __init__(self, body):
+        # Each segment is (is_variable, text)
+        self.segments = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(body):
+            if match.start() > position:
+                self.segments.append((False, body[position:match.start()]))
+            variable = match.group(1)
+            if variable in TEMPLATE_VARIABLES:
+                self.segments.append((True, variable))
+            else:
+                # Unknown placeholders are left in the text as written
+                self.segments.append((False, match.group(0)))
+            position = match.end()
+        if position < len(body):
+            self.segments.append((False, body[position:]))
+
+        self.variables = {text for is_variable, text in self.segments if is_variable}
+        self.uses_person_variables = any(v in self.variables for v in PERSON_VARIABLES)
+
+    def render(self, person, event=None, event_values=None):
+        """
+        Render the body for one person.
+
+        Event variables are only filled in when an event is given; without
+        one they stay in the text as written.
+        """
+        if event_values is None and event is not None:
+            event_values = get_event_values(event)
+        values = dict(event_values or {})
+        if 'name' in self.variables:
+            values['name'] = person.get_full_name()
+
+        parts = []
+        for is_variable, text in self.segments:
+            if is_variable and text in values:
+                parts.append(values[text])
+            elif is_variable:
+                parts.append('{' + text + '}')
+            else:
+                parts.append(text)
+        return ''.join(parts)
+
+    def render_batch(self, people, event=None):
+        """
+        Render the body for many people against the same event.
+
+        Event values are read once for the whole batch, and templates that
+        don't use any person variables are rendered only once.
+
+        Returns:
+            list of bodies, in the same order as people
+        """
+        event_values = get_event_values(event) if event is not None else None
+        people = list(people)
+        if not self.uses_person_variables:
+            if not people:
+                return []
+            body = self.render(people[0], event_values=event_values)
+            return [body] * len(people)
+        return [self.render(person, event_values=event_values) for person in people]
+
+
+def get_compiled_template(template):
+    """
+    Return the CompiledTemplate for a MessageTemplate, compiling it if needed.
+
+    Cached on (template id, updated_at); unsaved templates are compiled
+    every time.
+    """
+    if template.pk is None or template.updated_at is None:
+        return CompiledTemplate(template.body)
+
+    key = (template.pk, template.updated_at)
+    compiled = _cache.get(key)
+    if compiled is None:
+        compiled = CompiledTemplate(template.body)
+        with _cache_lock:
+            if len(_cache) >= CACHE_SIZE:
+                _cache.clear()
+            _cache[key] = compiled
+    return compiled
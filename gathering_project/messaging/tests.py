@@ -0,0 +1,210 @@
+import io
+import json
+from datetime import time, timedelta
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event
+from people.models import Person
+
+from . import services
+from .models import MessageLog, MessageTemplate, ReminderRun
+from .receipts import apply_receipts, normalize_receipts, sign_body
+from .reminders import REMINDER_TEMPLATE_NAME, acquire_run, get_reminder_templates, send_reminders_for_event
+from .stats import STATUSES, get_status_totals
+from .transport import SMSTransport
+
+
+class CounterAssertions:
+    def assertCountersMatchLogs(self):
+        """MessageStatusCount agrees with a full count of the MessageLog table."""
+        totals = get_status_totals()
+        for status in STATUSES:
+            self.assertEqual(totals[status], MessageLog.objects.filter(status=status).count(), status)
+
+
+@override_settings(SMS_WEBHOOK_SECRET='test-secret')
+class DeliveryReceiptTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.person = Person.objects.create(first_name='Ama', last_name='Mensah', phone_number='+233201234567')
+        self.log = MessageLog.objects.create(
+            person=self.person, message_type='sms', recipient='+233201234567', body='Hello',
+            status='sent', external_id='batch-1',
+        )
+
+    def _apply(self, *receipts):
+        receipts, invalid = normalize_receipts(list(receipts))
+        return apply_receipts(receipts)
+
+    def _post(self, payload, signature=None):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse('messaging:delivery_receipt_webhook'), body, content_type='application/json',
+            HTTP_X_WEBHOOK_SIGNATURE=signature if signature is not None else sign_body(body),
+        )
+
+    def test_replayed_receipt_is_applied_once(self):
+        receipt = {'external_id': 'batch-1', 'recipient': '0201234567', 'status': 'delivered'}
+        self.assertEqual(self._apply(receipt), (1, 0))
+        self.assertEqual(self._apply(receipt), (0, 0))
+
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'delivered')
+        self.assertIsNotNone(self.log.delivered_at)
+        self.assertCountersMatchLogs()
+
+    def test_out_of_order_receipt_does_not_move_status_back(self):
+        self._apply({'external_id': 'batch-1', 'status': 'delivered'})
+        self.assertEqual(self._apply({'external_id': 'batch-1', 'status': 'pending'}), (0, 0))
+
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'delivered')
+        self.assertCountersMatchLogs()
+
+    def test_status_written_since_the_logs_were_read_is_kept(self):
+        # The reconciler marked the log delivered after the receipt batch read it
+        MessageLog.objects.filter(pk=self.log.pk).update(status='delivered')
+        moved = MessageLog.objects.move_statuses(
+            ['pending', 'sent'], 'failed', {self.log.pk: {'error_message': 'Rejected'}}
+        )
+
+        self.assertEqual(moved, [])
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'delivered')
+        self.assertIsNone(self.log.error_message)
+
+    def test_unknown_receipts_are_ignored(self):
+        self.assertEqual(self._apply({'external_id': 'other', 'status': 'delivered'}), (0, 1))
+
+    def test_webhook_rejects_bad_signature(self):
+        response = self._post({'external_id': 'batch-1', 'status': 'delivered'}, signature='0' * 64)
+        self.assertEqual(response.status_code, 403)
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'sent')
+
+    def test_webhook_applies_signed_batch(self):
+        response = self._post({'receipts': [
+            {'message_id': 'batch-1', 'status': 'failed', 'error': 'Handset off'},
+            {'message_id': 'batch-1'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.json()[key] for key in ('received', 'updated', 'ignored', 'invalid')},
+            {'received': 2, 'updated': 1, 'ignored': 0, 'invalid': 1},
+        )
+        self.log.refresh_from_db()
+        self.assertEqual((self.log.status, self.log.error_message), ('failed', 'Handset off'))
+        self.assertCountersMatchLogs()
+
+
+@override_settings(SMS_API_MAX_RETRIES=3, SMS_API_RATE_LIMIT=0)
+class TransportRetryTests(SimpleTestCase):
+    CSV = b'phone,name\n+233201234567,Ama\n+233241234567,Kofi\n'
+
+    def _response(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        return response
+
+    def _post_csv(self, csv_file, status_codes):
+        """POST csv_file as a multipart upload; returns the response and the bodies the API received."""
+        transport = SMSTransport()
+        status_codes = iter(status_codes)
+        uploads = []
+
+        def send(method, url, files=None, **kwargs):
+            uploads.append(files['csv_file'].read())
+            return self._response(next(status_codes))
+
+        with mock.patch.object(transport.session, 'request', side_effect=send), \
+                mock.patch.object(transport, '_sleep_before_retry'):
+            response = transport.post('https://api.example.com/sms/send/custom/', files={'csv_file': csv_file})
+        return response, uploads
+
+    def test_retried_upload_sends_the_whole_file_again(self):
+        response, uploads = self._post_csv(io.BytesIO(self.CSV), [503, 200])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(uploads, [self.CSV, self.CSV])
+
+    def test_upload_that_cannot_be_rewound_is_not_retried(self):
+        class Unseekable(io.BytesIO):
+            def seekable(self):
+                return False
+
+        response, uploads = self._post_csv(Unseekable(self.CSV), [503, 200])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(uploads, [self.CSV])
+
+    def test_post_is_not_retried_after_bad_gateway(self):
+        response, uploads = self._post_csv(io.BytesIO(self.CSV), [502, 200])
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(uploads), 1)
+
+
+@override_settings(SMS_API_PUBLIC_KEY='', SMS_API_SECRET_KEY='', MESSAGING_REMINDER_CHUNK_SIZE=2)
+class EventReminderTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            name='Sunday Gathering', event_date=timezone.localdate() + timedelta(days=1), event_time=time(10)
+        )
+        MessageTemplate.objects.create(name=REMINDER_TEMPLATE_NAME, message_type='sms', body='See you tomorrow, {name}!')
+        self.templates = get_reminder_templates()
+        self.people = [
+            Person.objects.create(
+                first_name=f'Person{i}', last_name='Test', phone_number=f'+23320000000{i}',
+                notification_preference='sms',
+            )
+            for i in range(5)
+        ]
+        Person.objects.create(
+            first_name='Quiet', last_name='Test', phone_number='+233209999999', notification_preference='none'
+        )
+        sender = mock.patch(
+            'messaging.services.send_sms_or_whatsapp', return_value={'success': True, 'message_id': 'm1'}
+        )
+        self.send = sender.start()
+        self.addCleanup(sender.stop)
+
+    def _sent_to(self):
+        return sorted(call.args[0] for call in self.send.call_args_list)
+
+    def test_sends_each_reminder_once(self):
+        self.assertEqual(send_reminders_for_event(self.event, self.templates), 5)
+        self.assertEqual(send_reminders_for_event(self.event, self.templates), 0)
+
+        self.assertEqual(self._sent_to(), sorted(person.phone_number for person in self.people))
+        self.assertEqual(ReminderRun.objects.get(event=self.event).status, 'completed')
+        self.assertCountersMatchLogs()
+
+    def test_run_is_skipped_while_another_holds_the_lock(self):
+        self.assertIsNotNone(acquire_run(self.event))
+        self.assertIsNone(acquire_run(self.event))
+        self.assertEqual(send_reminders_for_event(self.event, self.templates), 0)
+        self.send.assert_not_called()
+
+    def test_resumed_run_sends_logs_left_pending_by_a_crash(self):
+        # Crash after the second chunk's logs are written, before they are sent
+        real_dispatch = services.dispatch_message_logs
+        calls = []
+
+        def crash_on_second_chunk(message_logs, template):
+            calls.append(len(message_logs))
+            if len(calls) == 2:
+                raise RuntimeError('worker lost')
+            real_dispatch(message_logs, template)
+
+        with mock.patch('messaging.services.dispatch_message_logs', side_effect=crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                send_reminders_for_event(self.event, self.templates)
+        self.assertEqual(MessageLog.objects.filter(status='pending').count(), 2)
+
+        send_reminders_for_event(self.event, self.templates)
+
+        self.assertEqual(self._sent_to(), sorted(person.phone_number for person in self.people))
+        self.assertEqual(MessageLog.objects.filter(status='sent').count(), 5)
+        self.assertEqual(MessageLog.objects.count(), 5)
+        self.assertCountersMatchLogs()
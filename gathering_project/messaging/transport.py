@@ -0,0 +1,303 @@
+"""
+HTTP transport for the SMS API - Shared connection pool, rate limiting,
+retries and a circuit breaker.
+
+One transport is shared by every SMSAPIClient in the process (see
+get_transport), so keep-alive connections are reused across messages and
+the rate limit applies to the process as a whole.
+"""
+import random
+import threading
+import time
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def _rewindable_streams(files):
+    """
+    Return [(file object, position)] for the uploads in a requests `files`
+    argument, or None if any of them can't be rewound.
+    """
+    streams = []
+    for name, value in (files.items() if isinstance(files, dict) else files):
+        # A value is the file itself or a (filename, file, ...) tuple
+        stream = value[1] if isinstance(value, (tuple, list)) else value
+        if stream is None or isinstance(stream, (str, bytes, bytearray)):
+            continue
+        try:
+            if hasattr(stream, 'seekable') and not stream.seekable():
+                return None
+            streams.append((stream, stream.tell()))
+        except (AttributeError, OSError):
+            return None
+    return streams
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter."""
+
+    def __init__(self, rate, burst):
+        """
+        Args:
+            rate: Tokens added per second (0 or less disables limiting)
+            burst: Maximum number of tokens that can be saved up
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stop calling the API after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately for reset_seconds. After that one trial call is let
+    through; if it succeeds the circuit closes again, otherwise it reopens.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            # Half-open: let a single trial request through
+            if self.trial_in_progress:
+                return False
+            self.trial_in_progress = True
+            return True
+
+    def release_trial(self):
+        """End a half-open trial that produced no result (e.g. an unexpected error)."""
+        with self.lock:
+            self.trial_in_progress = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.error(f"SMS API circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+# Statuses that mean the API turned a request away without processing it,
+# so even a send (POST) can safely be retried
+POST_RETRY_STATUSES = {429, 503}
+
+
+class SMSTransport:
+    """Pooled, rate-limited HTTP transport used by SMSAPIClient."""
+
+    def __init__(self):
+        self.retry_statuses = set(getattr(settings, 'SMS_API_RETRY_STATUSES', [429, 502, 503, 504]))
+        self.max_retries = getattr(settings, 'SMS_API_MAX_RETRIES', 3)
+        self.backoff = getattr(settings, 'SMS_API_RETRY_BACKOFF', 0.5)
+        self.max_backoff = getattr(settings, 'SMS_API_RETRY_MAX_BACKOFF', 10)
+
+        pool_size = getattr(settings, 'SMS_API_POOL_SIZE', 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.rate_limiter = TokenBucket(
+            getattr(settings, 'SMS_API_RATE_LIMIT', 10),
+            getattr(settings, 'SMS_API_RATE_BURST', 20),
+        )
+        self.circuit_breaker = CircuitBreaker(
+            getattr(settings, 'SMS_API_CIRCUIT_FAILURE_THRESHOLD', 5),
+            getattr(settings, 'SMS_API_CIRCUIT_RESET_SECONDS', 30),
+        )
+
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def post(self, url, endpoint='post', **kwargs):
+        return self.request('POST', url, endpoint=endpoint, **kwargs)
+
+    def get(self, url, endpoint='get', **kwargs):
+        return self.request('GET', url, endpoint=endpoint, **kwargs)
+
+    def request(self, method, url, endpoint='request', **kwargs):
+        """
+        Make a request through the shared session.
+
+        Retries with jittered exponential backoff when the API answers with a
+        retryable status code. GETs retry on any of SMS_API_RETRY_STATUSES;
+        POSTs only on 429 and 503, since after a 502 or 504 the API may
+        already have accepted the message. Connection errors are retried
+        for GETs, and for POSTs only when the connection timed out before the
+        request was sent. Other errors are returned or raised straight away.
+
+        Uploaded files are rewound before each retry, so the API gets the
+        whole file again. A request with a file that can't be rewound is
+        not retried.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            endpoint: Name used for the latency counters
+            **kwargs: Passed on to requests.Session.request
+
+        Returns:
+            requests.Response
+
+        Raises:
+            CircuitOpenError: if the circuit breaker is open
+            requests.exceptions.RequestException: on connection errors
+        """
+        streams = _rewindable_streams(kwargs['files']) if kwargs.get('files') else []
+        max_retries = self.max_retries if streams is not None else 0
+        attempt = 0
+        while True:
+            if attempt:
+                for stream, position in streams:
+                    stream.seek(position)
+            if not self.circuit_breaker.allow_request():
+                self._record(endpoint, 0, error=True)
+                raise CircuitOpenError('SMS API is unavailable (too many recent failures). Please try again shortly.')
+
+            self.rate_limiter.acquire()
+            started = time.monotonic()
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(endpoint, time.monotonic() - started, error=True)
+                self.circuit_breaker.record_failure()
+                # POSTs are only retried when no connection was made, so a
+                # message the API may have received is never sent twice
+                if method == 'GET':
+                    retryable = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                else:
+                    retryable = isinstance(e, requests.exceptions.ConnectTimeout)
+                if retryable and attempt < max_retries:
+                    attempt += 1
+                    self._sleep_before_retry(attempt)
+                    continue
+                raise
+            finally:
+                if response is None:
+                    # Don't leave a half-open trial claimed forever when the
+                    # call raised something other than a RequestException
+                    self.circuit_breaker.release_trial()
+
+            elapsed = time.monotonic() - started
+            if response.status_code >= 500:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+            retry_statuses = self.retry_statuses if method == 'GET' else self.retry_statuses & POST_RETRY_STATUSES
+            if response.status_code in retry_statuses and attempt < max_retries:
+                self._record(endpoint, elapsed, error=True)
+                attempt += 1
+                logger.warning(f"SMS API returned {response.status_code} for {endpoint}, retry {attempt} of {max_retries}")
+                self._sleep_before_retry(attempt, response.headers.get('Retry-After'))
+                continue
+
+            self._record(endpoint, elapsed, error=response.status_code >= 400)
+            return response
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        """Sleep using full-jitter exponential backoff (or Retry-After if given)."""
+        delay = None
+        if retry_after:
+            try:
+                delay = min(float(retry_after), self.max_backoff)
+            except ValueError:
+                delay = None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
+        time.sleep(delay)
+
+    def _record(self, endpoint, seconds, error=False):
+        with self.stats_lock:
+            stats = self.stats.setdefault(endpoint, {
+                'calls': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+            })
+            ms = seconds * 1000
+            stats['calls'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            if error:
+                stats['errors'] += 1
+
+    def get_stats(self):
+        """
+        Return per-endpoint latency counters.
+
+        Returns:
+            dict mapping endpoint name to 'calls', 'errors', 'total_ms',
+            'avg_ms' and 'max_ms'
+        """
+        with self.stats_lock:
+            result = {}
+            for endpoint, stats in self.stats.items():
+                result[endpoint] = dict(stats)
+                result[endpoint]['avg_ms'] = stats['total_ms'] / stats['calls'] if stats['calls'] else 0
+            return result
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Return the process-wide SMSTransport, creating it on first use."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = SMSTransport()
+    return _transport
@@ -11,5 +11,12 @@ urlpatterns = [
     path('templates/<int:pk>/send/', views.send_message_view, name='send_message'),
     path('templates/<int:template_id>/test/', views.send_test_message, name='send_test'),
     path('logs/', views.message_log_list, name='message_log_list'),
+    path('audiences/', views.segment_list, name='segment_list'),
+    path('audiences/create/', views.segment_create, name='segment_create'),
+    path('audiences/<int:pk>/update/', views.segment_update, name='segment_update'),
+    path('audiences/<int:pk>/count/', views.segment_count, name='segment_count'),
+    path('campaigns/<int:pk>/', views.campaign_detail, name='campaign_detail'),
+    path('campaigns/<int:pk>/progress/', views.campaign_progress, name='campaign_progress'),
+    path('webhooks/delivery-receipts/', views.delivery_receipt_webhook, name='delivery_receipt_webhook'),
 ]
 
@@ -1,101 +1,192 @@
 """
 Utility functions for messaging.
 """
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .api_client import SMSAPIClient
 from .models import MessageLog
-from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Map API status to our status choices
+STATUS_MAPPING = {
+    'pending': 'pending',
+    'sent': 'sent',
+    'delivered': 'delivered',
+    'failed': 'failed',
+    'read': 'delivered',  # WhatsApp read status
+}
+
+# Statuses only move forward: later states win; delivered and failed are final
+STATUS_RANK = {
+    'pending': 0,
+    'sent': 1,
+    'delivered': 2,
+    'failed': 2,
+}
+
+# How often to re-check a message, by age: (younger than, check every).
+# New messages change state quickly; old ones rarely change at all.
+STATUS_CHECK_SCHEDULE = [
+    (timedelta(minutes=10), timedelta(minutes=1)),
+    (timedelta(hours=1), timedelta(minutes=5)),
+    (timedelta(hours=6), timedelta(minutes=30)),
+    (timedelta(hours=24), timedelta(hours=2)),
+    (timedelta(days=3), timedelta(hours=6)),
+]
+
+# Columns the reconciler writes back
+STATUS_RESULT_FIELDS = ['status', 'delivered_at', 'status_checked_at']
+
+
+def apply_status_result(message_log, result, checked_at=None):
+    """
+    Copy a check_message_status result onto a MessageLog (without saving it).
+
+    The status only moves forward (see STATUS_RANK), so a stale or
+    out-of-order API answer never undoes a newer state.
+
+    Returns:
+        bool: True if the status changed
+    """
+    message_log.status_checked_at = checked_at or timezone.now()
+    if not result.get('success'):
+        return False
+
+    mapped_status = STATUS_MAPPING.get(result.get('status'), message_log.status)
+    if STATUS_RANK.get(mapped_status, 0) <= STATUS_RANK.get(message_log.status, 0):
+        return False
+
+    message_log.status = mapped_status
+    if mapped_status == 'delivered' and not message_log.delivered_at:
+        delivered_at = None
+        if result.get('delivered_at'):
+            delivered_at = parse_datetime(str(result['delivered_at']).replace('Z', '+00:00'))
+        message_log.delivered_at = delivered_at or message_log.status_checked_at
+    return True
+
 
 def check_message_status(message_log):
     """
     Check and update the status of a message log using the API.
-    
+
     Args:
         message_log: MessageLog instance
-    
+
     Returns:
         bool: True if status was updated, False otherwise
     """
     if not message_log.external_id:
         return False
-    
+
     if message_log.message_type not in ['sms', 'whatsapp']:
         return False
-    
+
     try:
         api_client = SMSAPIClient()
         result = api_client.check_message_status(message_log.external_id)
-        
-        if result['success']:
-            new_status = result.get('status', message_log.status)
-            
-            # Map API status to our status choices
-            status_mapping = {
-                'pending': 'pending',
-                'sent': 'sent',
-                'delivered': 'delivered',
-                'failed': 'failed',
-                'read': 'delivered',  # WhatsApp read status
-            }
-            
-            mapped_status = status_mapping.get(new_status, message_log.status)
-            
-            if mapped_status != message_log.status:
-                message_log.status = mapped_status
-                
-                # Update delivered_at if available
-                if result.get('delivered_at') and mapped_status == 'delivered':
-                    try:
-                        from datetime import datetime
-                        delivered_at = datetime.fromisoformat(result['delivered_at'].replace('Z', '+00:00'))
-                        # Note: We don't have a delivered_at field yet, but we can add it if needed
-                    except:
-                        pass
-                
-                message_log.save()
-                return True
-        
-        return False
-        
+        updated = apply_status_result(message_log, result)
+        message_log.save(update_fields=STATUS_RESULT_FIELDS)
+        return updated
+
     except Exception as e:
         logger.error(f"Error checking message status: {str(e)}")
         return False
 
 
-def update_message_statuses(limit=50, hours=24):
+def get_logs_due_for_status_check(now=None):
     """
-    Update statuses for recent pending/sent messages that have external IDs.
-    Optimized to only check recent messages to avoid slow performance.
-    
-    Args:
-        limit: Maximum number of messages to check (default: 50)
-        hours: Only check messages from the last N hours (default: 24)
-    
-    Returns:
-        tuple: (updated_count, total_checked)
+    Return outstanding SMS/WhatsApp logs whose next status check is due.
+
+    A log is outstanding while it is pending or sent and has an external ID.
+    How often it is checked depends on its age (STATUS_CHECK_SCHEDULE);
+    logs older than the last age band are no longer checked.
     """
-    from datetime import timedelta
-    
-    # Only check recent messages (last 24 hours by default) to keep it fast
-    cutoff_time = timezone.now() - timedelta(hours=hours)
-    
-    message_logs = MessageLog.objects.filter(
+    now = now or timezone.now()
+
+    due = Q()
+    newer_than = None
+    for max_age, interval in STATUS_CHECK_SCHEDULE:
+        band = Q(created_at__gte=now - max_age)
+        if newer_than is not None:
+            band &= Q(created_at__lt=now - newer_than)
+        band &= Q(status_checked_at__isnull=True) | Q(status_checked_at__lte=now - interval)
+        due |= band
+        newer_than = max_age
+
+    return MessageLog.objects.filter(
+        due,
         external_id__isnull=False,
         status__in=['pending', 'sent'],
         message_type__in=['sms', 'whatsapp'],
-        created_at__gte=cutoff_time  # Only recent messages
-    ).order_by('-created_at')[:limit]  # Limit to most recent N messages
-    
-    updated_count = 0
-    total_checked = 0
-    
+    ).exclude(external_id='')
+
+
+def reconcile_message_statuses(limit=None):
+    """
+    Poll the API for outstanding messages and save any status changes.
+
+    Messages sent in one bulk request share an external ID, so each ID is
+    checked once. Checks run in MESSAGING_STATUS_CONCURRENCY threads. The
+    check time is saved with one update, and each status change is written
+    only if the stored status is still the one that was read, so a newer
+    status written meanwhile (e.g. by a delivery receipt) is kept.
+
+    Args:
+        limit: Maximum number of logs to look at (default:
+            MESSAGING_STATUS_BATCH_SIZE)
+
+    Returns:
+        tuple: (updated_count, total_checked)
+    """
+    limit = limit or getattr(settings, 'MESSAGING_STATUS_BATCH_SIZE', 500)
+    concurrency = max(1, getattr(settings, 'MESSAGING_STATUS_CONCURRENCY', 8))
+    now = timezone.now()
+
+    message_logs = list(
+        get_logs_due_for_status_check(now).order_by(
+            F('status_checked_at').asc(nulls_first=True), '-created_at'
+        )[:limit]
+    )
+    if not message_logs:
+        return 0, 0
+
+    by_external_id = {}
     for message_log in message_logs:
-        total_checked += 1
-        if check_message_status(message_log):
-            updated_count += 1
-    
-    return updated_count, total_checked
+        by_external_id.setdefault(message_log.external_id, []).append(message_log)
 
+    api_client = SMSAPIClient()
+
+    def check(external_id):
+        try:
+            return external_id, api_client.check_message_status(external_id)
+        except Exception as e:
+            logger.error(f"Error checking message status: {str(e)}")
+            return external_id, {'success': False, 'error': str(e)}
+
+    if len(by_external_id) == 1 or concurrency == 1:
+        results = [check(external_id) for external_id in by_external_id]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(by_external_id))) as pool:
+            results = list(pool.map(check, by_external_id))
+
+    moved = []
+    for external_id, result in results:
+        for message_log in by_external_id[external_id]:
+            previous_status = message_log.status
+            if apply_status_result(message_log, result, checked_at=now):
+                moved.append((message_log, previous_status))
+
+    MessageLog.objects.filter(pk__in=[message_log.pk for message_log in message_logs]).update(
+        status_checked_at=now
+    )
+    updated_count = 0
+    for message_log, previous_status in moved:
+        if MessageLog.objects.move_status(message_log, previous_status, delivered_at=message_log.delivered_at):
+            updated_count += 1
+    return updated_count, len(message_logs)
@@ -1,15 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import json
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.utils import timezone
-from datetime import timedelta
 from django.db.models import Q
-from .models import MessageTemplate, MessageLog
-from .forms import MessageTemplateForm, SendMessageForm
-from .services import send_message
-from .utils import update_message_statuses
-from people.models import Person
+from .models import MessageTemplate, MessageLog, Campaign, AudienceSegment
+from .forms import MessageTemplateForm, SendMessageForm, AudienceSegmentForm
+from .campaigns import create_campaign, start_campaign
+from .receipts import verify_signature, normalize_receipts, apply_receipts
+from .stats import get_status_totals, get_recent_stats
 from events.models import Event
 
 # Create your views here.
@@ -66,15 +68,8 @@ def template_update(request, pk):
 @login_required
 def message_log_list(request):
     """List all sent messages with summary statistics."""
-    # Optional: refresh delivery statuses from API when ?refresh=1 is present
-    # Limited to recent messages (last 24 hours, max 50) for performance
-    if request.GET.get("refresh") == "1":
-        updated_count, total_checked = update_message_statuses(limit=50, hours=24)
-        if updated_count > 0:
-            messages.success(request, f"Updated delivery status for {updated_count} of {total_checked} recent message(s).")
-        else:
-            messages.info(request, f"Checked {total_checked} recent message(s). No status updates needed.")
-
+    # Delivery statuses are refreshed in the background by the
+    # reconcile_message_statuses task; this page only reads them
     message_logs = MessageLog.objects.all()
     
     # Filter by status and type
@@ -87,24 +82,13 @@ def message_log_list(request):
     if filter_type != 'all':
         message_logs = message_logs.filter(message_type=filter_type)
     
-    # Get summary statistics (from all messages, not filtered)
-    all_logs = MessageLog.objects.all()
-    total_count = all_logs.count()
-    sent_count = all_logs.filter(status='sent').count()
-    failed_count = all_logs.filter(status='failed').count()
-    pending_count = all_logs.filter(status='pending').count()
-    delivered_count = all_logs.filter(status='delivered').count()
-    
-    # Recent batch statistics (last hour)
-    one_hour_ago = timezone.now() - timedelta(hours=1)
-    recent_logs = all_logs.filter(created_at__gte=one_hour_ago)
-    recent_total = recent_logs.count()
-    recent_sent = recent_logs.filter(status='sent').count()
-    recent_failed = recent_logs.filter(status='failed').count()
-    recent_pending = recent_logs.filter(status='pending').count()
+    # Summary statistics (from all messages, not filtered): all-time totals
+    # come from the counter table, the last hour from one aggregate query
+    totals = get_status_totals()
+    recent = get_recent_stats(hours=1)
     
     # Pagination
-    paginator = Paginator(message_logs.order_by('-created_at'), 50)  # 50 per page
+    paginator = Paginator(message_logs.select_related('person', 'event').order_by('-created_at'), 50)  # 50 per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -114,16 +98,16 @@ def message_log_list(request):
         'filter_status': filter_status,
         'filter_type': filter_type,
         # Summary statistics
-        'total_count': total_count,
-        'sent_count': sent_count,
-        'failed_count': failed_count,
-        'pending_count': pending_count,
-        'delivered_count': delivered_count,
+        'total_count': totals['total'],
+        'sent_count': totals['sent'],
+        'failed_count': totals['failed'],
+        'pending_count': totals['pending'],
+        'delivered_count': totals['delivered'],
         # Recent batch (last hour)
-        'recent_total': recent_total,
-        'recent_sent': recent_sent,
-        'recent_failed': recent_failed,
-        'recent_pending': recent_pending,
+        'recent_total': recent['total'],
+        'recent_sent': recent['sent'],
+        'recent_failed': recent['failed'],
+        'recent_pending': recent['pending'],
     }
     return render(request, 'messaging/message_log_list.html', context)
 
@@ -148,51 +132,130 @@ def send_message_view(request, pk):
         form.fields['template'].initial = template
         
         if form.is_valid():
-            selected_people = form.cleaned_data['people']
+            segment = form.cleaned_data['segment']
             selected_event = form.cleaned_data.get('event')
             
-            success_count = 0
-            error_count = 0
-            
-            for person in selected_people:
-                try:
-                    # Check if person has the required contact info
-                    if template.message_type in ['sms', 'whatsapp']:
-                        if not person.phone_number:
-                            error_count += 1
-                            continue
-                    elif template.message_type == 'email':
-                        if not person.email:
-                            error_count += 1
-                            continue
-                    
-                    # Send the message
-                    message_log = send_message(person, template, selected_event)
-                    if message_log.status == 'sent':
-                        success_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    error_count += 1
-                    # Log the error but continue with other people
-            
-            if success_count > 0:
-                messages.success(request, f'Successfully sent {success_count} message(s)!')
-            if error_count > 0:
-                messages.warning(request, f'{error_count} message(s) failed to send.')
+            # Freeze the audience and send in the background
+            campaign = create_campaign(
+                template,
+                segment.get_queryset(),
+                event=selected_event,
+                created_by=request.user,
+                segment=segment
+            )
+            start_campaign(campaign)
             
-            return redirect('messaging:message_log_list')
+            messages.success(request, f'Sending to {campaign.total_recipients} recipient(s) in the background.')
+            return redirect('messaging:campaign_detail', pk=campaign.pk)
     else:
         form = SendMessageForm(initial={'template': template})
         form.fields['template'].queryset = MessageTemplate.objects.filter(pk=template.pk)
     
-    # Get people count for display
-    total_people = Person.objects.filter(is_active=True).count()
-    
     context = {
         'form': form,
         'template': template,
-        'total_people': total_people,
     }
     return render(request, 'messaging/send_message.html', context)
 
+
+@login_required
+def segment_list(request):
+    """List saved audience segments."""
+    segments = AudienceSegment.objects.select_related('event')
+    return render(request, 'messaging/segment_list.html', {'segments': segments})
+
+
+@login_required
+def segment_create(request):
+    """Create a new audience segment."""
+    if request.method == 'POST':
+        form = AudienceSegmentForm(request.POST)
+        if form.is_valid():
+            segment = form.save()
+            messages.success(request, f'Audience "{segment.name}" created successfully!')
+            return redirect('messaging:segment_list')
+    else:
+        form = AudienceSegmentForm()
+    
+    return render(request, 'messaging/segment_form.html', {'form': form, 'action': 'Create'})
+
+
+@login_required
+def segment_update(request, pk):
+    """Update an existing audience segment."""
+    segment = get_object_or_404(AudienceSegment, pk=pk)
+    
+    if request.method == 'POST':
+        form = AudienceSegmentForm(request.POST, instance=segment)
+        if form.is_valid():
+            segment = form.save()
+            messages.success(request, f'Audience "{segment.name}" updated successfully!')
+            return redirect('messaging:segment_list')
+    else:
+        form = AudienceSegmentForm(instance=segment)
+    
+    return render(request, 'messaging/segment_form.html', {'form': form, 'action': 'Update', 'segment': segment})
+
+
+@login_required
+def segment_count(request, pk):
+    """Return the live number of people in a segment (AJAX)."""
+    segment = get_object_or_404(AudienceSegment, pk=pk)
+    return JsonResponse({'count': segment.count()})
+
+
+@login_required
+def campaign_detail(request, pk):
+    """Progress page for a background campaign."""
+    campaign = get_object_or_404(Campaign.objects.select_related('template', 'event'), pk=pk)
+    context = {
+        'campaign': campaign,
+        'progress': campaign.get_progress(),
+    }
+    return render(request, 'messaging/campaign_detail.html', context)
+
+
+@login_required
+def campaign_progress(request, pk):
+    """Return campaign progress as JSON (polled by the progress page)."""
+    campaign = get_object_or_404(Campaign, pk=pk)
+    progress = campaign.get_progress()
+    return JsonResponse({
+        'status': campaign.status,
+        'status_display': campaign.get_status_display(),
+        'total': progress['total'],
+        'sent': progress['sent'],
+        'failed': progress['failed'],
+        'remaining': progress['remaining'],
+        'finished': campaign.status in ['completed', 'failed'],
+    })
+
+
+@csrf_exempt
+@require_POST
+def delivery_receipt_webhook(request):
+    """
+    Receive delivery receipts pushed by the SMS provider (public, signed).
+    
+    Accepts one receipt or a batch; see messaging.receipts for the format.
+    Requests must carry an X-Webhook-Signature header (HMAC-SHA256 of the
+    body with SMS_WEBHOOK_SECRET).
+    """
+    if not verify_signature(request.body, request.headers.get('X-Webhook-Signature', '')):
+        return JsonResponse({'success': False, 'message': 'Invalid signature.'}, status=403)
+    
+    try:
+        payload = json.loads(request.body or b'null')
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Request body must be JSON.'}, status=400)
+    
+    receipts, invalid_count = normalize_receipts(payload)
+    updated_count, ignored_count = apply_receipts(receipts)
+    
+    return JsonResponse({
+        'success': True,
+        'received': len(receipts) + invalid_count,
+        'updated': updated_count,
+        'ignored': ignored_count,
+        'invalid': invalid_count,
+    })
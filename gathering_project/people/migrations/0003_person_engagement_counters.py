@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+def fill_engagement_counters(apps, schema_editor):
+    """Compute the engagement counters from the existing attendance records."""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    Person = apps.get_model('people', 'Person')
+    dates = {}
+    for person_id, event_date in Attendance.objects.values_list('person_id', 'event__event_date').iterator():
+        dates.setdefault(person_id, []).append(event_date)
+
+    people = []
+    for person in Person.objects.filter(pk__in=dates.keys()):
+        attended = dates[person.pk]
+        weeks = sorted({(day.toordinal() - 1) // 7 for day in attended}, reverse=True)
+        streak = 0
+        while streak < len(weeks) and weeks[streak] == weeks[0] - streak:
+            streak += 1
+        person.attendance_count = len(attended)
+        person.first_attended_on = min(attended)
+        person.last_attended_on = max(attended)
+        person.attendance_streak = streak
+        people.append(person)
+    Person.objects.bulk_update(
+        people,
+        ['attendance_count', 'first_attended_on', 'last_attended_on', 'attendance_streak'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0002_person_notification_preference_and_more'),
+        ('attendance', '0003_attendance_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='attendance_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='attendance_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Consecutive weeks attended, ending with the week of the last attendance'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='first_attended_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_attended_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_engagement_counters, migrations.RunPython.noop),
+    ]
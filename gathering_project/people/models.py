@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 import uuid
 
@@ -27,6 +29,15 @@ class Person(models.Model):
     qr_code = models.CharField(max_length=100, unique=True, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     
+    # Engagement counters, kept up to date by attendance.engagement
+    attendance_count = models.PositiveIntegerField(default=0, db_index=True)
+    first_attended_on = models.DateField(blank=True, null=True)
+    last_attended_on = models.DateField(blank=True, null=True)
+    attendance_streak = models.PositiveIntegerField(
+        default=0,
+        help_text='Consecutive weeks attended, ending with the week of the last attendance'
+    )
+    
     class Meta:
         ordering = ['-date_registered']
         verbose_name_plural = 'People'
@@ -37,6 +48,14 @@ class Person(models.Model):
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
     
+    def get_current_streak(self, today=None):
+        """Weekly attendance streak, or 0 if the person missed last week."""
+        if not self.last_attended_on:
+            return 0
+        today = today or timezone.localdate()
+        weeks_since = (today.toordinal() - 1) // 7 - (self.last_attended_on.toordinal() - 1) // 7
+        return self.attendance_streak if weeks_since <= 1 else 0
+    
     def save(self, *args, **kwargs):
         # Generate QR code if not already set
         if not self.qr_code:
@@ -44,3 +63,17 @@ class Person(models.Model):
             self.qr_code = str(self.id)
         super().save(*args, **kwargs)
 
+
+@receiver(post_save, sender=Person)
+def update_roster(sender, instance, **kwargs):
+    """Keep the in-memory check-in roster in step with saved people."""
+    from .roster import roster
+    transaction.on_commit(lambda: roster.upsert(instance))
+
+
+@receiver(post_delete, sender=Person)
+def remove_from_roster(sender, instance, **kwargs):
+    """Drop deleted people from the in-memory check-in roster."""
+    from .roster import roster
+    person_id = instance.pk
+    transaction.on_commit(lambda: roster.remove(person_id))
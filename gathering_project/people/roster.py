@@ -0,0 +1,363 @@
+"""
+Roster - In-memory index of people for resolving check-in scans.
+
+Each worker loads the roster once (one query) and then resolves scans and
+typeahead searches from memory. Person post_save/post_delete
+signals patch the local roster in place and bump a shared version number
+in the cache; other workers see the new version on their next lookup and
+reload, so a roster is never more than one request out of date.
+"""
+from bisect import bisect_left, insort
+from collections import namedtuple
+import heapq
+import re
+import threading
+import unicodedata
+import uuid
+
+from django.core.cache import cache
+
+from .models import Person
+
+VERSION_KEY = 'people:roster:version'
+
+RosterEntry = namedtuple(
+    'RosterEntry',
+    ['id', 'qr_code', 'phone_key', 'is_active', 'name', 'phone_number', 'tokens'],
+)
+
+# Shortest digit string treated as a phone number search
+MIN_PHONE_DIGITS = 3
+
+# Highest code point, used as the upper bound of a prefix range
+_MAX_CHAR = '\U0010ffff'
+
+
+def normalize_phone(phone_number):
+    """
+    Reduce a phone number to digits so '+233...' and '233...' compare equal.
+
+    Local numbers starting with 0 are treated as Ghana numbers, like
+    registration does.
+    """
+    digits = re.sub(r'\D', '', phone_number or '')
+    if digits.startswith('0'):
+        digits = '233' + digits[1:]
+    return digits
+
+
+def name_tokens(text):
+    """
+    Split a name into lowercase search tokens with accents removed.
+
+    'José  O\'Neil-Mensah' -> ('jose', 'oneil', 'mensah')
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = text.replace("'", '').replace('\u2019', '')
+    return tuple(token for token in re.split(r'[^\w]+|_', text) if token)
+
+
+def _entry(person):
+    return RosterEntry(
+        id=person.pk,
+        qr_code=person.qr_code,
+        phone_key=normalize_phone(person.phone_number),
+        is_active=person.is_active,
+        name=person.get_full_name(),
+        phone_number=person.phone_number,
+        tokens=name_tokens(f'{person.first_name} {person.last_name}'),
+    )
+
+
+def _name_postings(entry):
+    """
+    Return the name index rows for an entry.
+
+    Rows are (token, inactive, position, tokens, id), so within one token
+    they are already in ranking order.
+    """
+    postings = []
+    for position, token in enumerate(entry.tokens):
+        if token not in entry.tokens[:position]:
+            postings.append((token, not entry.is_active, position, entry.tokens, entry.id))
+    return postings
+
+
+def _prefix_range(sorted_rows, prefix):
+    """Return the rows of a sorted index whose first column starts with prefix."""
+    start = bisect_left(sorted_rows, (prefix,))
+    end = bisect_left(sorted_rows, (prefix + _MAX_CHAR,))
+    return sorted_rows[start:end]
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def _bump_shared_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        return cache.incr(VERSION_KEY)
+
+
+class Roster:
+    """
+    Lookups from QR code, person id and phone number to RosterEntry.
+
+    Other workers only see changes through the shared version number, so
+    production needs a shared cache (CACHE_URL). With the default
+    per-process cache, a QR code or phone number that misses is looked up
+    in the database, so people registered through another worker can
+    still check in.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._by_id = {}
+        self._by_qr = {}
+        self._by_phone = {}
+        # Sorted name rows (see _name_postings) and (reversed phone digits, id)
+        # rows for search; reversing the digits turns "ends with" into a prefix lookup
+        self._name_index = []
+        self._phone_suffix_index = []
+
+    def _load(self):
+        version = _shared_version()
+        by_id, by_qr, by_phone = {}, {}, {}
+        name_index, phone_suffix_index = [], []
+        people = Person.objects.only('id', 'first_name', 'last_name', 'phone_number', 'qr_code', 'is_active')
+        for person in people.iterator(chunk_size=2000):
+            entry = _entry(person)
+            by_id[entry.id] = entry
+            if entry.qr_code:
+                by_qr[entry.qr_code] = entry
+            if entry.phone_key:
+                by_phone[entry.phone_key] = entry
+                phone_suffix_index.append((entry.phone_key[::-1], entry.id))
+            name_index.extend(_name_postings(entry))
+        name_index.sort()
+        phone_suffix_index.sort()
+        # Swap the indexes in together so readers never see a partial load
+        self._by_id, self._by_qr, self._by_phone = by_id, by_qr, by_phone
+        self._name_index, self._phone_suffix_index = name_index, phone_suffix_index
+        self._version = version
+
+    def _ensure_current(self):
+        if self._version != _shared_version():
+            with self._lock:
+                if self._version != _shared_version():
+                    self._load()
+
+    def resolve(self, identifier):
+        """
+        Return the RosterEntry for a QR code value or person id, or None.
+
+        The QR code is tried first since that is what scanners read.
+        """
+        self._ensure_current()
+        identifier = (identifier or '').strip()
+        entry = self._by_qr.get(identifier)
+        if entry is None:
+            try:
+                entry = self._by_id.get(uuid.UUID(identifier))
+            except ValueError:
+                pass
+        if entry is None and identifier:
+            person = Person.objects.filter(qr_code=identifier).first()
+            if person is None:
+                try:
+                    person = Person.objects.filter(pk=uuid.UUID(identifier)).first()
+                except ValueError:
+                    pass
+            entry = self._add_missed(person)
+        return entry
+
+    def resolve_phone(self, phone_number):
+        """Return the RosterEntry for a phone number in any common format, or None."""
+        self._ensure_current()
+        phone_key = normalize_phone(phone_number)
+        entry = self._by_phone.get(phone_key)
+        if entry is None and len(phone_key) >= MIN_PHONE_DIGITS:
+            # Stored numbers vary in format, so match the last 9 digits
+            # (a Ghana number without its prefix) and compare all digits
+            candidates = Person.objects.filter(phone_number__endswith=phone_key[-9:])
+            person = next(
+                (person for person in candidates if normalize_phone(person.phone_number) == phone_key), None
+            )
+            entry = self._add_missed(person)
+        return entry
+
+    def _add_missed(self, person):
+        """
+        Add a person found in the database after a lookup missed.
+
+        The shared version isn't bumped: the person was already saved, so
+        other workers are no more out of date than before.
+        """
+        if person is None:
+            return None
+        with self._lock:
+            self._discard(person.pk)
+            return self._insert(person)
+
+    def search(self, query, limit=10):
+        """
+        Typeahead search by name or phone number.
+
+        Every word of the query must start one of the person's name words
+        ('jo me' finds 'John Mensah'). A query of MIN_PHONE_DIGITS or more
+        digits matches the end of phone numbers, so the last 4 digits work.
+        Active people, exact word matches and first-name matches rank first.
+
+        Returns:
+            list of RosterEntry, best match first
+        """
+        self._ensure_current()
+        query = (query or '').strip()
+        digits = re.sub(r'\D', '', query)
+        by_id = self._by_id
+
+        if len(digits) >= MIN_PHONE_DIGITS and not re.search(r'[^\d\s+()-]', query):
+            matches = []
+            exact = self._by_phone.get(normalize_phone(query))
+            if exact is not None:
+                matches.append(exact)
+            for reversed_digits, person_id in _prefix_range(self._phone_suffix_index, digits[::-1]):
+                entry = by_id.get(person_id)
+                if entry is not None and entry is not exact:
+                    matches.append(entry)
+            if exact is not None:
+                return matches[:limit]
+            return heapq.nsmallest(limit, matches, key=lambda entry: (not entry.is_active, entry.tokens))
+
+        query_tokens = name_tokens(query)
+        if not query_tokens:
+            return []
+        # Only the most selective word's prefix range is scanned; the other
+        # words are checked against each candidate's tokens
+        lead, rows = min(
+            ((token, _prefix_range(self._name_index, token)) for token in set(query_tokens)),
+            key=lambda item: len(item[1]),
+        )
+        if len(query_tokens) == 1:
+            ranked = heapq.nsmallest(
+                limit * 2, rows, key=lambda row: (row[1], row[0] != lead, row[2], row[3])
+            )
+        else:
+            scored = []
+            for token, inactive, position, tokens, person_id in rows:
+                score = _name_score(tokens, query_tokens)
+                if score is not None:
+                    scored.append((inactive, score, tokens, person_id))
+            ranked = heapq.nsmallest(limit * 2, scored, key=lambda row: row[:3])
+
+        results = []
+        for row in ranked:
+            entry = by_id.get(row[-1])
+            # A person can match on two of their words; keep their best row
+            if entry is not None and entry not in results:
+                results.append(entry)
+        return results[:limit]
+
+    def upsert(self, person):
+        """Add or update one person and tell other workers the roster changed."""
+        with self._lock:
+            if not self._bump():
+                return
+            self._discard(person.pk)
+            self._insert(person)
+
+    def remove(self, person_id):
+        """Drop one person and tell other workers the roster changed."""
+        with self._lock:
+            if self._bump():
+                self._discard(person_id)
+
+    def _bump(self):
+        """
+        Bump the shared version.
+
+        Returns True if this roster was current before the change and can be
+        patched in place; otherwise it is marked stale and reloads on the
+        next lookup.
+        """
+        version = _bump_shared_version()
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+            return True
+        self._version = None
+        return False
+
+    def _insert(self, person):
+        entry = _entry(person)
+        self._by_id[entry.id] = entry
+        if entry.qr_code:
+            self._by_qr[entry.qr_code] = entry
+        if entry.phone_key:
+            self._by_phone[entry.phone_key] = entry
+            insort(self._phone_suffix_index, (entry.phone_key[::-1], entry.id))
+        for posting in _name_postings(entry):
+            insort(self._name_index, posting)
+        return entry
+
+    def _discard(self, person_id):
+        previous = self._by_id.pop(person_id, None)
+        if previous is not None:
+            if self._by_qr.get(previous.qr_code) is previous:
+                del self._by_qr[previous.qr_code]
+            if self._by_phone.get(previous.phone_key) is previous:
+                del self._by_phone[previous.phone_key]
+            if previous.phone_key:
+                _remove_row(self._phone_suffix_index, (previous.phone_key[::-1], previous.id))
+            for posting in _name_postings(previous):
+                _remove_row(self._name_index, posting)
+
+    def clear(self):
+        """Forget the loaded roster; the next lookup reloads it."""
+        with self._lock:
+            self._version = None
+            self._by_id, self._by_qr, self._by_phone = {}, {}, {}
+            self._name_index, self._phone_suffix_index = [], []
+
+
+def _remove_row(sorted_rows, row):
+    index = bisect_left(sorted_rows, row)
+    if index < len(sorted_rows) and sorted_rows[index] == row:
+        del sorted_rows[index]
+
+
+def _name_score(tokens, query_tokens):
+    """
+    Score how well a person's name tokens match the query, lower is better.
+
+    Returns:
+        tuple (prefix-only matches, first matched position), or None if some
+        query word doesn't start any name word
+    """
+    prefix_only = 0
+    first_position = None
+    for query_token in query_tokens:
+        best = None
+        for position, token in enumerate(tokens):
+            if token == query_token:
+                best = (0, position)
+                break
+            if best is None and token.startswith(query_token):
+                best = (1, position)
+        if best is None:
+            return None
+        prefix_only += best[0]
+        if first_position is None or best[1] < first_position:
+            first_position = best[1]
+    return (prefix_only, first_position)
+
+
+roster = Roster()
@@ -0,0 +1,22 @@
+// Dashboard panels: the page arrives with empty [data-panel-url] placeholders,
+// and every panel is fetched at once so a slow one doesn't hold up the rest.
+// The browser revalidates with the panel's ETag, so unchanged panels cost a 304.
+(function() {
+    var loading = '<div class="col-12 text-center text-muted py-4">' +
+        '<div class="spinner-border spinner-border-sm" role="status"></div> Loading...</div>';
+    var failed = '<div class="col-12"><div class="alert alert-warning">' +
+        'This panel could not be loaded. Refresh the page to try again.</div></div>';
+
+    document.querySelectorAll('[data-panel-url]').forEach(function(el) {
+        el.innerHTML = loading;
+        fetch(el.dataset.panelUrl, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) { el.innerHTML = data.html; })
+            .catch(function() { el.innerHTML = failed; });
+    });
+})();